@@ -4,15 +4,13 @@ class TeachingScene(Scene):
         # BASE - Portrait Mode (9:16 aspect ratio, 1080x1920)
         self.camera.background_color = "#000000"
         
-        # Title at top center (smaller for portrait)
-        self.title = Text(title_text, font_size=32, color=WHITE)
-        self.title.move_to(UP * 7)  # Top area in portrait mode
+        # Static title + lecture lines, loaded precomputed when the pipeline has cached them
+        try:
+            from chrome_cache import cached_chrome
+            self.title, self.lecture = cached_chrome(self.make_chrome, title_text, lecture_lines)
+        except ImportError:
+            self.title, self.lecture = self.make_chrome(title_text, lecture_lines)
         self.add(self.title)
-
-        # Lecture content at bottom (horizontal arrangement for portrait)
-        lecture_texts = [Text(line, font_size=20, color=WHITE) for line in lecture_lines]
-        self.lecture = VGroup(*lecture_texts).arrange(DOWN, aligned_edge=LEFT, buff=0.3).scale(0.7)
-        self.lecture.move_to(DOWN * 6)  # Bottom area in portrait mode
         self.add(self.lecture)
 
         # Define fine-grained animation grid for Portrait Mode (4x8 grid)
@@ -28,6 +26,18 @@ class TeachingScene(Scene):
                 y = 6 - i * 1.75  # Y: 6 to -6 (taller, excluding title/lecture areas)
                 self.grid[f"{row}{col}"] = np.array([x, y, 0])
 
+    @staticmethod
+    def make_chrome(title_text, lecture_lines):
+        # Title at top center (smaller for portrait)
+        title = Text(title_text, font_size=32, color=WHITE)
+        title.move_to(UP * 7)  # Top area in portrait mode
+
+        # Lecture content at bottom (horizontal arrangement for portrait)
+        lecture_texts = [Text(line, font_size=20, color=WHITE) for line in lecture_lines]
+        lecture = VGroup(*lecture_texts).arrange(DOWN, aligned_edge=LEFT, buff=0.3).scale(0.7)
+        lecture.move_to(DOWN * 6)  # Bottom area in portrait mode
+        return title, lecture
+
     def place_at_grid(self, mobject, grid_pos, scale_factor=1.0):
         mobject.scale(scale_factor)
         mobject.move_to(self.grid[grid_pos])
@@ -1,7 +1,13 @@
 # MLLM feedback
+from patch_apply import UNIFIED_DIFF_INSTRUCTIONS
 
 
-def get_prompt4_layout_feedback(section, position_table):
+def get_prompt4_layout_feedback(section, position_table, static_layout_report=None):
+    static_note = ""
+    if static_layout_report:
+        static_note = f"""
+- Geometric Check (bounding boxes, already computed): {static_layout_report}
+- Do not re-report overlaps/off-screen/obstruction problems the geometric check already covers; focus on what it cannot see (readability, colors, elements that should fade out, label proximity)."""
     return f"""
 1. ANALYSIS REQUIREMENTS:
 - Analyze this Manim educational video ONLY for layout and spatial positioning issues.
@@ -11,7 +17,7 @@ def get_prompt4_layout_feedback(section, position_table):
 2. Content Context:
 - Title: {section.title}
 - Lecture Lines: {'; '.join(section.lecture_lines)}
-- Current Grid Occupancy: {position_table}
+- Current Grid Occupancy: {position_table}{static_note}
 
 3. Visual Anchor System (6*6 grid, right side only):
 ```
@@ -79,7 +85,11 @@ MLLM FEEDBACK IMPROVEMENTS: Based on video analysis, please address these issues
 """
 
 
-def get_feedback_improve_code(feedback, code):
+def get_feedback_improve_code(feedback, code, as_diff=False):
+    if as_diff:
+        output_rule = f"- {UNIFIED_DIFF_INSTRUCTIONS}"
+    else:
+        output_rule = "- Output only the updated full Python code. No explanation."
     return f"""
 You are a Manim v0.19.0 educational animation expert.
 
@@ -87,7 +97,7 @@ MUST KEEP (MANDATORY):
 - Based on the following feedback, improve the current Manim code.
 - Use light colors in the animations or labels!
 - Do not apply any animation to the lecture lines except for color changes; their size and position must remain unchanged.
-- Output only the updated full Python code. No explanation.
+{output_rule}
 
 Feedback:
 {feedback}
@@ -1,23 +1,45 @@
 import re
 import argparse
 import json
+import os
 import time
 import random
-import subprocess
 import sys
+import contextlib
+import threading
+import uuid
 from typing import List, Dict, Any, Optional, Tuple, Callable
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor, as_completed, ThreadPoolExecutor
+from concurrent.futures import as_completed, ThreadPoolExecutor
 
 # Add parent directory to path for prompts module
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from gpt_request import *
 from prompts import *
-from utils import *
+from helpers import *
 from scope_refine import *
 from external_assets import process_storyboard_with_assets
+from token_meter import TokenMeter, merge_token_reports, usage_from_response
+from fix_memory import FixMemory
+from patch_apply import apply_model_edit
+from layout_analyzer import analyze_section_layout
+from pixel_layout import assess_video_risk, fingerprints_match, video_fingerprint
+from glyph_cache import GlyphCache
+from chrome_cache import _prebuild_job
+from sandbox import LimitedRun, ProcessLimits, get_sandbox_pool, run_limited
+from video_assembler import IncrementalAssembler, merge_segments
+from work_queue import POLL_INTERVAL, default_worker_id, open_queue, run_one, run_worker
+from mock_llm import request_mock_token, request_mock_video
+from trace_export import write_run_trace, write_topic_trace
+from profiling import StageProfiler, merge_run_profiles, merge_topic_profiles, parse_profile_stages
+from metrics import METRICS_FILE, MetricsWriter, serve_metrics
+from process_pools import POOL_START_METHODS, make_process_pool, set_default_start_method
+
+# Written into the topic's output_dir with the run id; render workers (in the pool or on other queue
+# nodes) read it before every fix attempt and feedback round
+CANCEL_FILE = "cancelled.txt"
 
 
 @dataclass
@@ -72,6 +94,29 @@ class RunConfig:
     max_mllm_fix_bugs_tries: int = 3
     portrait_mode: bool = True  # 竖屏模式 (9:16 比例，适合手机)
     video_quality: str = "l"  # 视频质量: l(低), m(中), h(高), k(4K)
+    token_budget: int = 0  # 每个 topic 的 token 上限，0 表示不限制
+    use_fix_memory: bool = True  # 跨 topic / 跨运行复用已验证的错误修复
+    fix_memory_path: str = ""  # 默认为 CASES/fix_memory.json
+    race_repairs: bool = True  # 局部修复与整体修复并发进行，先通过验证者胜出
+    use_sandbox_pool: bool = True  # dry run 使用预热的沙箱进程池，而非每次启动新解释器
+    use_static_layout: bool = True  # 反馈轮先做无渲染的包围盒布局检查，MLLM 只处理几何检测不到的问题
+    glyph_cache_dir: Optional[str] = None  # 跨主题共享的 Text/Tex SVG 缓存目录，默认 ~/.cache/code2video/glyphs
+    glyph_cache_mb: int = 2048  # 共享字形缓存大小上限（MB），超出后淘汰最久未使用的条目；0 表示禁用
+    queue_url: str = ""  # 分布式工作队列（如 sqlite:///共享卷/queue.db），为空时只在本机运行
+    queue_sections: bool = False  # 除主题外，每个小节的渲染也作为独立任务放入队列
+    queue_lease_seconds: int = 300  # 任务租约时长，worker 心跳续约，过期后由其他节点重试
+    incremental_merge: bool = True  # 小节完成后按分镜顺序追加到 HLS 预览播放列表，最终合并只做拼接
+    use_chrome_cache: bool = True  # 预先排版各小节的标题与讲稿行并缓存点数据，渲染时直接加载
+    feedback_early_stop: bool = True  # 评审无问题或代码/画面不再变化时提前结束反馈轮
+    pixel_risk_threshold: float = 0.25  # OpenCV 像素风险分低于该阈值的小节跳过 MLLM 反馈；0 表示总是调用 MLLM
+    render_backend: str = "manim"  # "fake" 用 fake_render.py 按时长模拟渲染，用于调度压测
+    profile_stages: str = ""  # 逗号分隔的阶段名（如 "stage3,render,fix"），用 cProfile 分析并合并报告
+    pool_start_method: str = "forkserver"  # 进程池启动方式：forkserver 预加载 manim/numpy/SDK 后 fork 出 worker，内存写时复制共享
+    render_cpu_seconds: int = 300  # 渲染进程树中每个进程的 CPU 时间上限（RLIMIT_CPU），0 表示不限制
+    render_memory_mb: int = 8192  # 每个渲染进程的地址空间上限（RLIMIT_AS），启用 cgroup 时也作为 memory.max；0 表示不限制
+    render_open_files: int = 1024  # 渲染进程可打开的文件数上限（RLIMIT_NOFILE）
+    render_cgroup: str = ""  # 已委派的 cgroup v2 目录，每次渲染在其下建独立子 cgroup；为空时只用 rlimit
+    render_cpu_cores: float = 0  # 启用 cgroup 时每次渲染可用的 CPU 核数（cpu.max），0 表示不限制
 
 
 class TeachingVideoAgent:
@@ -81,9 +126,12 @@ class TeachingVideoAgent:
         knowledge_point,
         folder="CASES",
         cfg: Optional[RunConfig] = None,
+        run_id: Optional[str] = None,
     ):
         """1. Global parameter"""
         self.learning_topic = knowledge_point
+        # Shared with the render workers so their LLM calls count towards this run's token log and budget
+        self.run_id = run_id or uuid.uuid4().hex[:12]
         self.idx = idx
         self.cfg = cfg
 
@@ -101,7 +149,25 @@ class TeachingVideoAgent:
         self.max_feedback_gen_code_tries = cfg.max_feedback_gen_code_tries
         self.max_mllm_fix_bugs_tries = cfg.max_mllm_fix_bugs_tries
         self.portrait_mode = cfg.portrait_mode
+        self.use_static_layout = cfg.use_static_layout
+        self.pixel_risk_threshold = cfg.pixel_risk_threshold
+        self.feedback_early_stop = cfg.feedback_early_stop
+        self.use_chrome_cache = cfg.use_chrome_cache
+        self.incremental_merge = cfg.incremental_merge
+        self.queue_url = cfg.queue_url
+        self.queue_sections = cfg.queue_sections
+        self.queue_lease_seconds = cfg.queue_lease_seconds
+        self.glyph_cache = GlyphCache(cfg.glyph_cache_dir, cfg.glyph_cache_mb) if cfg.glyph_cache_mb > 0 else None
         self.video_quality = cfg.video_quality
+        self.render_backend = cfg.render_backend
+        self.pool_start_method = cfg.pool_start_method
+        self.render_limits = ProcessLimits(
+            cpu_seconds=cfg.render_cpu_seconds,
+            memory_mb=cfg.render_memory_mb,
+            open_files=cfg.render_open_files,
+            cgroup=cfg.render_cgroup,
+            cpu_cores=cfg.render_cpu_cores,
+        )
 
         """2. Path for output"""
         self.folder = folder
@@ -112,7 +178,30 @@ class TeachingVideoAgent:
         self.assets_dir.mkdir(exist_ok=True)
 
         """3. ScopeRefine & Anchor Visual"""
-        self.scope_refine_fixer = ScopeRefineFixer(api, self.max_code_token_length)
+        # Token meter shares the topic's log file with render subprocesses
+        self.profiler = StageProfiler(self.output_dir / "profiles", parse_profile_stages(cfg.profile_stages))
+        # One metrics stream per run, appended to by every batch and render worker
+        self.metrics = MetricsWriter(Path(folder) / METRICS_FILE)
+        self.token_meter = TokenMeter(
+            self.output_dir / "token_usage.jsonl",
+            topic=self.learning_topic,
+            token_budget=cfg.token_budget,
+            prices=get_model_prices(),
+            metrics=self.metrics,
+            run_id=self.run_id,
+        )
+        self.fix_memory = None
+        if cfg.use_fix_memory:
+            fix_memory_path = cfg.fix_memory_path or get_default_fix_memory_path(self.output_dir)
+            self.fix_memory = FixMemory(fix_memory_path, run_name=Path(folder).name)
+        self.scope_refine_fixer = ScopeRefineFixer(
+            self.API,
+            self.max_code_token_length,
+            meter=self.token_meter,
+            fix_memory=self.fix_memory,
+            race_repairs=cfg.race_repairs,
+            use_sandbox_pool=cfg.use_sandbox_pool,
+        )
         self.extractor = GridPositionExtractor()
 
         """4. External Database"""
@@ -135,11 +224,30 @@ class TeachingVideoAgent:
         self.sections = []
         self.section_codes = {}
         self.section_videos = {}
+        self.assembler: Optional[IncrementalAssembler] = None
+        self.section_status: Dict[str, str] = {}  # section id -> "done" | "failed" once its render finished
+        self._render_futures = []  # Pool futures of the current render stage, dropped by cancel()
         self.video_feedbacks = {}
+        self.mllm_calls_skipped = 0
+        self.feedback_rounds_skipped = 0
+        self.feedback_seconds_saved = 0.0
 
         """6. For Efficiency"""
         self.token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
 
+    def cancel(self):
+        """Stop this run's section renders: tasks still waiting for a pool worker are dropped, running
+        renders and queued section jobs stop at their next fix attempt or feedback round"""
+        (self.output_dir / CANCEL_FILE).write_text(self.run_id, encoding="utf-8")
+        for future in list(self._render_futures):
+            future.cancel()
+
+    def cancelled(self) -> bool:
+        try:
+            return (self.output_dir / CANCEL_FILE).read_text(encoding="utf-8") == self.run_id
+        except OSError:
+            return False
+
     def _extract_content_from_response(self, response):
         """Extract text content from various API response formats (Gemini, OpenAI, Anthropic)"""
         if response is None:
@@ -162,29 +270,35 @@ class TeachingVideoAgent:
         # Fallback to string conversion
         return str(response)
 
-    def _request_api_and_track_tokens(self, prompt, max_tokens=10000, api_override=None):
+    def _request_api_and_track_tokens(self, prompt, max_tokens=10000, api_override=None, stage="default", section_id=None):
         """packages API requests and automatically accumulates token usage
         
         Args:
             prompt: 请求的 prompt
             max_tokens: 最大 token 数
             api_override: 可选，覆盖默认 API（用于不同阶段使用不同模型）
+            stage: 计量用的阶段名（outline / storyboard / code / ...）
+            section_id: 计量用的 section id
         """
         api_func = api_override or self.API
+        metered = self.token_meter.wrap(api_func, stage=stage, section_id=section_id)
         # gpt-51 uses max_completion_tokens instead of max_tokens
         if api_func == request_gpt51_token:
-            response, usage = api_func(prompt, max_completion_tokens=max_tokens)
+            response, usage = metered(prompt, max_completion_tokens=max_tokens)
         else:
-            response, usage = api_func(prompt, max_tokens=max_tokens)
+            response, usage = metered(prompt, max_tokens=max_tokens)
         if usage:
             self.token_usage["prompt_tokens"] += usage.get("prompt_tokens", 0)
             self.token_usage["completion_tokens"] += usage.get("completion_tokens", 0)
             self.token_usage["total_tokens"] += usage.get("total_tokens", 0)
         return response
 
-    def _request_video_api_and_track_tokens(self, prompt, video_path):
+    def _request_video_api_and_track_tokens(self, prompt, video_path, section_id=None):
         """Wraps video API requests and accumulates token usage automatically"""
-        response, usage = request_gemini_video_img(prompt=prompt, video_path=video_path, image_path=self.GRID_IMG_PATH)
+        video_api = request_mock_video if self.API == request_mock_token else request_gemini_video_img
+        metered = self.token_meter.wrap(video_api, stage="mllm_feedback", section_id=section_id)
+        response = metered(prompt=prompt, video_path=video_path, image_path=self.GRID_IMG_PATH)
+        usage = usage_from_response(response)
 
         if usage:
             self.token_usage["prompt_tokens"] += usage.get("prompt_tokens", 0)
@@ -192,9 +306,62 @@ class TeachingVideoAgent:
             self.token_usage["total_tokens"] += usage.get("total_tokens", 0)
         return response
 
+    def record_span(self, name: str, start: float, end: float, section_id: Optional[str] = None, attempt: Optional[int] = None):
+        """Append a wall-clock span to timings.jsonl, which render subprocesses write to as well"""
+        append_jsonl(
+            self.output_dir / "timings.jsonl",
+            {
+                "topic": self.learning_topic,
+                "name": name,
+                "section_id": section_id,
+                "attempt": attempt,
+                "start": start,
+                "end": end,
+                "pid": os.getpid(),
+                "tid": threading.get_native_id(),
+            },
+        )
+
+    def record_render_usage(self, section_id: str, attempt: int, run: LimitedRun):
+        """Per-render CPU time and peak RSS of the whole process tree, to render_usage.jsonl and the run metrics"""
+        append_jsonl(
+            self.output_dir / "render_usage.jsonl",
+            {
+                "topic": self.learning_topic,
+                "section_id": section_id,
+                "attempt": attempt,
+                "returncode": run.returncode,
+                "wall_seconds": round(run.wall_seconds, 3),
+                "cpu_seconds": round(run.cpu_seconds, 3),
+                "peak_rss_mb": run.peak_rss_mb,
+                "limit": run.limit,
+                "timestamp": time.time(),
+            },
+        )
+        self.metrics.observe("render_cpu_seconds", run.cpu_seconds)
+        self.metrics.observe("render_peak_rss_mb", run.peak_rss_mb)
+        if run.limit:
+            self.metrics.inc("render_limit_hits", limit=run.limit)
+
+    @contextlib.contextmanager
+    def span(self, name: str, section_id: Optional[str] = None, attempt: Optional[int] = None):
+        """Timed span; also profiled when `name` is one of cfg.profile_stages"""
+        start = time.time()
+        try:
+            with self.profiler.profile(name, section_id):
+                yield
+        finally:
+            self.record_span(name, start, time.time(), section_id, attempt)
+
     def get_serializable_state(self):
         """返回可以序列化保存的Agent状态"""
-        return {"idx": self.idx, "knowledge_point": self.learning_topic, "folder": self.folder, "cfg": self.cfg}
+        return {
+            "idx": self.idx,
+            "knowledge_point": self.learning_topic,
+            "folder": self.folder,
+            "cfg": self.cfg,
+            "run_id": self.run_id,
+        }
 
     def _generate_script_md(self, outline_data: dict):
         """将 outline 中所有 section 的 content 整合成完整讲稿，保存为 script.md"""
@@ -263,7 +430,9 @@ class TeachingVideoAgent:
 
             for attempt in range(1, self.max_regenerate_tries + 1):
                 # Stage 1: 使用 API_STAGE1
-                response = self._request_api_and_track_tokens(prompt1, max_tokens=self.max_code_token_length, api_override=self.API_STAGE1)
+                response = self._request_api_and_track_tokens(
+                    prompt1, max_tokens=self.max_code_token_length, api_override=self.API_STAGE1, stage="outline"
+                )
                 if response is None:
                     print(f"⚠️ Attempt {attempt} failed, retrying...")
                     if attempt == self.max_regenerate_tries:
@@ -376,7 +545,9 @@ class TeachingVideoAgent:
 
             for attempt in range(1, self.max_regenerate_tries + 1):
                 # Stage 2: 使用 API_STAGE2
-                response = self._request_api_and_track_tokens(prompt2, max_tokens=self.max_code_token_length, api_override=self.API_STAGE2)
+                response = self._request_api_and_track_tokens(
+                    prompt2, max_tokens=self.max_code_token_length, api_override=self.API_STAGE2, stage="storyboard"
+                )
                 if response is None:
                     print(f"⚠️ Outline format invalid on attempt {attempt}, retrying...")
                     if attempt == self.max_regenerate_tries:
@@ -456,12 +627,13 @@ class TeachingVideoAgent:
         print("🤖 Enhancing storyboard: smart analysis and download assets...")
 
         try:
-            enhanced_storyboard = process_storyboard_with_assets(
-                storyboard=storyboard_data,
-                api_function=self.API,
-                assets_dir=str(self.assets_dir),
-                iconfinder_api_key=self.iconfinder_api_key,
-            )
+            with self.span("assets"):
+                enhanced_storyboard = process_storyboard_with_assets(
+                    storyboard=storyboard_data,
+                    api_function=self.token_meter.wrap(self.API, stage="assets"),
+                    assets_dir=str(self.assets_dir),
+                    iconfinder_api_key=self.iconfinder_api_key,
+                )
             enhanced_storyboard_file = self.output_dir / "storyboard_with_assets.json"
             with open(enhanced_storyboard_file, "w", encoding="utf-8") as f:
                 json.dump(enhanced_storyboard, f, ensure_ascii=False, indent=2)
@@ -500,6 +672,13 @@ class TeachingVideoAgent:
                 return modified_code
             except Exception as e:
                 print(f"⚠️ GridCodeModifier failed, falling back to original code: {e}")
+                patched_code = self._improve_code_with_diff(section, current_code, feedback_improvements)
+                if patched_code:
+                    with open(code_file, "w", encoding="utf-8") as f:
+                        f.write(patched_code)
+                    self.section_codes[section.id] = patched_code
+                    return patched_code
+                # Full-file rewrite only when the diff could not be applied
                 code_gen_prompt = get_feedback_improve_code(
                     feedback=get_feedback_list_prefix(feedback_improvements), code=current_code
                 )
@@ -508,7 +687,13 @@ class TeachingVideoAgent:
             code_gen_prompt = get_prompt3_code(regenerate_note=regenerate_note, section=section, base_class=base_class)
 
         # Stage 3: 使用 API_STAGE3
-        response = self._request_api_and_track_tokens(code_gen_prompt, max_tokens=self.max_code_token_length, api_override=self.API_STAGE3)
+        response = self._request_api_and_track_tokens(
+            code_gen_prompt,
+            max_tokens=self.max_code_token_length,
+            api_override=self.API_STAGE3,
+            stage="feedback_code" if feedback_improvements else "code",
+            section_id=section.id,
+        )
         if response is None:
             print(f"❌ Failed to generate code for {section.id} via API call.")
             return ""
@@ -528,25 +713,80 @@ class TeachingVideoAgent:
         self.section_codes[section.id] = code
         return code
 
+    def _improve_code_with_diff(self, section: Section, current_code: str, feedback_improvements) -> Optional[str]:
+        """Ask for the feedback changes as a unified diff and apply it; None when no usable edit came back"""
+        prompt = get_feedback_improve_code(
+            feedback=get_feedback_list_prefix(feedback_improvements), code=current_code, as_diff=True
+        )
+        response = self._request_api_and_track_tokens(
+            prompt,
+            max_tokens=self.max_code_token_length,
+            api_override=self.API_STAGE3,
+            stage="feedback_code",
+            section_id=section.id,
+        )
+        if response is None:
+            return None
+        new_code, mode = apply_model_edit(current_code, self._extract_content_from_response(response))
+        if new_code is None:
+            print(f"⚠️ {section.id} feedback diff not applied ({mode}), requesting full code")
+            return None
+        return replace_base_class(new_code, base_class) if mode == "rewrite" else new_code
+
+    def lint_before_render(self, section_id: str) -> bool:
+        """Fix blocking lint issues without rendering; returns True when the code was changed"""
+        code = self.section_codes[section_id]
+        issues = [i for i in self.scope_refine_fixer.lint(code) if i.blocking]
+        if not issues:
+            return False
+        print(f"🔎 {self.learning_topic} {section_id}: {len(issues)} static API issue(s), fixing before render")
+        error_msg = issues[0].to_traceback(str(self.output_dir / f"{section_id}.py"))
+        fixed_code = self.scope_refine_fixer.fix_code_smart(section_id, code, error_msg, self.output_dir)
+        if not fixed_code or fixed_code == code:
+            return False
+        self.section_codes[section_id] = fixed_code
+        with open(self.output_dir / f"{section_id}.py", "w", encoding="utf-8") as f:
+            f.write(fixed_code)
+        return True
+
     def debug_and_fix_code(self, section_id: str, max_fix_attempts: int = 3) -> bool:
         """Enhanced debug and fix code method"""
         if section_id not in self.section_codes:
             return False
 
+        fix_attempt = -1  # Renders made so far are fix_attempt + 1
         for fix_attempt in range(max_fix_attempts):
+            if self.cancelled():
+                print(f"🛑 {self.learning_topic} {section_id} cancelled")
+                return False
             print(f"🔧 {self.learning_topic} Debugging {section_id} (attempt {fix_attempt + 1}/{max_fix_attempts})")
 
+            # Catch undefined names / bad kwargs against the Manim API index before paying for a render
+            if fix_attempt == 0:
+                self.lint_before_render(section_id)
+
             try:
                 scene_name = f"{section_id.title().replace('_', '')}Scene"
                 code_file = f"{section_id}.py"
-                cmd = ["manim", f"-q{self.video_quality}", str(code_file), scene_name]
+                cmd = self._render_command(code_file, scene_name)
                 
                 # 添加竖屏模式参数 (9:16 比例)
                 # Manim 0.19.0 使用 -r 或 --resolution 参数
                 if self.portrait_mode:
                     cmd.extend(["-r", "1080,1920"])
 
-                result = subprocess.run(cmd, capture_output=True, text=True, cwd=self.output_dir, timeout=180)
+                render_start = time.time()
+                with self.span("manim_render", section_id, attempt=fix_attempt + 1):
+                    # Own process group under rlimits: a runaway scene (or its ffmpeg) cannot starve the other workers
+                    result = run_limited(cmd, cwd=self.output_dir, env=self._render_env(), timeout=180, limits=self.render_limits)
+                self.metrics.observe(
+                    "render_seconds", time.time() - render_start, result="ok" if result.returncode == 0 else "error"
+                )
+                self.record_render_usage(section_id, fix_attempt + 1, result)
+                if result.limit == "timeout":
+                    print(f"❌ {self.learning_topic} {section_id} timed out")
+                    break
+                self.scope_refine_fixer.report_render_result(section_id, result.returncode == 0)
 
                 if result.returncode == 0:
                     # 根据质量和模式确定输出目录名
@@ -574,14 +814,23 @@ class TeachingVideoAgent:
                         self.output_dir / "media" / "videos" / quality_dir / f"{scene_name}.mp4",
                     ]
 
+                    if self.glyph_cache is not None:
+                        self.metrics.inc("glyph_files_published", self.glyph_cache.publish(self.output_dir / "media"))
+
                     for video_path in video_patterns:
                         if video_path.exists():
                             self.section_videos[section_id] = str(video_path)
                             print(f"✅ {self.learning_topic} {section_id} finished")
+                            self.metrics.observe("section_fix_attempts", fix_attempt + 1, result="success")
                             return True
 
                 current_code = self.section_codes[section_id]
-                fixed_code = self.scope_refine_fixer.fix_code_smart(section_id, current_code, result.stderr, self.output_dir)
+                with self.span("fix", section_id, attempt=fix_attempt + 1):
+                    fixed_code = self.scope_refine_fixer.fix_code_smart(section_id, current_code, result.stderr, self.output_dir)
+                source = self.scope_refine_fixer.last_fix_source
+                self.metrics.inc("fix_attempts", source=source or "none", result="fixed" if fixed_code else "failed")
+                if self.fix_memory is not None and source in ("memory", "llm"):
+                    self.metrics.inc("cache_lookups", cache="fix_memory", result="hit" if source == "memory" else "miss")
 
                 if fixed_code:
                     self.section_codes[section_id] = fixed_code
@@ -590,22 +839,71 @@ class TeachingVideoAgent:
                 else:
                     break
 
-            except subprocess.TimeoutExpired:
-                print(f"❌ {self.learning_topic} {section_id} timed out")
-                break
             except Exception as e:
                 print(f"❌ {self.learning_topic} {section_id} failed with exception: {e}")
                 break
 
+        self.metrics.observe("section_fix_attempts", fix_attempt + 1, result="failed")
         return False
 
-    def get_mllm_feedback(self, section: Section, video_path: str, round_number: int = 1) -> VideoFeedback:
+    def get_static_layout_feedback(self, section: Section, video_path: str, round_number: int = 1):
+        """Headless bbox analysis; returns (feedback with place_at_grid fixes or None, report)"""
+        report = analyze_section_layout(
+            self.section_codes[section.id], section.id, self.output_dir, portrait=self.portrait_mode
+        )
+        if not report.ok:
+            print(f"⚠️ {self.learning_topic} {section.id} static layout analysis unavailable, using MLLM only")
+            return None, report
+        improvements = report.improvements
+        print(
+            f"📐 {self.learning_topic} {section.id} static layout: {len(report.issues)} issue(s), "
+            f"{len(improvements)} fixable without MLLM"
+        )
+        if not improvements:
+            return None, report
+        feedback = VideoFeedback(
+            section_id=section.id,
+            video_path=video_path,
+            has_issues=True,
+            suggested_improvements=improvements,
+            raw_response=report.to_json(),
+        )
+        self.video_feedbacks[f"{section.id}_round{round_number}_static"] = feedback
+        return feedback, report
+
+    def get_pixel_risk_feedback(self, section: Section, video_path: str, round_number: int = 1) -> Optional[VideoFeedback]:
+        """Local OpenCV pre-filter; returns a no-issue feedback when the video is below the risk threshold"""
+        if self.pixel_risk_threshold <= 0:
+            return None
+        report = assess_video_risk(video_path)
+        print(f"🔍 {self.learning_topic} {section.id} pixel check: {report.summary()}")
+        if report.is_risky(self.pixel_risk_threshold):
+            return None
+        self.mllm_calls_skipped += 1
+        print(
+            f"⏭️ {self.learning_topic} {section.id} below risk threshold {self.pixel_risk_threshold}, skipping MLLM feedback"
+        )
+        feedback = VideoFeedback(
+            section_id=section.id,
+            video_path=video_path,
+            has_issues=False,
+            suggested_improvements=[],
+            raw_response=report.to_json(),
+        )
+        self.video_feedbacks[f"{section.id}_round{round_number}_pixel"] = feedback
+        return feedback
+
+    def get_mllm_feedback(self, section: Section, video_path: str, round_number: int = 1, static_report=None) -> VideoFeedback:
         print(f"🤖 {self.learning_topic} Using MLLM to analyze video ({round_number}/{self.feedback_rounds}): {section.id}")
 
         current_code = self.section_codes[section.id]
         positions = self.extractor.extract_grid_positions(current_code)
         position_table = self.extractor.generate_position_table(positions)
-        analysis_prompt = get_prompt4_layout_feedback(section=section, position_table=position_table)
+        analysis_prompt = get_prompt4_layout_feedback(
+            section=section,
+            position_table=position_table,
+            static_layout_report=static_report.summary() if static_report is not None and static_report.ok else None,
+        )
 
         def _parse_layout(feedback_content):
             has_layout_issues, suggested_improvements = False, []
@@ -636,7 +934,7 @@ class TeachingVideoAgent:
 
         try:
             # 使用 Gemini 进行 MLLM 视频分析（gpt-5.1 不支持视频输入）
-            response = request_gemini_video_img(prompt=analysis_prompt, video_path=video_path, image_path=self.GRID_IMG_PATH)
+            response = self._request_video_api_and_track_tokens(analysis_prompt, video_path, section_id=section.id)
             feedback_content = extract_answer_from_response(response)
             has_layout_issues, suggested_improvements = _parse_layout(feedback_content)
             feedback = VideoFeedback(
@@ -711,7 +1009,8 @@ class TeachingVideoAgent:
 
         def task(section):
             try:
-                self.generate_section_code(section, attempt=1)
+                with self.profiler.profile("code", section.id):  # cProfile only follows the thread it started in
+                    self.generate_section_code(section, attempt=1)
                 return section.id, None
             except Exception as e:
                 return section.id, e
@@ -725,17 +1024,42 @@ class TeachingVideoAgent:
 
         return self.section_codes
 
+    def _layout_signature(self, code: str) -> Tuple:
+        """Grid placements of a section: what layout feedback is able to change"""
+        return tuple(
+            sorted(
+                (p.object_name, p.method, p.position, p.scale_factor)
+                for p in self.extractor.extract_grid_positions(code)
+            )
+        )
+
+    def _feedback_converged(self, section_id: str, before_code: str, before_fingerprint) -> Optional[str]:
+        """Reason to stop the feedback loop when the last round did not change the section, else None"""
+        after_code = self.section_codes[section_id]
+        if after_code.split() == before_code.split():
+            return "code unchanged"
+        if self._layout_signature(after_code) != self._layout_signature(before_code):
+            return None
+        # Same grid placements; only a visibly identical render means nothing is left to converge
+        after_video = self.section_videos.get(section_id)
+        if after_video and fingerprints_match(before_fingerprint, video_fingerprint(after_video)):
+            return "layout and frames unchanged"
+        return None
+
     def render_section(self, section: Section) -> bool:
         section_id = section.id
 
         try:
             success = False
             for regenerate_attempt in range(self.max_regenerate_tries):
+                if self.cancelled():
+                    return False
                 # print(f"🎯 Processing {section_id} (regenerate attempt {regenerate_attempt + 1}/{self.max_regenerate_tries})")
                 try:
                     if regenerate_attempt > 0:
                         self.generate_section_code(section, attempt=regenerate_attempt + 1)
-                    success = self.debug_and_fix_code(section_id, max_fix_attempts=self.max_fix_bug_tries)
+                    with self.span("debug", section_id, attempt=regenerate_attempt + 1):
+                        success = self.debug_and_fix_code(section_id, max_fix_attempts=self.max_fix_bug_tries)
                     if success:
                         break
                     else:
@@ -749,18 +1073,49 @@ class TeachingVideoAgent:
 
             # MLLM feedback
             if self.use_feedback:
+                rounds_run, round_seconds, stop_reason = 0, [], None
                 try:
                     for round in range(self.feedback_rounds):
+                        if self.cancelled():
+                            break  # The section keeps its last good video
                         current_video = self.section_videos.get(section_id)
                         if not current_video:
                             print(f"❌ {self.learning_topic} {section_id} no video available for MLLM feedback")
                             return success
+                        rounds_run += 1
+                        round_start = time.time()
+                        source, outcome = "static", "error"
                         try:
-                            feedback = self.get_mllm_feedback(section, current_video, round_number=round + 1)
+                            before_code = self.section_codes[section_id]
+                            # Geometry first: overlaps / off-screen / obstruction are fixed without a video upload
+                            feedback, static_report = None, None
+                            if self.use_static_layout:
+                                feedback, static_report = self.get_static_layout_feedback(
+                                    section, current_video, round_number=round + 1
+                                )
+                            if feedback is None:
+                                source = "pixel"
+                                feedback = self.get_pixel_risk_feedback(section, current_video, round_number=round + 1)
+                            if feedback is None:
+                                source = "mllm"
+                                feedback = self.get_mllm_feedback(
+                                    section, current_video, round_number=round + 1, static_report=static_report
+                                )
+
+                            if self.feedback_early_stop and (not feedback.has_issues or not feedback.suggested_improvements):
+                                stop_reason, outcome = "critic reported no issues", "no_issues"
+                                break
 
+                            # The optimized render replaces this file, so hash its frames first
+                            before_fingerprint = video_fingerprint(current_video) if self.feedback_early_stop else None
                             optimization_success = self.optimize_with_feedback(section, feedback)
+                            outcome = "improved" if optimization_success else "optimize_failed"
                             if optimization_success:
-                                pass
+                                if self.feedback_early_stop:
+                                    stop_reason = self._feedback_converged(section_id, before_code, before_fingerprint)
+                                    if stop_reason:
+                                        outcome = "converged"
+                                        break
                             else:
                                 print(
                                     f"⚠️ {self.learning_topic} {section_id} round {round+1} MLLM feedback optimization failed, using current version"
@@ -770,38 +1125,162 @@ class TeachingVideoAgent:
                                 f"⚠️ {self.learning_topic} {section_id} round {round+1} MLLM feedback processing exception: {str(e)}"
                             )
                             continue
+                        finally:
+                            round_seconds.append(time.time() - round_start)
+                            self.record_span("feedback_round", round_start, time.time(), section_id, attempt=round + 1)
+                            self.metrics.inc("feedback_rounds", source=source, outcome=outcome)
 
                 except Exception as e:
                     print(f"⚠️ {self.learning_topic} {section_id} MLLM feedback processing exception: {str(e)}")
 
+                skipped = self.feedback_rounds - rounds_run
+                if stop_reason and skipped > 0:
+                    saved = skipped * sum(round_seconds) / max(len(round_seconds), 1)
+                    self.feedback_rounds_skipped += skipped
+                    self.feedback_seconds_saved += saved
+                    print(
+                        f"🛑 {self.learning_topic} {section_id} feedback converged after {rounds_run}/{self.feedback_rounds} "
+                        f"round(s) ({stop_reason}); skipped {skipped}, ~{saved:.0f}s saved"
+                    )
+
             return success
 
         except Exception as e:
             print(f"❌ {self.learning_topic} {section_id} render process exception: {str(e)}")
             return False
 
-    def render_section_worker(self, section_data) -> Tuple[str, bool, Optional[str]]:
-        section_id = "unknown"
+    @staticmethod
+    def render_section_worker(section_data) -> Tuple[str, bool, Optional[str]]:
+        # Static so submitting it pickles only the task: the agent holds locks and thread-locals
+        section_id, kwargs = "unknown", {}
         try:
-            section, agent_class, kwargs = section_data
+            section, agent_class, kwargs, submitted = section_data
             section_id = section.id
             agent = agent_class(**kwargs)
-            success = agent.render_section(section)
+            agent.record_span("section_queue", submitted, time.time(), section_id)  # Waiting for a pool worker
+            agent.metrics.inc("sections", event="started")
+            agent.generate_section_code(section, attempt=1)  # A fresh agent has no section_codes: load the file
+            try:
+                with agent.span("section", section_id):
+                    success = agent.render_section(section)
+            finally:
+                agent.metrics.inc("sections", event="finished")
             video_path = agent.section_videos.get(section.id) if success else None
             return section_id, success, video_path
 
         except Exception as e:
-            print(f"❌ {self.learning_topic} {section_id} render process exception: {str(e)}")
+            print(f"❌ {kwargs.get('knowledge_point')} {section_id} render process exception: {str(e)}")
             return section_id, False, None
 
+    def _render_command(self, code_file: str, scene_name: str) -> List[str]:
+        if self.render_backend == "fake":
+            fake_render = str(Path(__file__).resolve().parent / "fake_render.py")
+            return [sys.executable, fake_render, f"-q{self.video_quality}", code_file, scene_name]
+        return ["manim", f"-q{self.video_quality}", code_file, scene_name]
+
+    def _render_env(self) -> Dict[str, str]:
+        """Render environment; puts src/ on the path so TeachingScene can import chrome_cache"""
+        env = dict(os.environ)
+        if self.use_chrome_cache:
+            src_dir = str(Path(__file__).resolve().parent)
+            env["PYTHONPATH"] = os.pathsep.join(p for p in (src_dir, env.get("PYTHONPATH")) if p)
+        return env
+
+    def seed_glyphs(self):
+        """Link Text/Tex SVGs typeset by any earlier topic on this machine into this topic's media dir"""
+        if self.glyph_cache is not None:
+            self.metrics.inc("glyph_files_linked", self.glyph_cache.seed(self.output_dir / "media"))
+
+    def prebuild_chrome(self):
+        """Typeset every section's title + lecture lines once, ahead of the renders that reuse them"""
+        if not self.use_chrome_cache or not self.sections:
+            return
+        start = time.time()
+        pool = get_sandbox_pool()
+        cwd = str(self.output_dir.resolve())
+
+        def build(section):
+            ok, _ = pool.run(
+                _prebuild_job, base_class, section.title, section.lecture_lines, cwd, timeout=120, label=f"chrome of {section.id}"
+            )
+            return bool(ok)
+
+        with ThreadPoolExecutor(max_workers=pool.workers) as executor:
+            built = sum(executor.map(build, self.sections))
+        print(f"🧱 {self.learning_topic} prebuilt chrome for {built}/{len(self.sections)} sections in {time.time() - start:.1f}s")
+
+    def _section_finished(self, section_id: str, video_path: Optional[str]):
+        """Record a finished section and hand it to the incremental assembler"""
+        self.section_status[section_id] = "done" if video_path else "failed"
+        if self.assembler is None:
+            return
+        with self.span("hls_segment", section_id):
+            added = self.assembler.add(section_id, video_path)
+        if added:
+            print(
+                f"📼 {self.learning_topic} preview covers {len(self.assembler.entries)}/{len(self.sections)} sections: "
+                f"{self.assembler.playlist}"
+            )
+
+    def render_sections_via_queue(self) -> Dict[str, str]:
+        """Publish each section render as a queue job and help work the queue until all of them finish"""
+        queue = open_queue(self.queue_url)
+        worker_id = default_worker_id()
+        if self.incremental_merge:
+            self.assembler = IncrementalAssembler(self.output_dir, [section.id for section in self.sections])
+
+        pending = {}
+        for section in self.sections:
+            payload = {
+                "idx": self.idx,
+                "kp": self.learning_topic,
+                "folder": str(self.folder),
+                "section": asdict(section),
+                "run_id": self.run_id,
+            }
+            job_id = queue.enqueue("section", payload, job_id=f"{Path(self.folder).name}/{self.idx}/{section.id}")
+            pending[job_id] = section.id
+        print(f"📤 {self.learning_topic} queued {len(pending)} section renders on {self.queue_url}")
+
+        handlers = {"section": lambda payload: process_section_job(payload, self.cfg)}
+        while pending:
+            if self.cancelled():
+                # Section jobs other workers lease from now on return at once: they read the same marker
+                print(f"🛑 {self.learning_topic} cancelled, no longer waiting for {len(pending)} section renders")
+                for section_id in pending.values():
+                    self._section_finished(section_id, None)
+                break
+            for job_id in list(pending):
+                record = queue.get(job_id)
+                if record is None or record["state"] not in ("done", "dead"):
+                    continue
+                section_id = pending.pop(job_id)
+                result = record["result"] or {}
+                video_path = result.get("video_path") if record["state"] == "done" else None
+                if video_path:
+                    self.section_videos[section_id] = video_path
+                    print(f"✅ {section_id} video rendered by {record['worker']}: {video_path}")
+                else:
+                    print(f"⚠️ {section_id} video rendering failed ({record['state']})")
+                self._section_finished(section_id, video_path)
+            # Render a section (of any topic) while waiting instead of idling on the lease holders
+            if pending and not run_one(queue, handlers, worker_id, self.queue_lease_seconds):
+                time.sleep(POLL_INTERVAL)
+        return self.section_videos
+
     def render_all_sections(self, max_workers: int = 6) -> Dict[str, str]:
+        self.seed_glyphs()
+        self.prebuild_chrome()
+        if self.queue_url and self.queue_sections:
+            return self.render_sections_via_queue()
         print(f"🎥 Start parallel rendering of all section videos (up to {max_workers} processes)...")
 
         tasks = []
         for section in self.sections:
             try:
-                task_data = (section, self.__class__, self.get_serializable_state())
+                task_data = (section, self.__class__, self.get_serializable_state(), time.time())
                 tasks.append(task_data)
+                self.metrics.inc("sections", event="submitted")
             except Exception as e:
                 print(f"⚠️ Error preparing task data for {section.id}: {str(e)}")
                 continue
@@ -813,14 +1292,17 @@ class TeachingVideoAgent:
         results = {}
         successful_count = 0
         failed_count = 0
+        if self.incremental_merge:
+            self.assembler = IncrementalAssembler(self.output_dir, [section.id for section in self.sections])
 
         try:
-            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            with make_process_pool(max_workers, self.pool_start_method, pool_request_fns(self.cfg)) as executor:
                 future_to_section = {}
                 for task in tasks:
                     try:
                         future = executor.submit(self.render_section_worker, task)
                         future_to_section[future] = task[0].id
+                        self._render_futures.append(future)
                     except Exception as e:
                         section_id = task[0].id if task and len(task) > 0 else "unknown"
                         print(f"⚠️ Error submitting task for {section_id}: {str(e)}")
@@ -828,6 +1310,11 @@ class TeachingVideoAgent:
 
                 for future in as_completed(future_to_section):
                     section_id = future_to_section[future]
+                    if future.cancelled():
+                        failed_count += 1
+                        print(f"🛑 {section_id} render cancelled before it started")
+                        self._section_finished(section_id, None)
+                        continue
                     try:
                         sid, success, video_path = future.result(timeout=300)
 
@@ -838,13 +1325,21 @@ class TeachingVideoAgent:
                         else:
                             failed_count += 1
                             print(f"⚠️ {sid} video rendering failed")
+                        self._section_finished(sid, video_path if success else None)
 
                     except Exception as e:
                         failed_count += 1
                         print(f"❌ {section_id} video rendering process error: {str(e)}")
+                        self._section_finished(section_id, None)
 
         except Exception as e:
             print(f"❌ Critical error in parallel rendering process: {str(e)}")
+        finally:
+            self._render_futures = []
+
+        # Sections that never produced a result must not hold back the ones after them
+        if self.assembler is not None:
+            self.assembler.skip_missing()
 
         # 更新结果并输出统计信息
         self.section_videos.update(results)
@@ -878,25 +1373,18 @@ class TeachingVideoAgent:
 
         print(f"🔗 Start merging section videos...")
 
-        video_list_file = self.output_dir / "video_list.txt"
-        with open(video_list_file, "w", encoding="utf-8") as f:
-            for section_id in sorted(self.section_videos.keys()):
-                video_path = self.section_videos[section_id].replace(f"{self.output_dir}/", "")
-                f.write(f"file '{video_path}'\n")
+        # Incremental path: segments are already remuxed in storyboard order, only concatenation is left
+        if self.assembler is not None and self.assembler.complete:
+            final_video = self.assembler.finalize(output_path)
+            if final_video:
+                return final_video
+            print(f"⚠️ {self.learning_topic} incremental finalisation failed, falling back to full merge")
 
-        # ffmpeg
+        # Storyboard order (sorted ids would put section_10 before section_2)
+        order = [s.id for s in self.sections if s.id in self.section_videos]
+        order += sorted(sid for sid in self.section_videos if sid not in order)
         try:
-            result = subprocess.run(
-                ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(video_list_file), "-c", "copy", str(output_path)],
-                capture_output=True,
-                text=True,
-            )
-
-            if result.returncode == 0:
-                return str(output_path)
-            else:
-                print(f"❌ Failed to merge section videos: {result.stderr}")
-                return None
+            return merge_segments([self.section_videos[sid] for sid in order], output_path, self.output_dir / "merge_work")
         except Exception as e:
             print(f"❌ Failed to merge section videos: {e}")
             return None
@@ -904,11 +1392,17 @@ class TeachingVideoAgent:
     def GENERATE_VIDEO(self) -> str:
         """Generate complete video with MLLM feedback optimization"""
         try:
-            self.generate_outline()
-            self.generate_storyboard()
-            self.generate_codes()
-            self.render_all_sections()
-            final_video = self.merge_videos()
+            with self.span("topic"):
+                with self.span("outline"):
+                    self.generate_outline()
+                with self.span("storyboard"):
+                    self.generate_storyboard()
+                with self.span("code"):
+                    self.generate_codes()
+                with self.span("render"):
+                    self.render_all_sections()
+                with self.span("merge"):
+                    final_video = self.merge_videos()
             if final_video:
                 print(f"🎉 Video generated success: {final_video}")
                 return final_video
@@ -920,6 +1414,36 @@ class TeachingVideoAgent:
             return None
 
 
+def get_default_fix_memory_path(output_dir: Path) -> Path:
+    """Fix memory is shared by every run under the same CASES root"""
+    return Path(*output_dir.parts[: output_dir.parts.index("CASES") + 1]) / "fix_memory.json"
+
+
+def print_fix_memory_report(folder_path: Path, cfg: RunConfig):
+    if not cfg.use_fix_memory:
+        return
+    memory = FixMemory(cfg.fix_memory_path or get_default_fix_memory_path(Path(folder_path)), run_name=Path(folder_path).name)
+    run_stats, all_stats = memory.report(Path(folder_path).name), memory.report()
+    print("\n🧠 Fix memory:")
+    print(
+        f"   This run: {run_stats['hits']}/{run_stats['lookups']} hits ({run_stats['hit_rate']*100:.1f}%), "
+        f"{run_stats['confirmed']} confirmed, {run_stats['stored']} new fixes, "
+        f"~{run_stats['tokens_saved']:,} tokens / {run_stats['seconds_saved']:.0f}s saved"
+    )
+    print(
+        f"   Cumulative: {all_stats['signatures']} signatures, hit rate {all_stats['hit_rate']*100:.1f}%, "
+        f"~{all_stats['tokens_saved']:,} tokens / {all_stats['seconds_saved']:.0f}s saved"
+    )
+
+
+def pool_request_fns(cfg: RunConfig) -> Tuple[Callable, ...]:
+    """LLM functions a pool worker will call, so its initializer can build their clients up front"""
+    request_fns = {cfg.api, cfg.api_stage1, cfg.api_stage2, cfg.api_stage3}
+    if cfg.use_feedback:
+        request_fns.add(request_mock_video if cfg.api == request_mock_token else request_gemini_video_img)
+    return tuple(fn for fn in request_fns if fn is not None)
+
+
 def process_knowledge_point(idx, kp, folder_path: Path, cfg: RunConfig):
     print(f"\n🚀 Processing knowledge topic: {kp}")
     start_time = time.time()
@@ -930,10 +1454,20 @@ def process_knowledge_point(idx, kp, folder_path: Path, cfg: RunConfig):
         folder=folder_path,
         cfg=cfg,
     )
-    video_path = agent.GENERATE_VIDEO()
+    agent.metrics.inc("topics", event="started")
+    try:
+        video_path = agent.GENERATE_VIDEO()
+    finally:
+        agent.metrics.inc("topics", event="finished")
+    agent.metrics.inc("topic_results", result="success" if video_path else "failed")
 
     duration_minutes = (time.time() - start_time) / 60
-    total_tokens = agent.token_usage["total_tokens"]
+    # Includes tokens spent inside render subprocesses (fixes, MLLM feedback)
+    token_report = agent.token_meter.write_report(agent.output_dir / "token_report.json")
+    total_tokens = token_report["totals"]["total_tokens"]
+    write_topic_trace(agent.output_dir)
+    if cfg.profile_stages:
+        merge_topic_profiles(agent.output_dir)
 
     print(f"✅ Knowledge topic '{kp}' processed. Cost Time: {duration_minutes:.2f} minutes, Tokens used: {total_tokens}")
     return kp, video_path, duration_minutes, total_tokens
@@ -958,10 +1492,65 @@ def process_batch(batch_data, cfg: RunConfig):
     return batch_idx, results
 
 
+def process_topic_job(payload: Dict[str, Any], cfg: RunConfig) -> Dict[str, Any]:
+    """Queue handler: one knowledge point; raising lets another attempt (possibly on another node) retry it"""
+    kp, video_path, duration_minutes, total_tokens = process_knowledge_point(
+        payload["idx"], payload["kp"], Path(payload["folder"]), cfg
+    )
+    if video_path is None:
+        raise RuntimeError(f"No video produced for {kp}")
+    return {"video_path": video_path, "duration_minutes": duration_minutes, "total_tokens": total_tokens}
+
+
+def process_section_job(payload: Dict[str, Any], cfg: RunConfig) -> Dict[str, Any]:
+    """Queue handler: render one section from the code the topic job wrote to the shared folder.
+
+    A render that fails after all fix attempts is a result, not a crash, so it is not retried.
+    """
+    agent = TeachingVideoAgent(
+        idx=payload["idx"], knowledge_point=payload["kp"], folder=Path(payload["folder"]), cfg=cfg, run_id=payload.get("run_id")
+    )
+    section = Section(**payload["section"])
+    agent.generate_section_code(section, attempt=1)
+    success = agent.render_section(section)
+    return {"success": success, "video_path": agent.section_videos.get(section.id) if success else None}
+
+
+def run_distributed(knowledge_points: List[str], folder_path: Path, cfg: RunConfig, role: str = "both"):
+    """Topics (and with queue_sections, section renders) go through the shared queue at cfg.queue_url.
+
+    Start one `enqueue`/`both` process with the knowledge file, and `work` processes on any node that
+    sees the same volume; workers exit once nothing is queued or leased.
+    """
+    set_default_start_method(cfg.pool_start_method)
+    queue = open_queue(cfg.queue_url)
+    if role in ("enqueue", "both"):
+        for idx, kp in enumerate(knowledge_points):
+            payload = {"idx": idx, "kp": kp, "folder": str(folder_path)}
+            queue.enqueue("topic", payload, job_id=f"{Path(folder_path).name}/topic/{idx}")
+        print(f"📤 Queued {len(knowledge_points)} topics on {cfg.queue_url} (output: {folder_path})")
+    if role == "enqueue":
+        return
+
+    handlers = {
+        "topic": lambda payload: process_topic_job(payload, cfg),
+        "section": lambda payload: process_section_job(payload, cfg),
+    }
+    run_worker(queue, handlers, lease_seconds=cfg.queue_lease_seconds)
+    if role == "both":
+        write_run_token_report(knowledge_points, folder_path)
+        write_run_trace(folder_path)
+        if cfg.profile_stages:
+            merge_run_profiles(folder_path)
+        print_fix_memory_report(folder_path, cfg)
+
+
 def run_Code2Video(
     knowledge_points: List[str], folder_path: Path, parallel=True, batch_size=3, max_workers=8, cfg: RunConfig = RunConfig()
 ):
     all_results = []
+    set_default_start_method(cfg.pool_start_method)
+    MetricsWriter(Path(folder_path) / METRICS_FILE).inc("topics", len(knowledge_points), event="submitted")
 
     if parallel:
         batches = []
@@ -972,7 +1561,7 @@ def run_Code2Video(
         print(
             f"🔄 Parallel batch processing mode: {len(batches)} batches, each with {batch_size} knowledge points, {max_workers} concurrent batches"
         )
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        with make_process_pool(max_workers, cfg.pool_start_method, pool_request_fns(cfg)) as executor:
             futures = {executor.submit(process_batch, batch, cfg): batch for batch in batches}
             for future in as_completed(futures):
                 try:
@@ -990,6 +1579,12 @@ def run_Code2Video(
                 print(f"❌ Serial processing {kp} failed: {e}")
                 all_results.append((kp, None, 0, 0))
 
+    write_run_token_report(knowledge_points, folder_path)
+    write_run_trace(folder_path)
+    if cfg.profile_stages:
+        merge_run_profiles(folder_path)
+    print_fix_memory_report(folder_path, cfg)
+
     successful_runs = [r for r in all_results if r[1] is not None]
     total_runs = len(all_results)
     if not successful_runs:
@@ -1008,6 +1603,30 @@ def run_Code2Video(
     print("=" * 50)
 
 
+def write_run_token_report(knowledge_points: List[str], folder_path: Path):
+    """Merge every topic's token_report.json into one per-run report"""
+    reports = []
+    for idx, kp in enumerate(knowledge_points):
+        report_file = get_output_dir(idx=idx, knowledge_point=kp, base_dir=folder_path) / "token_report.json"
+        if report_file.exists():
+            with open(report_file, "r", encoding="utf-8") as f:
+                reports.append(json.load(f))
+    if not reports:
+        return None
+
+    run_report = merge_token_reports(reports)
+    with open(Path(folder_path) / "token_report.json", "w", encoding="utf-8") as f:
+        json.dump(run_report, f, ensure_ascii=False, indent=2)
+
+    print("\n📊 Token usage by stage:")
+    for stage, bucket in sorted(run_report["by_stage"].items(), key=lambda kv: -kv[1]["total_tokens"]):
+        print(
+            f"   {stage:<14} {int(bucket['total_tokens']):>10,} tokens | {int(bucket['calls'])} calls | "
+            f"{bucket['latency_seconds']:.1f}s | ${bucket['cost_usd']:.4f}"
+        )
+    return run_report
+
+
 def get_api_and_output(API_name):
     mapping = {
         "gpt-41": (request_gpt41_token, "Chatgpt41"),
@@ -1017,6 +1636,7 @@ def get_api_and_output(API_name):
         "gpt-4o": (request_gpt4o_token, "Chatgpt4o"),
         "gpt-o4mini": (request_o4mini_token, "Chatgpto4mini"),
         "Gemini": (request_gemini_token, "Gemini"),
+        "mock": (request_mock_token, "Mock"),
     }
     try:
         return mapping[API_name]
@@ -1024,13 +1644,13 @@ def get_api_and_output(API_name):
         raise ValueError("Invalid API model name")
 
 
-def build_and_parse_args():
+def build_arg_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
     # TODO: Core hyperparameters
     parser.add_argument(
         "--API",
         type=str,
-        choices=["gpt-41", "claude", "gpt-5", "gpt-51", "gpt-4o", "gpt-o4mini", "Gemini"],
+        choices=["gpt-41", "claude", "gpt-5", "gpt-51", "gpt-4o", "gpt-o4mini", "Gemini", "mock"],
         default="gpt-41",
     )
     parser.add_argument(
@@ -1053,6 +1673,38 @@ def build_and_parse_args():
     parser.add_argument("--max_feedback_gen_code_tries", type=int, help="max # tries for Critic", default=3)
     parser.add_argument("--max_mllm_fix_bugs_tries", type=int, help="max # tries for Critic to fix bug", default=3)
     parser.add_argument("--feedback_rounds", type=int, default=2)
+    parser.add_argument("--token_budget", type=int, help="max # tokens per topic, 0 for unlimited", default=0)
+    parser.add_argument("--use_fix_memory", action="store_true", default=True)
+    parser.add_argument("--no_fix_memory", action="store_false", dest="use_fix_memory")
+    parser.add_argument("--fix_memory_path", type=str, help="shared error -> patch memo, default CASES/fix_memory.json", default="")
+    parser.add_argument("--race_repairs", action="store_true", default=True)
+    parser.add_argument("--no_race_repairs", action="store_false", dest="race_repairs")
+    parser.add_argument("--use_sandbox_pool", action="store_true", default=True)
+    parser.add_argument("--no_sandbox_pool", action="store_false", dest="use_sandbox_pool")
+    parser.add_argument("--use_static_layout", action="store_true", default=True)
+    parser.add_argument("--no_static_layout", action="store_false", dest="use_static_layout")
+    parser.add_argument("--pixel_risk_threshold", type=float, default=0.25)
+    parser.add_argument("--glyph_cache_dir", type=str, default=None)
+    parser.add_argument("--glyph_cache_mb", type=int, default=2048)
+    parser.add_argument("--queue", type=str, help="shared job queue, e.g. sqlite:///mnt/shared/queue.db", default="")
+    parser.add_argument("--queue_role", type=str, choices=["enqueue", "work", "both"], default="both")
+    parser.add_argument("--queue_sections", action="store_true", default=False)
+    parser.add_argument("--queue_lease", type=int, help="job lease seconds, renewed by heartbeats", default=300)
+    parser.add_argument("--incremental_merge", action="store_true", default=True)
+    parser.add_argument("--no_incremental_merge", action="store_false", dest="incremental_merge")
+    parser.add_argument("--use_chrome_cache", action="store_true", default=True)
+    parser.add_argument("--no_chrome_cache", action="store_false", dest="use_chrome_cache")
+    parser.add_argument("--feedback_early_stop", action="store_true", default=True)
+    parser.add_argument("--render_backend", type=str, choices=["manim", "fake"], default="manim")
+    parser.add_argument("--profile", type=str, help="cProfile these stages, e.g. stage3,render,fix or all", default="")
+    parser.add_argument("--metrics_port", type=int, help="serve Prometheus /metrics on this port, 0 = off", default=0)
+    parser.add_argument("--pool_start_method", type=str, choices=list(POOL_START_METHODS), default="forkserver")
+    parser.add_argument("--render_cpu_seconds", type=int, help="CPU seconds per render process, 0 = off", default=300)
+    parser.add_argument("--render_memory_mb", type=int, help="address space per render process, 0 = off", default=8192)
+    parser.add_argument("--render_open_files", type=int, default=1024)
+    parser.add_argument("--render_cgroup", type=str, help="delegated cgroup v2 dir for per-render cgroups", default="")
+    parser.add_argument("--render_cpu_cores", type=float, help="cpu.max per render cgroup, 0 = off", default=0)
+    parser.add_argument("--no_feedback_early_stop", action="store_false", dest="feedback_early_stop")
 
     parser.add_argument("--parallel", action="store_true", default=False)
     parser.add_argument("--no_parallel", action="store_false", dest="parallel")
@@ -1068,16 +1720,69 @@ def build_and_parse_args():
     
     # 分阶段模型配置
     parser.add_argument("--api_stage1", type=str, default=None,
-                        choices=["gpt-41", "claude", "gpt-5", "gpt-51", "gpt-4o", "gpt-o4mini", "Gemini"],
+                        choices=["gpt-41", "claude", "gpt-5", "gpt-51", "gpt-4o", "gpt-o4mini", "Gemini", "mock"],
                         help="Stage 1 (Outline) 使用的模型，默认与 --API 相同")
     parser.add_argument("--api_stage2", type=str, default=None,
-                        choices=["gpt-41", "claude", "gpt-5", "gpt-51", "gpt-4o", "gpt-o4mini", "Gemini"],
+                        choices=["gpt-41", "claude", "gpt-5", "gpt-51", "gpt-4o", "gpt-o4mini", "Gemini", "mock"],
                         help="Stage 2 (Storyboard) 使用的模型，默认与 --API 相同")
     parser.add_argument("--api_stage3", type=str, default=None,
-                        choices=["gpt-41", "claude", "gpt-5", "gpt-51", "gpt-4o", "gpt-o4mini", "Gemini"],
+                        choices=["gpt-41", "claude", "gpt-5", "gpt-51", "gpt-4o", "gpt-o4mini", "Gemini", "mock"],
                         help="Stage 3 (Code Generation) 使用的模型，默认与 --API 相同")
 
-    return parser.parse_args()
+    return parser
+
+
+def build_and_parse_args():
+    return build_arg_parser().parse_args()
+
+
+def build_run_config(args) -> RunConfig:
+    # 解析各阶段的 API
+    api = get_api_and_output(args.API)[0]
+    api_stage1 = get_api_and_output(args.api_stage1)[0] if args.api_stage1 else None
+    api_stage2 = get_api_and_output(args.api_stage2)[0] if args.api_stage2 else None
+    api_stage3 = get_api_and_output(args.api_stage3)[0] if args.api_stage3 else None
+
+    return RunConfig(
+        api=api,
+        api_stage1=api_stage1,
+        api_stage2=api_stage2,
+        api_stage3=api_stage3,
+        iconfinder_api_key=args.iconfinder_api_key,
+        use_feedback=args.use_feedback,
+        use_assets=args.use_assets,
+        max_code_token_length=args.max_code_token_length,
+        max_fix_bug_tries=args.max_fix_bug_tries,
+        max_regenerate_tries=args.max_regenerate_tries,
+        max_feedback_gen_code_tries=args.max_feedback_gen_code_tries,
+        max_mllm_fix_bugs_tries=args.max_mllm_fix_bugs_tries,
+        feedback_rounds=args.feedback_rounds,
+        portrait_mode=args.portrait,
+        video_quality=args.video_quality,
+        token_budget=args.token_budget,
+        use_fix_memory=args.use_fix_memory,
+        fix_memory_path=args.fix_memory_path,
+        race_repairs=args.race_repairs,
+        use_sandbox_pool=args.use_sandbox_pool,
+        use_static_layout=args.use_static_layout,
+        pixel_risk_threshold=args.pixel_risk_threshold,
+        feedback_early_stop=args.feedback_early_stop,
+        use_chrome_cache=args.use_chrome_cache,
+        incremental_merge=args.incremental_merge,
+        queue_url=args.queue,
+        queue_sections=args.queue_sections,
+        queue_lease_seconds=args.queue_lease,
+        glyph_cache_dir=args.glyph_cache_dir,
+        glyph_cache_mb=args.glyph_cache_mb,
+        render_backend=args.render_backend,
+        profile_stages=args.profile,
+        pool_start_method=args.pool_start_method,
+        render_cpu_seconds=args.render_cpu_seconds,
+        render_memory_mb=args.render_memory_mb,
+        render_open_files=args.render_open_files,
+        render_cgroup=args.render_cgroup,
+        render_cpu_cores=args.render_cpu_cores,
+    )
 
 
 if __name__ == "__main__":
@@ -1111,28 +1816,7 @@ if __name__ == "__main__":
     else:
         raise ValueError("Must provide --knowledge_point | --knowledge_file")
 
-    # 解析各阶段的 API
-    api_stage1 = get_api_and_output(args.api_stage1)[0] if args.api_stage1 else None
-    api_stage2 = get_api_and_output(args.api_stage2)[0] if args.api_stage2 else None
-    api_stage3 = get_api_and_output(args.api_stage3)[0] if args.api_stage3 else None
-
-    cfg = RunConfig(
-        api=api,
-        api_stage1=api_stage1,
-        api_stage2=api_stage2,
-        api_stage3=api_stage3,
-        iconfinder_api_key=args.iconfinder_api_key,
-        use_feedback=args.use_feedback,
-        use_assets=args.use_assets,
-        max_code_token_length=args.max_code_token_length,
-        max_fix_bug_tries=args.max_fix_bug_tries,
-        max_regenerate_tries=args.max_regenerate_tries,
-        max_feedback_gen_code_tries=args.max_feedback_gen_code_tries,
-        max_mllm_fix_bugs_tries=args.max_mllm_fix_bugs_tries,
-        feedback_rounds=args.feedback_rounds,
-        portrait_mode=args.portrait,
-        video_quality=args.video_quality,
-    )
+    cfg = build_run_config(args)
 
     print(f"📱 视频模式: {'竖屏 (9:16)' if args.portrait else '横屏 (16:9)'}")
     quality_names = {'l': '480p', 'm': '720p', 'h': '1080p', 'k': '4K'}
@@ -1147,6 +1831,13 @@ if __name__ == "__main__":
     print(f"🤖 Stage 3 (Code) 模型: {stage3_name}")
     print(f"🤖 其他阶段 模型: {args.API}")
 
+    if args.metrics_port:
+        serve_metrics(folder / METRICS_FILE, args.metrics_port)
+
+    if args.queue:
+        run_distributed(knowledge_points, folder, cfg, role=args.queue_role)
+        sys.exit(0)
+
     run_Code2Video(
         knowledge_points,
         folder,
@@ -0,0 +1,305 @@
+import ast
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from traceback_reducer import LIBRARY_PATH, reduce_traceback
+
+
+# Names exported by `from manim import *` that generated scenes use most often
+MANIM_COMMON_NAMES = {
+    "Scene", "Mobject", "VMobject", "VGroup", "Group", "Text", "Tex", "MathTex", "Paragraph", "MarkupText",
+    "Circle", "Square", "Rectangle", "RoundedRectangle", "Triangle", "Polygon", "RegularPolygon", "Line", "Arrow",
+    "DoubleArrow", "Dot", "Arc", "Ellipse", "Annulus", "Sector", "Brace", "BraceLabel", "DashedLine", "NumberLine",
+    "Axes", "NumberPlane", "SurroundingRectangle", "BackgroundRectangle", "ImageMobject", "SVGMobject", "Table",
+    "Create", "Write", "Uncreate", "Unwrite", "FadeIn", "FadeOut", "Transform", "ReplacementTransform",
+    "TransformMatchingTex", "TransformMatchingShapes", "GrowFromCenter", "GrowArrow", "DrawBorderThenFill",
+    "Indicate", "Circumscribe", "Flash", "Wiggle", "Rotate", "MoveToTarget", "LaggedStart", "AnimationGroup",
+    "Succession", "ValueTracker", "DecimalNumber", "always_redraw", "config", "np",
+    "UP", "DOWN", "LEFT", "RIGHT", "ORIGIN", "UL", "UR", "DL", "DR", "IN", "OUT", "PI", "TAU", "DEGREES",
+    "WHITE", "BLACK", "GRAY", "GREY", "RED", "GREEN", "BLUE", "YELLOW", "ORANGE", "PURPLE", "PINK", "TEAL", "GOLD",
+    "MAROON", "BLUE_A", "BLUE_B", "BLUE_C", "BLUE_D", "BLUE_E", "RED_A", "RED_B", "RED_C", "RED_D", "RED_E",
+    "GREEN_A", "GREEN_B", "GREEN_C", "GREEN_D", "GREEN_E", "YELLOW_A", "YELLOW_B", "YELLOW_C", "YELLOW_D",
+    "YELLOW_E", "LIGHT_GRAY", "DARK_GRAY", "LIGHT_GREY", "DARK_GREY",
+}
+
+# Standard library / third-party modules that scenes use under their usual alias
+MODULE_IMPORTS = {
+    "np": "import numpy as np",
+    "numpy": "import numpy",
+    "math": "import math",
+    "random": "import random",
+    "itertools": "import itertools",
+    "os": "import os",
+}
+
+# Manim (3b1b / early CE) names renamed in Manim CE v0.19
+RENAMED_NAMES = {
+    "ShowCreation": "Create",
+    "TextMobject": "Tex",
+    "TexMobject": "MathTex",
+    "CircleIndicate": "Circumscribe",
+    "ShowCreationThenDestruction": "ShowPassingFlash",
+    "FRAME_WIDTH": "config.frame_width",
+    "FRAME_HEIGHT": "config.frame_height",
+    "FRAME_X_RADIUS": "config.frame_x_radius",
+    "FRAME_Y_RADIUS": "config.frame_y_radius",
+}
+
+RENAMED_METHODS = {
+    "get_graph": "plot",
+    "get_parametric_curve": "plot_parametric_curve",
+    "get_implicit_curve": "plot_implicit_curve",
+}
+
+RENAMED_KWARGS = {
+    "text_color": "color",
+    "font_color": "color",
+    "txt_color": "color",
+    "colour": "color",
+    "fontsize": "font_size",
+    "size": "font_size",
+    "fill_colour": "fill_color",
+    "stroke_colour": "stroke_color",
+}
+
+TEXT_ONLY_KWARGS = {"font", "slant", "weight", "line_spacing", "t2c", "t2f", "t2g", "t2s", "t2w", "disable_ligatures", "warn_missing_font"}
+TEX_ONLY_KWARGS = {"tex_template", "tex_environment", "substrings_to_isolate", "tex_to_color_map", "arg_separator"}
+TEX_CLASSES = {"MathTex", "Tex"}
+CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+LATEX_PATTERN = re.compile(r"\\[a-zA-Z]+|[\^_]\{")
+LATEX_ERROR_PATTERN = re.compile(r"latex|\.tex\b|dvi", re.IGNORECASE)
+
+
+@dataclass
+class ParsedError:
+    """The parts of a traceback the rules match against"""
+
+    error_type: Optional[str] = None
+    message: str = ""
+    line_number: Optional[int] = None  # line in the section file, if any frame points into it
+
+
+@dataclass
+class AutoFixResult:
+    code: str
+    rule: str
+    description: str
+
+
+def parse_error(error_msg: str, section_id: Optional[str] = None) -> ParsedError:
+    """Extract exception type/message and the deepest section-file line from a (rich or plain) traceback"""
+    reduced = reduce_traceback(error_msg, section_id)
+    parsed = ParsedError(error_type=reduced.error_type, message=reduced.message.split("\n")[0].strip())
+    user_frames = [f for f in reduced.frames if not LIBRARY_PATH.search(f.path)]
+    if user_frames:
+        parsed.line_number = user_frames[-1].line
+    return parsed
+
+
+def _char_offset(lines: List[str], lineno: int, col_byte: int) -> int:
+    """Absolute character offset of an ast (1-based line, utf-8 byte column) position"""
+    offset = sum(len(l) for l in lines[: lineno - 1])
+    return offset + len(lines[lineno - 1].encode("utf-8")[:col_byte].decode("utf-8", errors="ignore"))
+
+
+def _splice(code: str, edits: List[Tuple[ast.AST, str]]) -> str:
+    """Replace the source span of each node with new text (applied back to front)"""
+    lines = code.splitlines(keepends=True)
+    spans = []
+    for node, new_text in edits:
+        start = _char_offset(lines, node.lineno, node.col_offset)
+        end = _char_offset(lines, node.end_lineno, node.end_col_offset)
+        spans.append((start, end, new_text))
+    for start, end, new_text in sorted(spans, reverse=True):
+        code = code[:start] + new_text + code[end:]
+    return code
+
+
+def _call_name(call: ast.Call) -> Optional[str]:
+    if isinstance(call.func, ast.Name):
+        return call.func.id
+    if isinstance(call.func, ast.Attribute):
+        return call.func.attr
+    return None
+
+
+def _string_args(call: ast.Call) -> List[str]:
+    return [a.value for a in call.args if isinstance(a, ast.Constant) and isinstance(a.value, str)]
+
+
+def _on_line(node: ast.AST, line_number: Optional[int]) -> bool:
+    return line_number is None or node.lineno <= line_number <= getattr(node, "end_lineno", node.lineno)
+
+
+def _insert_import(code: str, statement: str) -> str:
+    """Insert an import after the module docstring / existing imports"""
+    lines = code.split("\n")
+    insert_at = 0
+    for i, line in enumerate(lines):
+        if line.startswith(("import ", "from ")):
+            insert_at = i + 1
+    return "\n".join(lines[:insert_at] + [statement] + lines[insert_at:])
+
+
+class AutoFixRule:
+    """Base class: a rule claims an error by type/message and rewrites the parsed module"""
+
+    name = "rule"
+    error_types: Tuple[str, ...] = ()
+
+    def matches(self, err: ParsedError) -> bool:
+        return not self.error_types or err.error_type in self.error_types
+
+    def apply(self, code: str, tree: ast.Module, err: ParsedError) -> Optional[str]:
+        raise NotImplementedError
+
+
+class MissingImportRule(AutoFixRule):
+    name = "missing_import"
+    error_types = ("NameError",)
+
+    def apply(self, code, tree, err):
+        m = re.search(r"name '(\w+)' is not defined", err.message)
+        if not m:
+            return None
+        missing = m.group(1)
+        has_star = any(
+            isinstance(n, ast.ImportFrom) and n.module == "manim" and any(a.name == "*" for a in n.names) for n in tree.body
+        )
+        if missing in MANIM_COMMON_NAMES and not has_star:
+            return _insert_import(code, "from manim import *")
+        if missing in MODULE_IMPORTS:
+            return _insert_import(code, MODULE_IMPORTS[missing])
+        return None
+
+
+class RenamedApiRule(AutoFixRule):
+    name = "renamed_api"
+    error_types = ("NameError", "AttributeError")
+
+    def apply(self, code, tree, err):
+        edits = []
+        if err.error_type == "NameError":
+            m = re.search(r"name '(\w+)' is not defined", err.message)
+            if not m or m.group(1) not in RENAMED_NAMES:
+                return None
+            old = m.group(1)
+            # Rename every occurrence so the next render does not trip over the same API again
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Name) and node.id == old:
+                    edits.append((node, RENAMED_NAMES[old]))
+        else:
+            m = re.search(r"has no attribute '(\w+)'", err.message)
+            if not m or m.group(1) not in RENAMED_METHODS:
+                return None
+            old = m.group(1)
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Attribute) and node.attr == old:
+                    edits.append((node, f"{ast.unparse(node.value)}.{RENAMED_METHODS[old]}"))
+        return _splice(code, edits) if edits else None
+
+
+class UnexpectedKwargRule(AutoFixRule):
+    name = "unexpected_kwarg"
+    error_types = ("TypeError",)
+
+    def apply(self, code, tree, err):
+        m = re.search(r"(?:(\w+)\.)?\w+\(\) got an unexpected keyword argument '(\w+)'", err.message)
+        if not m:
+            return None
+        owner, kwarg = m.group(1), m.group(2)
+
+        candidates = [
+            node
+            for node in ast.walk(tree)
+            if isinstance(node, ast.Call) and any(k.arg == kwarg for k in node.keywords)
+        ]
+        on_line = [c for c in candidates if _on_line(c, err.line_number)]
+        if on_line:
+            candidates = on_line
+        elif owner:
+            candidates = [c for c in candidates if _call_name(c) == owner]
+        if not candidates:
+            return None
+
+        edits = []
+        for call in candidates:
+            new_call = ast.Call(func=call.func, args=call.args, keywords=[])
+            existing = {k.arg for k in call.keywords}
+            for k in call.keywords:
+                if k.arg != kwarg:
+                    new_call.keywords.append(k)
+                elif RENAMED_KWARGS.get(kwarg) and RENAMED_KWARGS[kwarg] not in existing:
+                    new_call.keywords.append(ast.keyword(arg=RENAMED_KWARGS[kwarg], value=k.value))
+            edits.append((call, ast.unparse(new_call)))
+        return _splice(code, edits)
+
+
+class TextTexMismatchRule(AutoFixRule):
+    """On a LaTeX compile failure, fix the mobject on the error line: `MathTex`/`Tex` given CJK -> Text,
+    `Text` given LaTeX markup -> MathTex"""
+
+    name = "text_tex_mismatch"
+
+    def matches(self, err):
+        return bool(LATEX_ERROR_PATTERN.search(err.message)) and err.line_number is not None
+
+    def apply(self, code, tree, err):
+        edits = []
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Name) or not _on_line(node, err.line_number):
+                continue
+            strings = _string_args(node)
+            if not strings:
+                continue
+            if node.func.id in TEX_CLASSES and any(CJK_PATTERN.search(s) for s in strings):
+                if len(strings) != len(node.args):
+                    continue
+                keywords = [k for k in node.keywords if k.arg not in TEX_ONLY_KWARGS]
+                new_call = ast.Call(func=ast.Name(id="Text"), args=[ast.Constant(" ".join(strings))], keywords=keywords)
+                edits.append((node, ast.unparse(new_call)))
+            elif node.func.id == "Text" and any(LATEX_PATTERN.search(s) for s in strings):
+                keywords = [k for k in node.keywords if k.arg not in TEXT_ONLY_KWARGS]
+                args = [ast.Constant(s.strip("$")) if isinstance(a, ast.Constant) else a for a, s in zip(node.args, strings)]
+                new_call = ast.Call(func=ast.Name(id="MathTex"), args=args, keywords=keywords)
+                edits.append((node, ast.unparse(new_call)))
+        return _splice(code, edits) if edits else None
+
+
+def default_rules() -> List[AutoFixRule]:
+    return [MissingImportRule(), RenamedApiRule(), UnexpectedKwargRule(), TextTexMismatchRule()]
+
+
+class AutoFixEngine:
+    """Deterministic, rule-based repairs for mechanical render failures (no LLM round trip)"""
+
+    def __init__(self, rules: Optional[List[AutoFixRule]] = None):
+        self.rules = rules or default_rules()
+        self.stats: Dict[str, int] = {}
+
+    def fix(self, code: str, error_msg: str, section_id: Optional[str] = None) -> Optional[AutoFixResult]:
+        err = parse_error(error_msg, section_id)
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return None
+
+        for rule in self.rules:
+            if not rule.matches(err):
+                continue
+            try:
+                new_code = rule.apply(code, tree, err)
+            except Exception:
+                continue
+            if not new_code or new_code == code:
+                continue
+            try:
+                compile(new_code, "<autofix>", "exec")
+            except SyntaxError:
+                continue
+            self.stats[rule.name] = self.stats.get(rule.name, 0) + 1
+            return AutoFixResult(
+                code=new_code, rule=rule.name, description=f"{err.error_type}: {err.message}".strip(": ")
+            )
+        return None
@@ -0,0 +1,276 @@
+import csv
+import json
+import math
+import os
+import resource
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from fake_render import FakeRenderConfig
+from helpers import read_jsonl
+from mock_llm import MockLLMConfig
+
+STAGES = ("outline", "storyboard", "code", "render", "merge", "topic")
+CURVE_POINTS = 100
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile; 0.0 for no samples"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def _cpu_seconds() -> float:
+    """User + system time of this process and every child it has waited for (pool workers, manim)"""
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def collect_records(folder: Path):
+    """Spans from every topic's timings.jsonl and LLM calls from its token_usage.jsonl"""
+    from trace_export import collect_run_records
+
+    return collect_run_records(folder)
+
+
+def _distribution(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "max": round(max(values, default=0.0), 3),
+    }
+
+
+def render_usage(folder: Path) -> Dict[str, Any]:
+    """CPU time and peak RSS per render process tree, from every topic's render_usage.jsonl"""
+    runs = [run for topic_dir in sorted(p for p in folder.iterdir() if p.is_dir()) for run in read_jsonl(topic_dir / "render_usage.jsonl")]
+    limit_hits = defaultdict(int)
+    for run in runs:
+        if run.get("limit"):
+            limit_hits[run["limit"]] += 1
+    return {
+        "renders": len(runs),
+        "cpu_seconds": _distribution([run["cpu_seconds"] for run in runs]),
+        "peak_rss_mb": _distribution([run["peak_rss_mb"] for run in runs]),
+        "limit_hits": dict(limit_hits),
+    }
+
+
+def queue_delays(spans: List[Dict[str, Any]], run_start: float) -> Dict[str, Dict[str, float]]:
+    """Topics wait from run start until a batch process picks them up; sections from submission
+    to the render pool until a worker starts them"""
+    topic_waits = [span["start"] - run_start for span in spans if span["name"] == "topic"]
+    section_waits = [span["end"] - span["start"] for span in spans if span["name"] == "section_queue"]
+    return {"topic": _distribution(topic_waits), "section": _distribution(section_waits)}
+
+
+def _concurrency(intervals: List[Tuple[float, float]], start: float, step: float, points: int) -> List[float]:
+    """Average number of intervals open during each step-long bucket"""
+    busy = [0.0] * points
+    for begin, end in intervals:
+        first, last = max(0, int((begin - start) // step)), min(points - 1, int((end - start) // step))
+        for i in range(first, last + 1):
+            bucket_start = start + i * step
+            busy[i] += max(0.0, min(end, bucket_start + step) - max(begin, bucket_start))
+    return [b / step for b in busy]
+
+
+def curves(spans, calls, n_topics: int, run_start: float, wall: float, points: int = CURVE_POINTS) -> List[Dict[str, float]]:
+    """Queue depth and utilisation over the run, one row per bucket"""
+    step = max(wall / points, 1e-6)
+
+    def intervals(name):
+        return [(span["start"], span["end"]) for span in spans if span["name"] == name]
+
+    topics = intervals("topic")
+    renders = _concurrency(intervals("manim_render"), run_start, step, points)
+    llm = _concurrency([(c["timestamp"] - c.get("latency", 0.0), c["timestamp"]) for c in calls], run_start, step, points)
+    section_queue = _concurrency(intervals("section_queue"), run_start, step, points)
+    topics_active = _concurrency(topics, run_start, step, points)
+    cores = os.cpu_count() or 1
+    rows = []
+    for i in range(points):
+        t = run_start + (i + 1) * step
+        rows.append(
+            {
+                "t": round((i + 1) * step, 2),
+                "topics_waiting": n_topics - sum(1 for begin, _ in topics if begin <= t),
+                "topics_active": round(topics_active[i], 2),
+                "sections_queued": round(section_queue[i], 2),
+                "renders_active": round(renders[i], 2),
+                "llm_calls_active": round(llm[i], 2),
+                "render_utilization": round(renders[i] / cores, 4),
+            }
+        )
+    return rows
+
+
+def write_curves(rows: List[Dict[str, float]], path: Path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def summarize(folder: Path, n_topics: int, succeeded: int, wall: float, cpu: float, spans=None, calls=None) -> Dict[str, Any]:
+    if spans is None:
+        spans, calls = collect_records(folder)
+    durations = defaultdict(list)
+    for span in spans:
+        durations[span["name"]].append(span["end"] - span["start"])
+    llm_latency = defaultdict(list)
+    for call in calls:
+        llm_latency[call["stage"]].append(call.get("latency", 0.0))
+
+    render_seconds = sum(durations["manim_render"])
+    llm_seconds = sum(sum(v) for v in llm_latency.values())
+    busy = render_seconds + llm_seconds
+    return {
+        "topics": n_topics,
+        "succeeded": succeeded,
+        "wall_seconds": round(wall, 2),
+        "topics_per_hour": round(succeeded / wall * 3600, 2) if wall else 0.0,
+        "cpu_seconds": round(cpu, 2),
+        "cpu_utilization": round(cpu / (wall * (os.cpu_count() or 1)), 4) if wall else 0.0,
+        "stages": {
+            name: {"count": len(v), "p50": round(percentile(v, 50), 3), "p95": round(percentile(v, 95), 3)}
+            for name, v in sorted(durations.items())
+        },
+        "llm_stages": {
+            stage: {"calls": len(v), "p50": round(percentile(v, 50), 3), "p95": round(percentile(v, 95), 3)}
+            for stage, v in sorted(llm_latency.items())
+        },
+        # Summed over all workers, so both can exceed wall time; the split is what matters
+        "render_seconds": round(render_seconds, 2),
+        "llm_seconds": round(llm_seconds, 2),
+        "render_share": round(render_seconds / busy, 4) if busy else 0.0,
+    }
+
+
+def print_summary(summary: Dict[str, Any]):
+    print("\n" + "=" * 50)
+    print(f"   Topics: {summary['succeeded']}/{summary['topics']} in {summary['wall_seconds']:.0f}s "
+          f"-> {summary['topics_per_hour']:.1f} topics/hour")
+    print(f"   CPU utilisation: {summary['cpu_utilization']*100:.1f}% of {os.cpu_count()} cores")
+    print(f"   Render vs LLM: {summary['render_seconds']:.0f}s vs {summary['llm_seconds']:.0f}s "
+          f"({summary['render_share']*100:.1f}% render)")
+    for name in [*STAGES, "manim_render"]:
+        if name in summary["stages"]:
+            stats = summary["stages"][name]
+            print(f"   {name:<13} n={stats['count']:<5} p50={stats['p50']:.2f}s p95={stats['p95']:.2f}s")
+    for kind, stats in summary.get("queue_delay", {}).items():
+        print(f"   {kind} queue delay: p50={stats['p50']:.1f}s p95={stats['p95']:.1f}s max={stats['max']:.1f}s")
+    usage = summary.get("render_usage")
+    if usage and usage["renders"]:
+        print(f"   render tree: CPU p95={usage['cpu_seconds']['p95']:.1f}s, peak RSS p95={usage['peak_rss_mb']['p95']:.0f}MB "
+              f"max={usage['peak_rss_mb']['max']:.0f}MB, limit hits {usage['limit_hits'] or 0}")
+    print("=" * 50)
+
+
+def check_thresholds(summary: Dict[str, Any], args) -> List[str]:
+    """Scheduling regressions for CI; thresholds of 0 are off"""
+    problems = []
+    delays = summary["queue_delay"]
+    if args.max_topic_wait_p95 and delays["topic"]["p95"] > args.max_topic_wait_p95:
+        problems.append(f"topic queue delay p95 {delays['topic']['p95']:.1f}s > {args.max_topic_wait_p95}s")
+    if args.max_section_wait_p95 and delays["section"]["p95"] > args.max_section_wait_p95:
+        problems.append(f"section queue delay p95 {delays['section']['p95']:.1f}s > {args.max_section_wait_p95}s")
+    if args.min_cpu_utilization and summary["cpu_utilization"] < args.min_cpu_utilization:
+        problems.append(f"CPU utilisation {summary['cpu_utilization']:.2f} < {args.min_cpu_utilization}")
+    if args.min_success_rate and summary["succeeded"] < args.min_success_rate * summary["topics"]:
+        problems.append(f"{summary['succeeded']}/{summary['topics']} topics succeeded, below {args.min_success_rate:.0%}")
+    return problems
+
+
+def main():
+    from agent import build_arg_parser, build_run_config, run_Code2Video
+
+    parser = build_arg_parser()
+    parser.set_defaults(API="mock", folder_prefix="BENCH", parallel=True)
+    parser.add_argument("--topics", type=int, help="# synthetic topics", default=12)
+    parser.add_argument("--batch_size", type=int, help="topics per batch process", default=3)
+    parser.add_argument("--mock_latency", type=float, help="median mock LLM latency [s]", default=1.0)
+    parser.add_argument("--mock_latency_sigma", type=float, help="log-normal sigma of mock latency", default=0.5)
+    parser.add_argument("--mock_failure_rate", type=float, default=0.0)
+    parser.add_argument("--mock_bad_code_rate", type=float, help="share of generated code that needs a fix", default=0.2)
+    parser.add_argument("--mock_sections", type=int, default=3)
+    parser.add_argument("--mock_section_seconds", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fake_render_mode", type=str, choices=["sleep", "cpu"], default="sleep")
+    parser.add_argument("--fake_render_speed", type=float, help="render seconds per animation second", default=0.5)
+    parser.add_argument("--fake_render_failure_rate", type=float, default=0.0)
+    parser.add_argument("--max_topic_wait_p95", type=float, help="fail if exceeded [s], 0 = off", default=0)
+    parser.add_argument("--max_section_wait_p95", type=float, help="fail if exceeded [s], 0 = off", default=0)
+    parser.add_argument("--min_cpu_utilization", type=float, help="fail if below, 0 = off", default=0)
+    parser.add_argument("--min_success_rate", type=float, help="fail if below, 0 = off", default=0)
+    args = parser.parse_args()
+
+    mock = MockLLMConfig(
+        latency_median=args.mock_latency,
+        latency_sigma=args.mock_latency_sigma,
+        failure_rate=args.mock_failure_rate,
+        bad_code_rate=args.mock_bad_code_rate,
+        sections=args.mock_sections,
+        section_seconds=args.mock_section_seconds,
+        seed=args.seed,
+    )
+    os.environ.update(mock.to_env())  # Inherited by batch, render and sandbox processes
+    fake_render = FakeRenderConfig(
+        mode=args.fake_render_mode, speed=args.fake_render_speed, failure_rate=args.fake_render_failure_rate, seed=args.seed
+    )
+    if args.render_backend == "fake":
+        os.environ.update(fake_render.to_env())
+        args.use_chrome_cache = False  # The fake renderer never imports TeachingScene
+
+    folder = Path(__file__).resolve().parent / "CASES" / f"{args.folder_prefix}_{time.strftime('%Y%m%d_%H%M%S')}"
+    folder.mkdir(parents=True, exist_ok=True)
+    if not args.fix_memory_path:
+        args.fix_memory_path = str(folder / "fix_memory.json")  # Earlier runs must not turn fixes into hits
+    cfg = build_run_config(args)
+    if args.metrics_port:
+        from metrics import METRICS_FILE, serve_metrics
+
+        serve_metrics(folder / METRICS_FILE, args.metrics_port)
+    knowledge_points = [f"Benchmark topic {i:04d}" for i in range(args.topics)]
+
+    print(f"⏱️ Benchmarking {args.topics} topics against {args.API} ({mock}), {args.render_backend} renderer")
+    start, cpu_start = time.time(), _cpu_seconds()
+    run_Code2Video(
+        knowledge_points, folder, parallel=args.parallel, batch_size=args.batch_size, max_workers=args.parallel_group_num, cfg=cfg
+    )
+    wall, cpu = time.time() - start, _cpu_seconds() - cpu_start
+
+    succeeded = sum(1 for p in folder.iterdir() if p.is_dir() and any(p.glob("*.mp4")))
+    spans, calls = collect_records(folder)
+    summary = summarize(folder, args.topics, succeeded, wall, cpu, spans, calls)
+    summary["queue_delay"] = queue_delays(spans, start)
+    summary["render_usage"] = render_usage(folder)
+    summary["config"] = {
+        "mock": vars(mock),
+        "render_backend": args.render_backend,
+        "fake_render": vars(fake_render) if args.render_backend == "fake" else None,
+        "batch_size": args.batch_size,
+        "max_workers": args.parallel_group_num,
+    }
+    with open(folder / "benchmark.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    write_curves(curves(spans, calls, args.topics, start, wall), folder / "curves.csv")
+    print_summary(summary)
+    print(f"📄 {folder / 'benchmark.json'}, {folder / 'curves.csv'}")
+
+    problems = check_thresholds(summary, args)
+    for problem in problems:
+        print(f"❌ {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import pickle
+import types
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Relative to the topic output_dir, which is the cwd of both renders and sandbox dry runs
+CHROME_DIR = Path(os.environ.get("CODE2VIDEO_CHROME_DIR", "media/chrome"))
+FORMAT_VERSION = 1
+# Style arrays restored verbatim onto each rebuilt VMobject
+STYLE_ATTRS = ("fill_rgbas", "stroke_rgbas", "background_stroke_rgbas", "stroke_width", "background_stroke_width")
+
+
+def _update_with_code(h, code: types.CodeType):
+    """Hash bytecode, names and constants; nested code objects (comprehensions) recursively, since
+    their repr carries a memory address and file name that differ between the render and the prebuild"""
+    h.update(code.co_code)
+    h.update(repr(code.co_names).encode("utf-8"))
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _update_with_code(h, const)
+        else:
+            h.update(repr(const).encode("utf-8"))
+
+
+def chrome_key(builder: Callable, title_text: str, lecture_lines: List[str]) -> str:
+    """Content address: the texts, the builder's code (font sizes, positions) and the manim version"""
+    import manim
+
+    h = hashlib.sha256()
+    _update_with_code(h, builder.__code__)
+    for part in (FORMAT_VERSION, manim.__version__, title_text, list(lecture_lines)):
+        h.update(repr(part).encode("utf-8"))
+    return h.hexdigest()[:24]
+
+
+def _dump(mobject) -> Dict[str, Any]:
+    return {
+        "points": mobject.points.copy(),
+        "style": {attr: getattr(mobject, attr) for attr in STYLE_ATTRS if hasattr(mobject, attr)},
+        "children": [_dump(sub) for sub in mobject.submobjects],
+    }
+
+
+def _load(data: Dict[str, Any]):
+    from manim import VGroup, VMobject
+
+    # Leaves become plain VMobjects and containers VGroups: indexing self.lecture[i] and
+    # colour changes keep working, only the Text subclass (and its re-typesetting) is gone
+    mobject = VGroup() if data["children"] and not len(data["points"]) else VMobject()
+    mobject.points = data["points"]
+    for attr, value in data["style"].items():
+        setattr(mobject, attr, value)
+    if data["children"]:
+        mobject.add(*[_load(child) for child in data["children"]])
+    return mobject
+
+
+def _path(key: str) -> Path:
+    return CHROME_DIR / f"{key}.pkl"
+
+
+def load_chrome(key: str) -> Optional[Tuple[Any, Any]]:
+    try:
+        with open(_path(key), "rb") as f:
+            title, lecture = pickle.load(f)
+        return _load(title), _load(lecture)
+    except Exception:  # Missing, partial from an older format, or unloadable: rebuild
+        return None
+
+
+def save_chrome(key: str, title, lecture):
+    """Write via a temp file and rename so concurrent section renders never read a partial entry"""
+    CHROME_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = CHROME_DIR / f".{key}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump((_dump(title), _dump(lecture)), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, _path(key))
+    except Exception:  # Caching is best-effort; the render already has its mobjects
+        tmp.unlink(missing_ok=True)
+
+
+def cached_chrome(builder: Callable, title_text: str, lecture_lines: List[str]) -> Tuple[Any, Any]:
+    """TeachingScene title and lecture VGroup: rebuilt from cached point data, typeset and cached on a miss"""
+    key = chrome_key(builder, title_text, lecture_lines)
+    cached = load_chrome(key)
+    if cached is not None:
+        return cached
+    title, lecture = builder(title_text, lecture_lines)
+    save_chrome(key, title, lecture)
+    return title, lecture
+
+
+def _prebuild_job(base_class_code: str, title_text: str, lecture_lines: List[str], cwd: str) -> bool:
+    """Runs in a sandbox worker: build one section's chrome into `cwd`'s cache"""
+    namespace: Dict[str, Any] = {}
+    previous_cwd = os.getcwd()
+    try:
+        os.chdir(cwd)
+        exec(compile("from manim import *\n" + base_class_code, "<base_class>", "exec"), namespace)
+        cached_chrome(namespace["TeachingScene"].make_chrome, title_text, lecture_lines)
+        return True
+    except Exception:
+        return False  # The render builds it itself
+    finally:
+        os.chdir(previous_cwd)
@@ -8,7 +8,7 @@ from threading import Lock
 
 from gpt_request import request_gemini_with_video
 from prompts import get_prompt_aes
-from utils import extract_answer_from_response, eva_video_list
+from helpers import extract_answer_from_response, eva_video_list
 
 
 @dataclass
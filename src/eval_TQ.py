@@ -6,12 +6,11 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import List, Dict, Tuple, Any, Callable, Optional
 import numpy as np
-from scipy import stats
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import functools
 import random
 
-from utils import extract_answer_from_response, eva_video_list
+from helpers import extract_answer_from_response, eva_video_list
 from gpt_request import request_gemini_with_video, request_gemini
 from prompts import get_unlearning_and_video_learning_prompt, get_unlearning_prompt
 
@@ -253,6 +252,8 @@ SKU EDUCATIONAL VIDEO EVALUATION REPORT
     # statistical significance
     successful_results = [r for r in results if r.unlearning_success]
     if len(successful_results) > 1:
+        from scipy import stats  # Only the final report needs it, and it is the slowest import here
+
         successful_gains = [r.learning_gain for r in successful_results]
         t_stat, p_value = stats.ttest_1samp(successful_gains, 0)
         mu = float(np.mean(successful_gains))
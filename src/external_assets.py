@@ -1,5 +1,4 @@
 import json
-import requests
 import re
 from pathlib import Path
 from typing import Dict, List, Optional
@@ -157,6 +156,7 @@ class SmartSVGDownloader:
 
     def _download_iconfinder(self, element: str) -> Optional[str]:
         try:
+            import requests  # Only sections with assets need it; kept out of agent startup
             url = f"https://api.iconfinder.com/v4/icons/search?query={element}&count=1&premium=0"
             headers = {"Authorization": f"Bearer {self.iconfinder_api_key}"}
             resp = requests.get(url, headers=headers, timeout=10)
@@ -187,6 +187,7 @@ class SmartSVGDownloader:
 
     def _download_iconify(self, element: str) -> Optional[str]:
         try:
+            import requests
             search_url = f"https://api.iconify.design/search?query={element}&limit=1"
             r = requests.get(search_url, timeout=8)
             if r.status_code == 200 and r.json().get("icons"):
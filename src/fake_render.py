@@ -0,0 +1,129 @@
+import argparse
+import hashlib
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Same directory names manim uses: height + frame rate
+QUALITY = {"l": ((854, 480), 15), "m": ((1280, 720), 30), "h": ((1920, 1080), 60), "k": ((3840, 2160), 60)}
+DEFAULT_PLAY_SECONDS = 1.0  # Manim's default run_time
+
+
+@dataclass
+class FakeRenderConfig:
+    mode: str = "sleep"  # "sleep" | "cpu"
+    speed: float = 0.5  # Render seconds per second of animation
+    failure_rate: float = 0.0
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeRenderConfig":
+        config = cls()
+        for name, value in vars(cls()).items():
+            raw = os.environ.get(f"CODE2VIDEO_FAKE_RENDER_{name.upper()}")
+            if raw is not None:
+                setattr(config, name, type(value)(raw))
+        return config
+
+    def to_env(self) -> Dict[str, str]:
+        return {f"CODE2VIDEO_FAKE_RENDER_{name.upper()}": str(value) for name, value in vars(self).items()}
+
+
+def animation_seconds(code: str) -> float:
+    """Literal run_time=/wait() values; plays without an explicit run_time count as one second"""
+    total = sum(float(v) for v in re.findall(r"run_time\s*=\s*([\d.]+)", code))
+    total += sum(float(v) for v in re.findall(r"self\.wait\(\s*([\d.]+)", code))
+    plays = len(re.findall(r"self\.play\(", code))
+    total += DEFAULT_PLAY_SECONDS * max(0, plays - len(re.findall(r"self\.play\([^\n]*run_time", code)))
+    return max(total, DEFAULT_PLAY_SECONDS)
+
+
+def _attempt(counter: Path) -> int:
+    """How often this scene has been rendered, so a retry of unchanged code gets a fresh draw"""
+    counter.parent.mkdir(parents=True, exist_ok=True)
+    count = int(counter.read_text() or 0) + 1 if counter.exists() else 1
+    counter.write_text(str(count))
+    return count
+
+
+def _spend(seconds: float, mode: str):
+    if mode == "cpu":
+        deadline = time.perf_counter() + seconds
+        x = 0
+        while time.perf_counter() < deadline:
+            x = (x * 1103515245 + 12345) & 0x7FFFFFFF
+    else:
+        time.sleep(seconds)
+
+
+def _write_video(path: Path, size: Tuple[int, int], fps: int, seconds: float):
+    """Real (black) clip when ffmpeg is available so merging works; otherwise an empty placeholder"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if shutil.which("ffmpeg"):
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi",
+            "-i", f"color=c=black:s={size[0]}x{size[1]}:r={fps}:d={seconds:.3f}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", str(path),
+        ]
+        if subprocess.run(cmd, capture_output=True).returncode == 0:
+            return
+    path.write_bytes(b"")
+
+
+def render(code_file: str, scene_name: str, quality: str, resolution: Optional[str], config: FakeRenderConfig) -> int:
+    """Stand-in for `manim -q<quality> <file> <scene>`: spends time in proportion to the animation
+    length, fails with `config.failure_rate`, and writes the video where manim would"""
+    code = Path(code_file).read_text(encoding="utf-8")
+    try:
+        compile(code, code_file, "exec")
+    except SyntaxError as e:
+        print(f'  File "{code_file}", line {e.lineno}\nSyntaxError: {e.msg}', file=sys.stderr)
+        return 1
+    if not re.search(rf"class\s+{re.escape(scene_name)}\s*\(", code):
+        print(f"Error: {scene_name} is not in the script", file=sys.stderr)
+        return 1
+
+    stem = Path(code_file).stem
+    attempt = _attempt(Path("media") / "fake_render" / f"{stem}.attempts")
+    digest = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    rng = random.Random(f"{config.seed}:{stem}:{digest}:{attempt}")
+
+    seconds = animation_seconds(code)
+    cost = seconds * config.speed
+    failed = rng.random() < config.failure_rate
+    _spend(cost * rng.uniform(0.1, 1.0) if failed else cost, config.mode)  # Failures surface partway in
+    if failed:
+        print(
+            "Traceback (most recent call last):\n"
+            f'  File "{code_file}", line 1, in construct\n'
+            f"RuntimeError: fake render failure (attempt {attempt})",
+            file=sys.stderr,
+        )
+        return 1
+
+    (width, height), fps = QUALITY[quality]
+    if resolution:
+        width, height = (int(v) for v in resolution.split(","))
+    _write_video(Path("media") / "videos" / stem / f"{height}p{fps}" / f"{scene_name}.mp4", (width, height), fps, seconds)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fake manim renderer for scheduler load tests")
+    parser.add_argument("-q", dest="quality", choices=sorted(QUALITY), default="l")
+    parser.add_argument("-r", "--resolution", default=None)
+    parser.add_argument("file")
+    parser.add_argument("scene")
+    args = parser.parse_args(argv)
+    return render(args.file, args.scene, args.quality, args.resolution, FakeRenderConfig.from_env())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+import ast
+import difflib
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ast_fixers import parse_error
+from helpers import append_jsonl, read_jsonl
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to unlocked read-modify-write
+    fcntl = None
+
+
+MAX_HUNKS = 3  # Larger diffs are rewrites, not reusable fixes
+MAX_CHANGED_LINES = 20
+MAX_PATCHES_PER_SIGNATURE = 5
+
+
+def _rejected(patch: Dict[str, Any]) -> bool:
+    """Renders have turned the patch down more often than they accepted it: replaying it wastes a render"""
+    return patch["failures"] > patch["successes"]
+
+
+def _call_on_line(code: str, line_number: Optional[int]) -> str:
+    """Name of the outermost call on the error line, e.g. 'Text' or 'place_at_grid'"""
+    if not line_number:
+        return ""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return ""
+    calls = [
+        n
+        for n in ast.walk(tree)
+        if isinstance(n, ast.Call) and n.lineno <= line_number <= getattr(n, "end_lineno", n.lineno)
+    ]
+    if not calls:
+        return ""
+    outer = min(calls, key=lambda n: (n.lineno, n.col_offset))
+    if isinstance(outer.func, ast.Name):
+        return outer.func.id
+    if isinstance(outer.func, ast.Attribute):
+        return outer.func.attr
+    return ""
+
+
+def normalize_error_signature(code: str, error_msg: str, section_id: Optional[str] = None) -> str:
+    """Exception type + message template + offending call, independent of topic, paths and literal values"""
+    err = parse_error(error_msg, section_id)
+    template = err.message
+    template = re.sub(r"(/[^\s'\"]+)+", "<path>", template)
+    # Keep quoted identifiers (the missing name / attribute / kwarg), template everything else
+    template = re.sub(r"'([^']*)'", lambda m: m.group(0) if re.fullmatch(r"[\w.]+", m.group(1)) else "'<str>'", template)
+    template = re.sub(r"\b\d+(\.\d+)?\b", "<n>", template)
+    template = re.sub(r"0x[0-9a-f]+", "<addr>", template)
+    return f"{err.error_type or 'Unknown'}|{template}|{_call_on_line(code, err.line_number)}"
+
+
+def _token_fragments(old_line: str, new_line: str) -> Optional[List[Tuple[str, str]]]:
+    """Token-level (old, new) replacements inside one changed line, e.g. ('Crate', 'Create')"""
+    old_spans = [m.span() for m in re.finditer(r"\w+|[^\w\s]", old_line)]
+    new_spans = [m.span() for m in re.finditer(r"\w+|[^\w\s]", new_line)]
+    old_tokens = [old_line[a:b] for a, b in old_spans]
+    new_tokens = [new_line[a:b] for a, b in new_spans]
+    fragments = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        if i1 == i2:  # Pure insertions need the neighbouring token as anchor
+            if i1 == 0:
+                return None
+            i1 -= 1
+            j1 -= 1
+        old = old_line[old_spans[i1][0] : old_spans[i2 - 1][1]]
+        new = new_line[new_spans[j1][0] : new_spans[j2 - 1][1]] if j2 > j1 else ""
+        fragments.append((old, new))
+    return fragments or None
+
+
+def extract_minimal_patch(before: str, after: str) -> Optional[List[Dict[str, Any]]]:
+    """Line hunks that turn `before` into `after`, or None when the change is too large to reuse"""
+    a, b = before.split("\n"), after.split("\n")
+    hunks = []
+    changed = 0
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        changed += max(i2 - i1, j2 - j1)
+        removed = a[i1:i2]
+        base_indent = len(removed[0]) - len(removed[0].lstrip()) if removed else 0
+        fragments = None
+        if tag == "replace" and i2 - i1 == 1 and j2 - j1 == 1:
+            fragments = _token_fragments(a[i1].strip(), b[j1].strip())
+        hunks.append(
+            {
+                "anchor": a[i1 - 1].strip() if i1 > 0 else None,
+                "removed": [l.strip() for l in removed],
+                "added": [(len(l) - len(l.lstrip()) - base_indent, l.strip()) for l in b[j1:j2]],
+                "fragments": fragments,
+            }
+        )
+    if not hunks or len(hunks) > MAX_HUNKS or changed > MAX_CHANGED_LINES:
+        return None
+    return hunks
+
+
+def _apply_fragments(lines: List[str], fragments: List[Tuple[str, str]], near_line: Optional[int]) -> bool:
+    """Replace token fragments on the error line (or its neighbours) in place"""
+    if not near_line:
+        return False
+    for offset in (0, -1, 1):
+        idx = near_line - 1 + offset
+        if not (0 <= idx < len(lines)):
+            continue
+        line = lines[idx]
+        for old, new in fragments:
+            pattern = rf"\b{re.escape(old)}\b" if re.fullmatch(r"\w+", old) else re.escape(old)
+            if not re.search(pattern, line):
+                break
+            line = re.sub(pattern, lambda _: new, line, count=1)
+        else:
+            lines[idx] = line
+            return True
+    return False
+
+
+def apply_minimal_patch(code: str, hunks: List[Dict[str, Any]], near_line: Optional[int] = None) -> Optional[str]:
+    """Apply stored hunks by matching stripped lines (token fragments as fallback); None when a hunk cannot be located"""
+    lines = code.split("\n")
+    stripped = [l.strip() for l in lines]
+    for hunk in hunks:
+        removed = hunk["removed"]
+        if removed:
+            starts = [i for i in range(len(lines) - len(removed) + 1) if stripped[i : i + len(removed)] == removed]
+        elif hunk["anchor"] is None:
+            starts = [0]
+        else:
+            starts = [i + 1 for i, l in enumerate(stripped) if l == hunk["anchor"]]
+        if not starts:
+            # Same mistake in different code: replay the token-level change on the error line
+            if len(hunks) == 1 and hunk.get("fragments") and _apply_fragments(lines, hunk["fragments"], near_line):
+                continue
+            return None
+        start = min(starts, key=lambda i: abs(i + 1 - near_line)) if near_line else starts[0]
+        ref = lines[start] if removed else (lines[start - 1] if start > 0 else "")
+        indent = len(ref) - len(ref.lstrip())
+        new_lines = [" " * max(0, indent + rel) + text if text else "" for rel, text in hunk["added"]]
+        lines[start : start + len(removed)] = new_lines
+        stripped[start : start + len(removed)] = [l.strip() for l in new_lines]
+    return "\n".join(lines)
+
+
+class FixMemory:
+    """Persistent error-signature -> minimal patch memo, shared by all topics, processes and runs.
+
+    The memo lives in one JSON file (read-modify-write under a lock file); lookups, hits and
+    confirmations are appended to `<memo>.events.jsonl` so hit rates can be reported per run.
+    """
+
+    def __init__(self, path, run_name: str = ""):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.events_path = self.path.with_suffix(".events.jsonl")
+        self.lock_path = self.path.with_suffix(".lock")
+        self.run_name = run_name
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Any] = {}
+        self._cache_mtime = None
+
+    @staticmethod
+    def _key(signature: str) -> str:
+        return hashlib.sha1(signature.encode("utf-8")).hexdigest()[:16]
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            return {}
+        if mtime != self._cache_mtime:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._cache = json.load(f)
+                self._cache_mtime = mtime
+            except (json.JSONDecodeError, OSError):
+                return self._cache
+        return self._cache
+
+    def _update(self, mutate):
+        """Locked read-modify-write of the memo file"""
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._cache_mtime = None
+                data = dict(self._load())
+                mutate(data)
+                tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=1)
+                os.replace(tmp, self.path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _event(self, event: str, signature: str, **extra):
+        append_jsonl(
+            self.events_path,
+            {"ts": time.time(), "run": self.run_name, "event": event, "signature": signature, **extra},
+        )
+
+    def recall(self, code: str, error_msg: str, section_id: Optional[str] = None) -> Optional[Tuple[str, str, str]]:
+        """Return (patched_code, signature_key, patch_id) when a stored patch applies to this error"""
+        signature = normalize_error_signature(code, error_msg, section_id)
+        self._event("lookup", signature)
+        entry = self._load().get(self._key(signature))
+        if not entry:
+            return None
+
+        near_line = parse_error(error_msg, section_id).line_number
+        patches = sorted((p for p in entry["patches"] if not _rejected(p)), key=lambda p: -(p["successes"] - p["failures"]))
+        for patch in patches:
+            patched = apply_minimal_patch(code, patch["hunks"], near_line)
+            if not patched or patched == code:
+                continue
+            try:
+                compile(patched, "<fix_memory>", "exec")
+            except SyntaxError:
+                continue
+            self._event("hit", signature)
+            return patched, self._key(signature), patch["id"]
+        return None
+
+    def remember(self, error_msg: str, section_id: Optional[str], before: str, after: str, tokens: int = 0, seconds: float = 0.0):
+        """Store the minimal diff of a validated fix under the error's signature"""
+        hunks = extract_minimal_patch(before, after)
+        if hunks is None:
+            return False
+        signature = normalize_error_signature(before, error_msg, section_id)
+        key = self._key(signature)
+        patch_id = self._key(json.dumps(hunks, ensure_ascii=False))
+
+        def mutate(data):
+            entry = data.setdefault(key, {"signature": signature, "patches": []})
+            if any(p["id"] == patch_id for p in entry["patches"]):
+                return
+            if len(entry["patches"]) >= MAX_PATCHES_PER_SIGNATURE:
+                worst = min(entry["patches"], key=lambda p: p["successes"] - p["failures"])
+                entry["patches"].remove(worst)
+            entry["patches"].append(
+                {"id": patch_id, "hunks": hunks, "tokens": tokens, "seconds": round(seconds, 2), "successes": 0, "failures": 0}
+            )
+
+        self._update(mutate)
+        self._event("stored", signature)
+        return True
+
+    def confirm(self, key: str, patch_id: str, success: bool):
+        """Record whether the render after a recalled patch succeeded; a patch rejected more often than
+        confirmed is dropped, so the memo only replays fixes renders have validated"""
+        saved = {}
+
+        def mutate(data):
+            entry = data.get(key)
+            patch = next((p for p in (entry or {}).get("patches", []) if p["id"] == patch_id), None)
+            if patch is None:
+                return
+            patch["successes" if success else "failures"] += 1
+            saved.update(signature=entry["signature"], tokens=patch.get("tokens", 0), seconds=patch.get("seconds", 0))
+            if _rejected(patch):
+                entry["patches"].remove(patch)
+                if not entry["patches"]:
+                    del data[key]
+
+        self._update(mutate)
+        if saved:
+            self._event(
+                "confirmed" if success else "rejected",
+                saved["signature"],
+                tokens_saved=saved["tokens"] if success else 0,
+                seconds_saved=saved["seconds"] if success else 0,
+            )
+
+    def report(self, run_name: Optional[str] = None) -> Dict[str, Any]:
+        """Lookup/hit/confirmation counts and estimated savings, for one run or cumulatively"""
+        counts = {"lookup": 0, "hit": 0, "confirmed": 0, "rejected": 0, "stored": 0}
+        tokens_saved, seconds_saved = 0, 0.0
+        for ev in read_jsonl(self.events_path):
+            if run_name is not None and ev.get("run") != run_name:
+                continue
+            counts[ev.get("event")] = counts.get(ev.get("event"), 0) + 1
+            tokens_saved += ev.get("tokens_saved", 0)
+            seconds_saved += ev.get("seconds_saved", 0)
+        return {
+            "signatures": len(self._load()),
+            "lookups": counts["lookup"],
+            "hits": counts["hit"],
+            "confirmed": counts["confirmed"],
+            "rejected": counts["rejected"],
+            "stored": counts["stored"],
+            "hit_rate": counts["hit"] / counts["lookup"] if counts["lookup"] else 0.0,
+            "tokens_saved": tokens_saved,
+            "seconds_saved": round(seconds_saved, 1),
+        }
@@ -0,0 +1,129 @@
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: eviction runs unlocked
+    fcntl = None
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("CODE2VIDEO_CACHE", Path.home() / ".cache" / "code2video")) / "glyphs"
+DEFAULT_MAX_MB = 2048
+EVICT_TO_RATIO = 0.9  # Evict down to 90% of the cap so every publish does not trigger another sweep
+# Manim's typesetting caches under media_dir; file names are already content hashes
+# (Text: text + font settings, Tex: expression + template), and only the final .svg is ever reused.
+CACHED_DIRS = ("Tex", "texts")
+CACHED_SUFFIX = ".svg"
+
+
+class GlyphCache:
+    """Machine-wide store of Manim's Text/Tex SVGs shared by every topic and render worker.
+
+    Manim keeps typesetting private to each topic (`media/Tex`, `media/texts` under the topic's
+    output_dir). Once per topic, before its sections render, the topic directories are seeded with
+    hard links to the cached SVGs, so a glyph typeset by any earlier topic is a cache hit; after a
+    successful render the new SVGs are published back. Publishing writes a temp name and renames it
+    into place, so readers never see a partial file, and manim's own writes never touch the shared
+    directory.
+
+    Eviction is least recently used. A hard-linked copy shares its inode with the store entry, so
+    manim reading it in any topic advances the entry's access time (relatime updates it after the
+    link changed ctime); publishing touches the entry. On noatime mounts, or where the store had to
+    be copied, use time falls back to the last publish.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_mb: int = DEFAULT_MAX_MB):
+        self.root = Path(root) if root else DEFAULT_CACHE_DIR
+        self.max_bytes = max_mb * 1024 * 1024
+        for name in CACHED_DIRS:
+            (self.root / name).mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _link_or_copy(src: Path, dst: Path):
+        try:
+            os.link(src, dst)
+        except OSError:  # Different filesystem, or links unsupported
+            shutil.copy2(src, dst)
+
+    def seed(self, media_dir: Path) -> int:
+        """Link cached SVGs missing from a topic's media dir; returns the number added. Scans the whole
+        store, so call it once per topic rather than per render"""
+        added = 0
+        for name in CACHED_DIRS:
+            target = Path(media_dir) / name
+            target.mkdir(parents=True, exist_ok=True)
+            present = {entry.name for entry in os.scandir(target)}
+            for entry in os.scandir(self.root / name):
+                if not entry.name.endswith(CACHED_SUFFIX) or entry.name in present:
+                    continue
+                try:
+                    self._link_or_copy(Path(entry.path), target / entry.name)
+                    added += 1
+                except (FileExistsError, FileNotFoundError):  # Raced with manim or an eviction
+                    continue
+        return added
+
+    def publish(self, media_dir: Path) -> int:
+        """Atomically add a topic's newly typeset SVGs to the shared store; returns the number added"""
+        published = 0
+        for name in CACHED_DIRS:
+            source_dir = Path(media_dir) / name
+            if not source_dir.is_dir():
+                continue
+            store = self.root / name
+            for entry in os.scandir(source_dir):
+                if not entry.name.endswith(CACHED_SUFFIX) or (store / entry.name).exists():
+                    continue
+                tmp = store / f".{entry.name}.{uuid.uuid4().hex[:8]}.tmp"
+                try:
+                    self._link_or_copy(Path(entry.path), tmp)
+                    os.utime(tmp)  # Used now, whenever manim wrote it
+                    os.replace(tmp, store / entry.name)
+                    published += 1
+                except OSError:
+                    tmp.unlink(missing_ok=True)
+        if published:
+            self.evict()
+        return published
+
+    def size_bytes(self) -> int:
+        return sum(
+            entry.stat().st_size
+            for name in CACHED_DIRS
+            for entry in os.scandir(self.root / name)
+            if entry.name.endswith(CACHED_SUFFIX)
+        )
+
+    def evict(self) -> int:
+        """Drop the least recently used SVGs until the store is under EVICT_TO_RATIO of the cap"""
+        if self.max_bytes <= 0:
+            return 0
+        with open(self.root / ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                entries = []
+                for name in CACHED_DIRS:
+                    for entry in os.scandir(self.root / name):
+                        if entry.name.endswith(CACHED_SUFFIX):
+                            st = entry.stat()
+                            entries.append((max(st.st_atime, st.st_mtime), st.st_size, entry.path))
+                total = sum(size for _, size, _ in entries)
+                if total <= self.max_bytes:
+                    return 0
+                removed = 0
+                for _, size, path in sorted(entries):
+                    if total <= self.max_bytes * EVICT_TO_RATIO:
+                        break
+                    try:
+                        os.unlink(path)  # Topics that linked it keep their own copy
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    removed += 1
+                return removed
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
@@ -1,17 +1,33 @@
-import openai
+import importlib
 import time
 import random
 import os
 import base64
-from openai import OpenAI
-from anthropic import AnthropicFoundry
-from google import genai
-from google.genai import types
+import threading
 import time
 import json
 import pathlib
 
 
+class _LazyModule:
+    """Imports an SDK on first attribute access; pool processes that never call a provider skip the import"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+openai = _LazyModule("openai")
+anthropic = _LazyModule("anthropic")
+genai = _LazyModule("google.genai")
+types = _LazyModule("google.genai.types")
+
+
 # Read and cache once
 _CFG_PATH = pathlib.Path(__file__).with_name("api_config.json")
 with _CFG_PATH.open("r", encoding="utf-8") as _f:
@@ -22,6 +38,92 @@ def cfg(svc: str, key: str, default=None):
     return os.getenv(f"{svc}_{key}".upper(), _CFG.get(svc, {}).get(key, default))
 
 
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def cached_client(factory, **kwargs):
+    """One SDK client per (class, settings) per process, so connection pools stay warm between requests"""
+    key = (factory, tuple(sorted(kwargs.items())))
+    with _CLIENTS_LOCK:
+        if key not in _CLIENTS:
+            _CLIENTS[key] = factory(**kwargs)
+        return _CLIENTS[key]
+
+
+_INHERITED_CLIENTS = []
+
+
+def _drop_clients_after_fork():
+    """A forked child (fork-started pool worker) must not share the parent's keep-alive sockets.
+
+    The inherited clients stay referenced rather than closed or collected, so the child never sends
+    anything on connections the parent is still using; the child's own clients are built on first use.
+    """
+    global _CLIENTS_LOCK
+    _INHERITED_CLIENTS.extend(_CLIENTS.values())
+    _CLIENTS.clear()
+    _CLIENTS_LOCK = threading.Lock()  # May have been held by another parent thread at fork time
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_drop_clients_after_fork)
+
+
+# request_* name prefix -> api_config.json service; gpt51 before gpt5 so the longer prefix wins
+_REQUEST_SERVICES = (
+    ("request_claude", "claude"),
+    ("request_gemini", "gemini"),
+    ("request_gpt4o", "gpt4o"),
+    ("request_o4mini", "gpt4omini"),
+    ("request_gpt51", "gpt51"),
+    ("request_gpt5", "gpt5"),
+    ("request_gpt41", "gpt41"),
+)
+
+
+def warm_client(request_fn) -> bool:
+    """Build the cached client a request_* function uses before its first call (process pool initializers).
+
+    The settings must match the ones in the request functions exactly, or the warm client is a cache miss.
+    """
+    name = getattr(request_fn, "__name__", "")
+    svc = next((svc for prefix, svc in _REQUEST_SERVICES if name.startswith(prefix)), None)
+    if svc is None:
+        return False
+    try:
+        if name == "request_gemini_video_img":
+            cached_client(genai.Client, api_key=cfg(svc, "api_key"))
+        elif svc == "claude":
+            cached_client(anthropic.AnthropicFoundry, api_key=cfg(svc, "api_key"), base_url=cfg(svc, "base_url"))
+        elif svc == "gpt51":
+            cached_client(openai.OpenAI, base_url=cfg(svc, "base_url"), api_key=cfg(svc, "api_key"))
+        else:
+            cached_client(
+                openai.AzureOpenAI,
+                azure_endpoint=cfg(svc, "base_url"),
+                api_version=cfg(svc, "api_version"),
+                api_key=cfg(svc, "api_key"),
+            )
+    except Exception:
+        return False  # Missing SDK or credentials: the first real request reports it
+    return True
+
+
+def get_model_prices():
+    """Optional USD prices per 1M tokens, read from `price_prompt_per_1m` / `price_completion_per_1m` in api_config.json"""
+    prices = {}
+    for svc, svc_cfg in _CFG.items():
+        if not isinstance(svc_cfg, dict) or "model" not in svc_cfg:
+            continue
+        prompt_price = svc_cfg.get("price_prompt_per_1m")
+        completion_price = svc_cfg.get("price_completion_per_1m")
+        if prompt_price is None and completion_price is None:
+            continue
+        prices[svc_cfg["model"]] = {"prompt": float(prompt_price or 0), "completion": float(completion_price or 0)}
+    return prices
+
+
 def generate_log_id():
     """Generate a log ID with 'tkb' prefix and current timestamp."""
     return f"tkb{int(time.time() * 1000)}"
@@ -32,7 +134,8 @@ def request_claude(prompt, log_id=None, max_tokens=16384, max_retries=3):
     api_key = cfg("claude", "api_key")
     model_name = cfg("claude", "model")
 
-    client = AnthropicFoundry(
+    client = cached_client(
+        anthropic.AnthropicFoundry,
         api_key=api_key,
         base_url=base_url
     )
@@ -74,7 +177,8 @@ def request_claude_token(prompt, log_id=None, max_tokens=10000, max_retries=3):
     api_key = cfg("claude", "api_key")
     model_name = cfg("claude", "model")
 
-    client = AnthropicFoundry(
+    client = cached_client(
+        anthropic.AnthropicFoundry,
         api_key=api_key,
         base_url=base_url
     )
@@ -82,7 +186,7 @@ def request_claude_token(prompt, log_id=None, max_tokens=10000, max_retries=3):
     if log_id is None:
         log_id = generate_log_id()
 
-    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "model": model_name, "retries": 0}
 
     retry_count = 0
     while retry_count < max_retries:
@@ -106,6 +210,7 @@ def request_claude_token(prompt, log_id=None, max_tokens=10000, max_retries=3):
 
         except Exception as e:
             retry_count += 1
+            usage_info["retries"] = retry_count
             if retry_count >= max_retries:
                 raise Exception(f"Failed after {max_retries} attempts. Last error: {str(e)}")
 
@@ -138,7 +243,8 @@ def request_gemini_with_video(prompt: str, video_path: str, log_id=None, max_tok
     api_key = cfg("gemini", "api_key")
     model_name = cfg("gemini", "model")
 
-    client = openai.AzureOpenAI(
+    client = cached_client(
+        openai.AzureOpenAI,
         azure_endpoint=base_url,
         api_version=api_version,
         api_key=api_key,
@@ -209,7 +315,7 @@ def request_gemini_video_img(
     model_name = cfg("gemini", "model")
 
     # Initialize Google genai client
-    client = genai.Client(api_key=api_key)
+    client = cached_client(genai.Client, api_key=api_key)
 
     # Check files exist
     if not os.path.exists(video_path):
@@ -271,7 +377,8 @@ def request_gemini_video_img_token(
     api_key = cfg("gemini", "api_key")
     model_name = cfg("gemini", "model")
 
-    client = openai.AzureOpenAI(
+    client = cached_client(
+        openai.AzureOpenAI,
         azure_endpoint=base_url,
         api_version=api_version,
         api_key=api_key,
@@ -282,7 +389,7 @@ def request_gemini_video_img_token(
 
     extra_headers = {"X-TT-LOGID": log_id}
 
-    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "model": model_name, "retries": 0}
 
     # Load and base64-encode video
     if not os.path.exists(video_path):
@@ -334,6 +441,7 @@ def request_gemini_video_img_token(
 
         except Exception as e:
             retry_count += 1
+            usage_info["retries"] = retry_count
             if retry_count >= max_retries:
                 raise Exception(f"Failed after {max_retries} attempts. Last error: {str(e)}")
             delay = (2**retry_count) * 0.2 + random.random() * 0.2
@@ -360,7 +468,8 @@ def request_gemini(prompt, log_id=None, max_tokens=8000, max_retries=3):
     api_key = cfg("gemini", "api_key")
     model_name = cfg("gemini", "model")
 
-    client = openai.AzureOpenAI(
+    client = cached_client(
+        openai.AzureOpenAI,
         azure_endpoint=base_url,
         api_version=api_version,
         api_key=api_key,
@@ -413,7 +522,8 @@ def request_gemini_token(prompt, log_id=None, max_tokens=8000, max_retries=3):
     api_key = cfg("gemini", "api_key")
     model_name = cfg("gemini", "model")
 
-    client = openai.AzureOpenAI(
+    client = cached_client(
+        openai.AzureOpenAI,
         azure_endpoint=base_url,
         api_version=api_version,
         api_key=api_key,
@@ -424,7 +534,7 @@ def request_gemini_token(prompt, log_id=None, max_tokens=8000, max_retries=3):
 
     extra_headers = {"X-TT-LOGID": log_id}
 
-    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "model": model_name, "retries": 0}
 
     retry_count = 0
     while retry_count < max_retries:
@@ -444,6 +554,7 @@ def request_gemini_token(prompt, log_id=None, max_tokens=8000, max_retries=3):
 
         except Exception as e:
             retry_count += 1
+            usage_info["retries"] = retry_count
             if retry_count >= max_retries:
                 raise Exception(f"Failed after {max_retries} attempts. Last error: {str(e)}")
 
@@ -475,7 +586,8 @@ def request_gpt4o(prompt, log_id=None, max_tokens=8000, max_retries=3):
     ak = cfg("gpt4o", "api_key")
     model_name = cfg("gpt4o", "model")
 
-    client = openai.AzureOpenAI(
+    client = cached_client(
+        openai.AzureOpenAI,
         azure_endpoint=base_url,
         api_version=api_version,
         api_key=ak,
@@ -537,7 +649,8 @@ def request_gpt4o_token(prompt, log_id=None, max_tokens=8000, max_retries=3):
     ak = cfg("gpt4o", "api_key")
     model_name = cfg("gpt4o", "model")
 
-    client = openai.AzureOpenAI(
+    client = cached_client(
+        openai.AzureOpenAI,
         azure_endpoint=base_url,
         api_version=api_version,
         api_key=ak,
@@ -548,7 +661,7 @@ def request_gpt4o_token(prompt, log_id=None, max_tokens=8000, max_retries=3):
 
     extra_headers = {"X-TT-LOGID": log_id}
 
-    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "model": model_name, "retries": 0}
 
     retry_count = 0
     while retry_count < max_retries:
@@ -578,6 +691,7 @@ def request_gpt4o_token(prompt, log_id=None, max_tokens=8000, max_retries=3):
 
         except Exception as e:
             retry_count += 1
+            usage_info["retries"] = retry_count
             if retry_count >= max_retries:
                 raise Exception(f"Failed after {max_retries} attempts. Last error: {str(e)}")
 
@@ -609,7 +723,8 @@ def request_o4mini(prompt, log_id=None, max_tokens=8000, max_retries=3, thinking
     ak = cfg("gpt4omini", "api_key")
     model_name = cfg("gpt4omini", "model")
 
-    client = openai.AzureOpenAI(
+    client = cached_client(
+        openai.AzureOpenAI,
         azure_endpoint=base_url,
         api_version=api_version,
         api_key=ak,
@@ -668,7 +783,8 @@ def request_o4mini_token(prompt, log_id=None, max_tokens=8000, max_retries=3, th
     ak = cfg("gpt4omini", "api_key")
     model_name = cfg("gpt4omini", "model")
 
-    client = openai.AzureOpenAI(
+    client = cached_client(
+        openai.AzureOpenAI,
         azure_endpoint=base_url,
         api_version=api_version,
         api_key=ak,
@@ -679,7 +795,7 @@ def request_o4mini_token(prompt, log_id=None, max_tokens=8000, max_retries=3, th
 
     extra_headers = {"X-TT-LOGID": log_id}
 
-    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "model": model_name, "retries": 0}
 
     # Configure extra_body for thinking if enabled
     extra_body = None
@@ -705,6 +821,7 @@ def request_o4mini_token(prompt, log_id=None, max_tokens=8000, max_retries=3, th
 
         except Exception as e:
             retry_count += 1
+            usage_info["retries"] = retry_count
             if retry_count >= max_retries:
                 raise Exception(f"Failed after {max_retries} attempts. Last error: {str(e)}")
 
@@ -736,7 +853,8 @@ def request_gpt5(prompt, log_id=None, max_tokens=1000, max_retries=3):
     ak = cfg("gpt5", "api_key")
     model_name = cfg("gpt5", "model")
 
-    client = openai.AzureOpenAI(
+    client = cached_client(
+        openai.AzureOpenAI,
         azure_endpoint=base_url,
         api_version=api_version,
         api_key=ak,
@@ -788,7 +906,8 @@ def request_gpt5_token(prompt, log_id=None, max_tokens=1000, max_retries=3):
     ak = cfg("gpt5", "api_key")
     model_name = cfg("gpt5", "model")
 
-    client = openai.AzureOpenAI(
+    client = cached_client(
+        openai.AzureOpenAI,
         azure_endpoint=base_url,
         api_version=api_version,
         api_key=ak,
@@ -799,7 +918,7 @@ def request_gpt5_token(prompt, log_id=None, max_tokens=1000, max_retries=3):
 
     extra_headers = {"X-TT-LOGID": log_id}
 
-    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "model": model_name, "retries": 0}
 
     retry_count = 0
     while retry_count < max_retries:
@@ -819,6 +938,7 @@ def request_gpt5_token(prompt, log_id=None, max_tokens=1000, max_retries=3):
 
         except Exception as e:
             retry_count += 1
+            usage_info["retries"] = retry_count
             if retry_count >= max_retries:
                 raise Exception(f"Failed after {max_retries} attempts. Last error: {str(e)}")
 
@@ -849,7 +969,8 @@ def request_gpt41(prompt, log_id=None, max_tokens=1000, max_retries=3):
     api_key = cfg("gpt41", "api_key")
     model_name = cfg("gpt41", "model")
 
-    client = openai.AzureOpenAI(
+    client = cached_client(
+        openai.AzureOpenAI,
         azure_endpoint=base_url,
         api_version=api_version,
         api_key=api_key,
@@ -901,7 +1022,8 @@ def request_gpt41_token(prompt, log_id=None, max_tokens=1000, max_retries=3):
     ak = cfg("gpt41", "api_key")
     model_name = cfg("gpt41", "model")
 
-    client = openai.AzureOpenAI(
+    client = cached_client(
+        openai.AzureOpenAI,
         azure_endpoint=base_url,
         api_version=api_version,
         api_key=ak,
@@ -911,7 +1033,7 @@ def request_gpt41_token(prompt, log_id=None, max_tokens=1000, max_retries=3):
         log_id = generate_log_id()
 
     extra_headers = {"X-TT-LOGID": log_id}
-    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "model": model_name, "retries": 0}
 
     retry_count = 0
     while retry_count < max_retries:
@@ -931,6 +1053,7 @@ def request_gpt41_token(prompt, log_id=None, max_tokens=1000, max_retries=3):
 
         except Exception as e:
             retry_count += 1
+            usage_info["retries"] = retry_count
             if retry_count >= max_retries:
                 # 即使失败也返回，以便主程序可以继续
                 print(f"Failed after {max_retries} attempts. Last error: {str(e)}")
@@ -962,7 +1085,8 @@ def request_gpt41_img(prompt, image_path=None, log_id=None, max_tokens=1000, max
     ak = cfg("gpt41", "api_key")
     model_name = cfg("gpt41", "model")
 
-    client = openai.AzureOpenAI(
+    client = cached_client(
+        openai.AzureOpenAI,
         azure_endpoint=base_url,
         api_version=api_version,
         api_key=ak,
@@ -1035,7 +1159,8 @@ def request_gpt51(prompt, log_id=None, max_completion_tokens=8000, max_retries=3
     model_name = cfg("gpt51", "model")
 
     # Use OpenAI client with Azure OpenAI compatible endpoint
-    client = OpenAI(
+    client = cached_client(
+        openai.OpenAI,
         base_url=base_url,
         api_key=api_key,
     )
@@ -1092,7 +1217,8 @@ def request_gpt51_token(prompt, log_id=None, max_completion_tokens=8000, max_ret
     model_name = cfg("gpt51", "model")
 
     # Use OpenAI client with Azure OpenAI compatible endpoint
-    client = OpenAI(
+    client = cached_client(
+        openai.OpenAI,
         base_url=base_url,
         api_key=api_key,
     )
@@ -1101,7 +1227,7 @@ def request_gpt51_token(prompt, log_id=None, max_completion_tokens=8000, max_ret
         log_id = generate_log_id()
 
     extra_headers = {"X-TT-LOGID": log_id}
-    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    usage_info = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "model": model_name, "retries": 0}
 
     retry_count = 0
     while retry_count < max_retries:
@@ -1121,6 +1247,7 @@ def request_gpt51_token(prompt, log_id=None, max_completion_tokens=8000, max_ret
 
         except Exception as e:
             retry_count += 1
+            usage_info["retries"] = retry_count
             if retry_count >= max_retries:
                 print(f"Failed after {max_retries} attempts. Last error: {str(e)}")
                 return None, usage_info
@@ -1156,7 +1283,8 @@ def request_gpt51_video_img(
     api_key = cfg("gpt51", "api_key")
     model_name = cfg("gpt51", "model")
 
-    client = OpenAI(
+    client = cached_client(
+        openai.OpenAI,
         base_url=base_url,
         api_key=api_key,
     )
@@ -0,0 +1,110 @@
+import argparse
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+DEFAULT_MODULES = ("agent", "eval_AES", "eval_TQ", "helpers", "gpt_request")
+# import time:       self [us] |  cumulative | imported package
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """`-X importtime` lines as {module, self_ms, cumulative_ms, depth}; depth 0 are the top-level imports"""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append(
+                {
+                    "module": module,
+                    "self_ms": int(self_us) / 1000,
+                    "cumulative_ms": int(cumulative_us) / 1000,
+                    "depth": (len(indent) - 1) // 2,
+                }
+            )
+    return rows
+
+
+def measure(module: str, cwd: Path) -> Dict[str, Any]:
+    """Import `module` in a fresh interpreter, as a spawned pool worker would"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    rows = parse_importtime(proc.stderr)
+    # Interpreter startup (site, encodings) is logged first at depth 0; the module's own tree ends with its row
+    ends = [i for i, row in enumerate(rows) if row["depth"] == 0 and row["module"] == module]
+    end = ends[-1] if ends else len(rows) - 1
+    begin = max((i for i, row in enumerate(rows[:end]) if row["depth"] == 0), default=-1) + 1
+    tree = rows[begin : end + 1]
+    result = {"module": module, "ok": proc.returncode == 0, "rows": tree}
+    result["total_ms"] = round(tree[-1]["cumulative_ms"], 1) if ends else 0.0
+    if proc.returncode != 0:
+        result["error"] = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+    return result
+
+
+def best_of(module: str, cwd: Path, repeat: int) -> Dict[str, Any]:
+    """Fastest of `repeat` runs; the first one also pays for cold .pyc and page caches"""
+    runs = [measure(module, cwd) for _ in range(max(1, repeat))]
+    return min(runs, key=lambda r: (not r["ok"], r["total_ms"]))
+
+
+def slowest(rows: List[Dict[str, Any]], top: int) -> List[Dict[str, Any]]:
+    """Direct imports of the module by cumulative time: these are what a lazy import would save"""
+    ranked = sorted((row for row in rows if row["depth"] == 1), key=lambda row: row["cumulative_ms"], reverse=True)
+    return [{"module": row["module"], "cumulative_ms": round(row["cumulative_ms"], 1)} for row in ranked[:top]]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Startup import cost of the agent and evaluators (python -X importtime)")
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    parser.add_argument("--repeat", type=int, help="runs per module, fastest is kept", default=3)
+    parser.add_argument("--top", type=int, help="# slowest imports shown per module", default=8)
+    parser.add_argument("--budget_ms", type=float, help="fail if any module's import exceeds this, 0 = off", default=0)
+    parser.add_argument("--baseline", type=str, help="earlier --output file to compare against", default=None)
+    parser.add_argument("--max_regression", type=float, help="allowed slowdown vs. baseline, as a fraction", default=0.25)
+    parser.add_argument("--output", type=str, help="write results as JSON", default=None)
+    args = parser.parse_args(argv)
+
+    src = Path(__file__).resolve().parent
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {r["module"]: r["total_ms"] for r in json.load(f)["modules"]}
+
+    results, problems = [], []
+    for module in args.modules:
+        result = best_of(module, src, args.repeat)
+        result["slowest"] = slowest(result.pop("rows"), args.top)
+        results.append(result)
+        if not result["ok"]:
+            print(f"❌ {module}: {result['error']}")
+            problems.append(f"{module} failed to import")
+            continue
+        print(f"⏱️ {module}: {result['total_ms']:.1f} ms")
+        for row in result["slowest"]:
+            print(f"     {row['cumulative_ms']:>8.1f} ms  {row['module']}")
+        if args.budget_ms and result["total_ms"] > args.budget_ms:
+            problems.append(f"{module} imports in {result['total_ms']:.1f} ms > {args.budget_ms} ms")
+        previous = baseline.get(module)
+        if previous and result["total_ms"] > previous * (1 + args.max_regression):
+            problems.append(f"{module} imports in {result['total_ms']:.1f} ms, baseline {previous:.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "modules": results}, f, ensure_ascii=False, indent=2)
+        print(f"📄 {args.output}")
+    for problem in problems:
+        print(f"❌ {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
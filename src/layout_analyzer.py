@@ -0,0 +1,324 @@
+import json
+import sys
+import traceback
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from sandbox import apply_resource_limits, get_sandbox_pool, load_section_module
+from scope_refine import GridPositionExtractor
+
+FRAME_MARGIN = 0.1  # Scene units a bbox may poke out of the frame before it counts as off-screen
+OVERLAP_RATIO = 0.15  # Intersection / smaller bbox area above which two elements overlap
+CONTAINED_RATIO = 0.95  # ...unless one sits fully inside the other (label in a box, highlight)
+OBSTRUCTION_RATIO = 0.02  # Any real intrusion into the title / lecture area counts
+MAX_FIXES = 3  # Same cap the MLLM layout prompt uses
+# Frame of the real render (-r 1080,1920) and of TeachingScene's grid; landscape keeps manim's defaults
+PORTRAIT_FRAME = {"pixel_width": 1080, "pixel_height": 1920, "frame_width": 9.0, "frame_height": 16.0}
+# Decorations that are meant to overlap what they decorate
+DECORATION_CLASSES = {
+    "SurroundingRectangle", "BackgroundRectangle", "Brace", "BraceLabel", "BraceBetweenPoints", "Underline", "Cross",
+    "Arrow", "Line", "DashedLine", "DoubleArrow", "CurvedArrow", "Vector", "NumberPlane", "Axes",
+}
+
+Box = Tuple[float, float, float, float]  # (left, bottom, right, top)
+
+
+def _area(b: Box) -> float:
+    return max(0.0, b[2] - b[0]) * max(0.0, b[3] - b[1])
+
+
+def _intersection(a: Box, b: Box) -> float:
+    return _area((max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])))
+
+
+def _overlap_ratio(a: Box, b: Box) -> float:
+    smaller = min(_area(a), _area(b))
+    return _intersection(a, b) / smaller if smaller > 1e-6 else 0.0
+
+
+# ---------------------------------------------------------------------------------------------
+# Worker side: headless construct() with bbox snapshots
+# ---------------------------------------------------------------------------------------------
+
+
+def _snapshot_job(
+    code: str, section_id: str, scene_name: str, cwd: str, cpu_seconds: int, portrait: bool = True
+) -> Dict[str, Any]:
+    """Runs inside a sandbox worker: construct the scene with animations skipped and record bboxes"""
+    apply_resource_limits(cpu_seconds=cpu_seconds)
+    try:
+        from manim import Mobject, VMobject, config, tempconfig
+
+        # dry_run: no partial movie files, no frames written. tempconfig restores the worker's config
+        # afterwards, so later dry runs and chrome prebuilds in this worker are unaffected
+        overrides = {"dry_run": True, **(PORTRAIT_FRAME if portrait else {})}
+        with tempconfig(overrides), load_section_module(code, section_id, cwd) as module:
+            scene = getattr(module, scene_name)()
+            # Skipped animations jump straight to their end state: same final geometry, no frames
+            scene.renderer._original_skipping_status = True
+            scene.renderer.skip_animations = True
+            section_file = module.__file__
+            snapshots: List[Dict[str, Any]] = []
+            depth = [0]
+
+            def visible(m) -> bool:
+                if m.width < 1e-3 and m.height < 1e-3:
+                    return False
+                for sub in m.get_family():
+                    if not isinstance(sub, VMobject):
+                        return True  # Images and other non-vector mobjects have no opacity to check
+                    if sub.has_points() and (
+                        sub.get_fill_opacity() > 0.01 or (sub.get_stroke_opacity() > 0.01 and sub.get_stroke_width() > 0)
+                    ):
+                        return True
+                return False
+
+            def snapshot(kind: str):
+                frame = sys._getframe()
+                while frame is not None and frame.f_code.co_filename != section_file:
+                    frame = frame.f_back
+                names = {}
+                if frame is not None:
+                    names = {id(v): k for k, v in frame.f_locals.items() if k != "self" and isinstance(v, Mobject)}
+                for k, v in vars(scene).items():
+                    if isinstance(v, Mobject):
+                        names.setdefault(id(v), f"self.{k}")
+                items = []
+                for m in scene.mobjects:
+                    if not visible(m):
+                        continue
+                    items.append(
+                        {
+                            "id": id(m),
+                            "name": names.get(id(m)),
+                            "cls": type(m).__name__,
+                            "bbox": [float(m.get_left()[0]), float(m.get_bottom()[1]), float(m.get_right()[0]), float(m.get_top()[1])],
+                        }
+                    )
+                snapshots.append({"kind": kind, "line": frame.f_lineno if frame is not None else None, "mobjects": items})
+
+            def wrap(method, kind):
+                def wrapped(*args, **kwargs):
+                    depth[0] += 1
+                    try:
+                        return method(*args, **kwargs)
+                    finally:
+                        depth[0] -= 1
+                        if depth[0] == 0:  # wait() plays a Wait animation: snapshot once
+                            snapshot(kind)
+
+                return wrapped
+
+            scene.play = wrap(scene.play, "play")
+            scene.wait = wrap(scene.wait, "wait")
+            scene.setup()
+            scene.construct()
+
+            grid = {k: [float(v[0]), float(v[1])] for k, v in getattr(scene, "grid", {}).items()}
+            return {
+                "ok": True,
+                "frame": [float(config.frame_width), float(config.frame_height)],
+                "grid": grid,
+                "title_id": id(getattr(scene, "title", None)),
+                "lecture_id": id(getattr(scene, "lecture", None)),
+                "snapshots": snapshots,
+            }
+    except BaseException:
+        return {"ok": False, "error": traceback.format_exc()}
+
+
+def collect_layout_snapshots(
+    code: str, section_id: str, output_dir: Path, timeout: float = 60, portrait: bool = True
+) -> Dict[str, Any]:
+    scene_name = f"{section_id.title().replace('_', '')}Scene"
+    pool = get_sandbox_pool()
+    result, error = pool.run(
+        _snapshot_job,
+        code,
+        section_id,
+        scene_name,
+        str(Path(output_dir).resolve()),
+        pool.cpu_seconds * 3,
+        portrait,
+        timeout=timeout,
+        label=f"layout analysis of {section_id}",
+    )
+    return result if error is None else {"ok": False, "error": error}
+
+
+# ---------------------------------------------------------------------------------------------
+# Parent side: pure geometry over the snapshots
+# ---------------------------------------------------------------------------------------------
+
+
+@dataclass
+class LayoutIssue:
+    kind: str  # off_screen / lecture_obstruction / title_obstruction / overlap
+    names: List[str]
+    code_line: Optional[int]  # Line of the play/wait after which the issue is visible
+    description: str
+    fix: Optional[str] = None  # "Line X: self.place_at_grid(...)" when geometry can propose one
+
+
+@dataclass
+class LayoutReport:
+    ok: bool
+    issues: List[LayoutIssue] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def improvements(self) -> List[str]:
+        """Feedback strings in the format GridCodeModifier.parse_feedback_and_modify consumes"""
+        improvements, fixes = [], set()
+        for issue in self.issues:
+            if issue.fix and issue.fix not in fixes:
+                fixes.add(issue.fix)
+                improvements.append(f"[LAYOUT] Problem: {issue.description}; Solution: {issue.fix}")
+        return improvements
+
+    @property
+    def unfixable(self) -> List[LayoutIssue]:
+        return [i for i in self.issues if not i.fix]
+
+    def summary(self) -> str:
+        if not self.ok:
+            return "static layout analysis unavailable"
+        if not self.issues:
+            return "no overlaps, off-screen elements or lecture/title obstructions detected geometrically"
+        return "; ".join(i.description for i in self.issues)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False, indent=2)
+
+
+class StaticLayoutAnalyzer:
+    """Detects overlaps, off-screen elements and title/lecture obstruction from bbox snapshots and
+    proposes place_at_grid moves to free grid cells"""
+
+    def __init__(self, code: str, data: Dict[str, Any]):
+        self.code = code
+        self.data = data
+        self.frame_w, self.frame_h = data.get("frame", [PORTRAIT_FRAME["frame_width"], PORTRAIT_FRAME["frame_height"]])
+        self.grid: Dict[str, Tuple[float, float]] = {k: tuple(v) for k, v in data.get("grid", {}).items()}
+        xs = sorted({x for x, _ in self.grid.values()})
+        ys = sorted({y for _, y in self.grid.values()})
+        self.cell_w = min((b - a for a, b in zip(xs, xs[1:])), default=2.0)
+        self.cell_h = min((b - a for a, b in zip(ys, ys[1:])), default=2.0)
+        # Last place_at_grid / place_in_area call per variable: the line a fix replaces
+        self.placements = {}
+        for pos in GridPositionExtractor().extract_grid_positions(code):
+            self.placements[pos.object_name] = pos
+        self._claimed_cells: set = set()
+        self._fixes: Dict[str, Optional[str]] = {}  # One move per element, reused by all its issues
+
+    def _in_frame(self, b: Box) -> bool:
+        hw, hh = self.frame_w / 2 + FRAME_MARGIN, self.frame_h / 2 + FRAME_MARGIN
+        return b[0] >= -hw and b[2] <= hw and b[1] >= -hh and b[3] <= hh
+
+    def analyze(self) -> LayoutReport:
+        if not self.data.get("ok"):
+            return LayoutReport(ok=False, error=self.data.get("error"))
+
+        report, seen = LayoutReport(ok=True), set()
+        title_id, lecture_id = self.data.get("title_id"), self.data.get("lecture_id")
+        for snap in self.data.get("snapshots", []):
+            items = snap["mobjects"]
+            chrome = {m["id"]: m for m in items if m["id"] in (title_id, lecture_id)}
+            content = [m for m in items if m["id"] not in chrome]
+
+            def add(kind, members, description, mover=None):
+                key = (kind, tuple(sorted(m["name"] or m["cls"] for m in members)))
+                if key in seen:
+                    return
+                seen.add(key)
+                names = [m["name"] or f"<unnamed {m['cls']}>" for m in members]
+                fix = self._propose_fix(mover, items) if mover else None
+                report.issues.append(LayoutIssue(kind, names, snap["line"], description, fix))
+
+            for m in content:
+                if not self._in_frame(tuple(m["bbox"])):
+                    add("off_screen", [m], f"{self._label(m)} extends outside the visible frame", mover=m)
+                for cid, c in chrome.items():
+                    if _intersection(tuple(m["bbox"]), tuple(c["bbox"])) > OBSTRUCTION_RATIO * _area(tuple(m["bbox"])):
+                        area = "lecture lines" if cid == lecture_id else "title"
+                        kind = "lecture_obstruction" if cid == lecture_id else "title_obstruction"
+                        add(kind, [m], f"{self._label(m)} covers the {area}", mover=m)
+
+            for i, a in enumerate(content):
+                for b in content[i + 1 :]:
+                    if a["cls"] in DECORATION_CLASSES or b["cls"] in DECORATION_CLASSES:
+                        continue
+                    ratio = _overlap_ratio(tuple(a["bbox"]), tuple(b["bbox"]))
+                    if OVERLAP_RATIO < ratio < CONTAINED_RATIO:
+                        mover = self._pick_mover(a, b)
+                        add("overlap", [a, b], f"{self._label(a)} overlaps {self._label(b)}", mover=mover)
+
+        kept = []
+        for issue in report.issues:  # Keep the geometry's top fixes, like the MLLM prompt's cap
+            if issue.fix and issue.fix not in kept:
+                if len(kept) >= MAX_FIXES:
+                    issue.fix = None
+                else:
+                    kept.append(issue.fix)
+        return report
+
+    @staticmethod
+    def _label(m) -> str:
+        return f"{m['name']} ({m['cls']})" if m["name"] else f"an unnamed {m['cls']}"
+
+    def _pick_mover(self, a, b):
+        """Move the element placed later in the code (usually the one that was added on top)"""
+        la = self.placements.get(a["name"]) if a["name"] else None
+        lb = self.placements.get(b["name"]) if b["name"] else None
+        if la and lb:
+            return a if la.line_number > lb.line_number else b
+        return a if la else b if lb else None
+
+    def _propose_fix(self, m, items) -> Optional[str]:
+        placement = self.placements.get(m["name"]) if m["name"] else None
+        if placement is None or not self.grid:
+            return None  # Not positioned through the grid: leave it to the MLLM critic
+        if m["name"] in self._fixes:
+            return self._fixes[m["name"]]
+        self._fixes[m["name"]] = self._free_cell_fix(m, placement, items)
+        return self._fixes[m["name"]]
+
+    def _free_cell_fix(self, m, placement, items) -> Optional[str]:
+        left, bottom, right, top = m["bbox"]
+        width, height = right - left, top - bottom
+        cx, cy = (left + right) / 2, (bottom + top) / 2
+        # Fit within two grid cells and the frame
+        adjust = min(1.0, (2 * self.cell_w) / width if width else 1.0, (self.frame_w - 2 * FRAME_MARGIN) / width if width else 1.0)
+        new_w, new_h = width * adjust, height * adjust
+
+        others = [tuple(o["bbox"]) for o in items if o["id"] != m["id"]]
+        best = None
+        for cell, (gx, gy) in sorted(self.grid.items(), key=lambda kv: (kv[1][0] - cx) ** 2 + (kv[1][1] - cy) ** 2):
+            if cell in self._claimed_cells:
+                continue
+            box = (gx - new_w / 2, gy - new_h / 2, gx + new_w / 2, gy + new_h / 2)
+            if not self._in_frame(box):
+                continue
+            if any(_intersection(box, o) > OBSTRUCTION_RATIO * max(_area(box), 1e-6) for o in others):
+                continue
+            best = cell
+            break
+        if best is None:
+            return None
+
+        self._claimed_cells.add(best)
+        scale = round((placement.scale_factor or 1.0) * adjust, 2)
+        scale_arg = f", scale_factor={scale}" if scale != 1.0 else ""
+        return f"Line {placement.line_number}: self.place_at_grid({placement.object_name}, '{best}'{scale_arg})"
+
+
+def analyze_section_layout(
+    code: str, section_id: str, output_dir: Path, timeout: float = 60, portrait: bool = True
+) -> LayoutReport:
+    """Headless construct() in the sandbox pool + geometric checks; never raises"""
+    try:
+        data = collect_layout_snapshots(code, section_id, output_dir, timeout=timeout, portrait=portrait)
+        return StaticLayoutAnalyzer(code, data).analyze()
+    except Exception as e:
+        return LayoutReport(ok=False, error=str(e))
@@ -0,0 +1,425 @@
+import ast
+import builtins
+import difflib
+import inspect
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+INDEX_FORMAT = 1
+DEFAULT_CACHE_DIR = Path(os.environ.get("CODE2VIDEO_CACHE", Path.home() / ".cache" / "code2video"))
+
+# Mobject.__getattr__ resolves get_<attr>/set_<attr> dynamically, so these never raise at call time
+DYNAMIC_PREFIXES = ("get_", "set_")
+
+
+def _installed_manim_version() -> Optional[str]:
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:  # Python < 3.8
+        return None
+    try:
+        return version("manim")
+    except PackageNotFoundError:
+        return None
+
+
+def _params(func) -> Optional[Dict[str, Any]]:
+    """Keyword-addressable parameter names of a callable and whether it swallows **kwargs"""
+    try:
+        sig = inspect.signature(func)
+    except (TypeError, ValueError):
+        return None
+    names = [
+        p.name
+        for p in sig.parameters.values()
+        if p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY) and p.name not in ("self", "cls")
+    ]
+    var_kw = any(p.kind == p.VAR_KEYWORD for p in sig.parameters.values())
+    return {"params": names, "var_kw": var_kw, "signature": str(sig)}
+
+
+def _init_kwargs(cls) -> Dict[str, Any]:
+    """Follow **kwargs up the MRO: union of __init__ parameters until an __init__ that does not forward them"""
+    names: List[str] = []
+    open_kwargs = True
+    for klass in cls.__mro__:
+        init = klass.__dict__.get("__init__")
+        if init is None or klass is object:
+            continue
+        info = _params(init)
+        if info is None:
+            break
+        names.extend(n for n in info["params"] if n not in names)
+        if not info["var_kw"]:
+            open_kwargs = False
+            break
+    else:
+        open_kwargs = False
+    sig = _params(cls)
+    return {"params": names, "var_kw": open_kwargs, "signature": sig["signature"] if sig else ""}
+
+
+def build_manim_index() -> Dict[str, Any]:
+    """Introspect the installed manim package (slow: imports manim). Use `load_manim_index` instead."""
+    import manim
+
+    names: Dict[str, str] = {}
+    functions: Dict[str, Dict[str, Any]] = {}
+    classes: Dict[str, Dict[str, Any]] = {}
+    for name in dir(manim):
+        if name.startswith("_"):
+            continue
+        obj = getattr(manim, name)
+        if inspect.isclass(obj):
+            names[name] = "class"
+            methods = {}
+            for attr, value in vars(obj).items():
+                if attr.startswith("_") or not callable(value):
+                    continue
+                info = _params(value)
+                if info is not None:
+                    methods[attr] = info
+            classes[name] = {
+                "bases": [k.__name__ for k in obj.__mro__[1:] if k is not object],
+                "attributes": sorted(a for a in dir(obj) if not a.startswith("__")),
+                "methods": methods,
+                "init": _init_kwargs(obj),
+                "dynamic_getattr": "__getattr__" in dir(obj),
+            }
+        elif inspect.ismodule(obj):
+            names[name] = "module"
+        elif callable(obj):
+            names[name] = "function"
+            info = _params(obj)
+            if info is not None:
+                functions[name] = info
+        else:
+            names[name] = "constant"
+    return {
+        "format": INDEX_FORMAT,
+        "manim_version": getattr(manim, "__version__", _installed_manim_version()),
+        "names": names,
+        "functions": functions,
+        "classes": classes,
+    }
+
+
+def default_index_path(version: Optional[str] = None) -> Path:
+    return DEFAULT_CACHE_DIR / f"manim_index_{version or _installed_manim_version() or 'unknown'}.json"
+
+
+_INDEX_CACHE: Dict[str, "ManimIndex"] = {}
+
+
+def load_manim_index(path=None, rebuild: bool = False) -> "ManimIndex":
+    """Load the on-disk index for the installed manim, building it once when missing.
+
+    Returns an empty index (every lookup answers "unknown") when manim is not importable, so
+    callers never need to special-case a missing install.
+    """
+    path = Path(path) if path else default_index_path()
+    key = str(path)
+    if not rebuild and key in _INDEX_CACHE:
+        return _INDEX_CACHE[key]
+
+    data = None
+    if not rebuild and path.exists():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format") != INDEX_FORMAT:
+                data = None
+        except (json.JSONDecodeError, OSError):
+            data = None
+    if data is None:
+        try:
+            data = build_manim_index()
+        except Exception as e:
+            print(f"⚠️ Manim API index unavailable: {e}")
+            _INDEX_CACHE[key] = ManimIndex({})
+            return _INDEX_CACHE[key]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    index = ManimIndex(data)
+    _INDEX_CACHE[key] = index
+    return index
+
+
+class ManimIndex:
+    """Read-only queries over the exported names, classes, methods and signatures of manim"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.names: Dict[str, str] = data.get("names", {})
+        self.functions: Dict[str, Dict[str, Any]] = data.get("functions", {})
+        self.classes: Dict[str, Dict[str, Any]] = data.get("classes", {})
+        self.version = data.get("manim_version")
+
+    def __bool__(self):
+        return bool(self.names)
+
+    def has_name(self, name: str) -> bool:
+        return name in self.names
+
+    def has_attribute(self, cls_name: str, attr: str) -> Optional[bool]:
+        """True/False for indexed classes, None when the class is unknown"""
+        cls = self.classes.get(cls_name)
+        if cls is None:
+            return None
+        if attr in cls["attributes"]:
+            return True
+        return bool(cls.get("dynamic_getattr") and attr.startswith(DYNAMIC_PREFIXES))
+
+    def find_method(self, cls_name: str, method: str) -> Optional[Dict[str, Any]]:
+        """Signature info of `method` as resolved through the class MRO"""
+        cls = self.classes.get(cls_name)
+        if cls is None:
+            return None
+        for owner in [cls_name] + cls["bases"]:
+            info = self.classes.get(owner, {}).get("methods", {}).get(method)
+            if info is not None:
+                return info
+        return None
+
+    def call_params(self, name: str) -> Optional[Dict[str, Any]]:
+        """Accepted keyword arguments of a top-level manim class or function"""
+        if name in self.classes:
+            return self.classes[name]["init"]
+        return self.functions.get(name)
+
+    def similar_names(self, name: str, n: int = 3) -> List[str]:
+        return difflib.get_close_matches(name, self.names.keys(), n=n, cutoff=0.75)
+
+    def similar_attributes(self, cls_name: str, attr: str, n: int = 3) -> List[str]:
+        cls = self.classes.get(cls_name)
+        if cls is None:
+            return []
+        return difflib.get_close_matches(attr, cls["attributes"], n=n, cutoff=0.6)
+
+
+@dataclass
+class LintIssue:
+    """One static finding against the Manim API index"""
+
+    line: int
+    col: int
+    kind: str  # undefined_name / unknown_attribute / unexpected_kwarg
+    message: str  # Phrased like the runtime exception it predicts
+    suggestion: str = ""
+    blocking: bool = True  # False when the check is heuristic and should not skip a render
+
+    def to_traceback(self, filename: str) -> str:
+        """Render as a traceback so the error analyzers / rule fixers can consume it unchanged"""
+        return f'Traceback (most recent call last):\n  File "{filename}", line {self.line}, in construct\n{self.message}'
+
+    def to_prompt_line(self) -> str:
+        hint = f" -> {self.suggestion}" if self.suggestion else ""
+        return f"line {self.line}: {self.message}{hint}"
+
+
+class _ScopeCollector(ast.NodeVisitor):
+    """Every name bound anywhere in the module (deliberately scope-insensitive to avoid false positives)"""
+
+    def __init__(self):
+        self.bound: Set[str] = set()
+        self.star_modules: List[str] = []
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, (ast.Store, ast.Del)):
+            self.bound.add(node.id)
+
+    def visit_arg(self, node):
+        self.bound.add(node.arg)
+
+    def visit_FunctionDef(self, node):
+        self.bound.add(node.name)
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self.bound.add(node.name)
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.bound.add((alias.asname or alias.name).split(".")[0])
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name == "*":
+                self.star_modules.append(node.module or "")
+            else:
+                self.bound.add(alias.asname or alias.name)
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            self.bound.add(node.name)
+        self.generic_visit(node)
+
+    def visit_Global(self, node):
+        self.bound.update(node.names)
+
+    visit_Nonlocal = visit_Global
+
+
+class ManimLinter:
+    """Checks section code against the Manim API index before it is rendered.
+
+    Three checks, each conservative so a clean lint never blocks valid code:
+    - names that are neither bound in the module, builtins nor exported by `from manim import *`
+    - method calls on variables whose manim type is known from `x = SomeMobject(...)`
+    - keyword arguments that no __init__ / method in the resolved signature accepts
+    """
+
+    def __init__(self, index: Optional[ManimIndex] = None):
+        self.index = index if index is not None else load_manim_index()
+
+    def lint(self, code: str) -> List[LintIssue]:
+        if not self.index:
+            return []
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return []  # Syntax errors are reported by the renderer with better context
+
+        scope = _ScopeCollector()
+        scope.visit(tree)
+        issues = []
+        issues.extend(self._undefined_names(tree, scope))
+        var_types = self._infer_types(tree)
+        local_methods = {
+            n.name for cls in ast.walk(tree) if isinstance(cls, ast.ClassDef) for n in cls.body if isinstance(n, ast.FunctionDef)
+        }
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call):
+                issues.extend(self._check_call(node, var_types, local_methods, scope.bound))
+        return sorted(issues, key=lambda i: (i.line, i.col))
+
+    def _undefined_names(self, tree: ast.Module, scope: _ScopeCollector) -> List[LintIssue]:
+        # Any star import other than manim's makes the set of defined names unknowable
+        if any(m != "manim" for m in scope.star_modules):
+            return []
+        known = scope.bound | set(dir(builtins)) | {"__name__", "__file__"}
+        if "manim" in scope.star_modules:
+            known |= set(self.index.names)
+
+        issues, seen = [], set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in known and node.id not in seen:
+                seen.add(node.id)
+                similar = self.index.similar_names(node.id) or difflib.get_close_matches(node.id, scope.bound, n=3, cutoff=0.75)
+                issues.append(
+                    LintIssue(
+                        line=node.lineno,
+                        col=node.col_offset,
+                        kind="undefined_name",
+                        message=f"NameError: name '{node.id}' is not defined",
+                        suggestion=f"did you mean {', '.join(similar)}?" if similar else "",
+                    )
+                )
+        return issues
+
+    def _infer_types(self, tree: ast.Module) -> Dict[str, Optional[str]]:
+        """Variable -> manim class for names only ever assigned `SomeClass(...)` of one class"""
+        types: Dict[str, Optional[str]] = {}
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Assign, ast.AnnAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                value = node.value
+            elif isinstance(node, ast.AugAssign):
+                targets, value = [node.target], None
+            elif isinstance(node, (ast.For, ast.With, ast.comprehension)):
+                targets = [node.target] if not isinstance(node, ast.With) else [i.optional_vars for i in node.items if i.optional_vars]
+                value = None
+            else:
+                continue
+            for target in targets:
+                for name_node in ast.walk(target):
+                    if not isinstance(name_node, ast.Name):
+                        continue
+                    cls = None
+                    if (
+                        name_node is target
+                        and isinstance(value, ast.Call)
+                        and isinstance(value.func, ast.Name)
+                        and value.func.id in self.index.classes
+                    ):
+                        cls = value.func.id
+                    previous = types.get(name_node.id, cls)
+                    types[name_node.id] = cls if previous == cls else None
+        return types
+
+    def _check_call(
+        self, call: ast.Call, var_types: Dict[str, Optional[str]], local_methods: Set[str], bound: Set[str]
+    ) -> List[LintIssue]:
+        issues = []
+        func = call.func
+        owner, params = None, None
+        if isinstance(func, ast.Name) and func.id not in bound:
+            owner, params = func.id, self.index.call_params(func.id)
+        elif isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+            cls = var_types.get(func.value.id)
+            if cls and func.attr not in local_methods:
+                exists = self.index.has_attribute(cls, func.attr)
+                if exists is False:
+                    similar = self.index.similar_attributes(cls, func.attr)
+                    issues.append(
+                        LintIssue(
+                            line=call.lineno,
+                            col=call.col_offset,
+                            kind="unknown_attribute",
+                            message=f"AttributeError: '{cls}' object has no attribute '{func.attr}'",
+                            suggestion=f"did you mean {', '.join(similar)}?" if similar else "",
+                            blocking=False,  # instance attributes set in __init__ are not in the index
+                        )
+                    )
+                    return issues
+                owner, params = f"{cls}.{func.attr}", self.index.find_method(cls, func.attr)
+
+        if not params or params["var_kw"]:
+            return issues
+        for kw in call.keywords:
+            if kw.arg is None or kw.arg in params["params"]:
+                continue
+            similar = difflib.get_close_matches(kw.arg, params["params"], n=3, cutoff=0.6)
+            issues.append(
+                LintIssue(
+                    line=call.lineno,
+                    col=call.col_offset,
+                    kind="unexpected_kwarg",
+                    message=f"TypeError: {owner}() got an unexpected keyword argument '{kw.arg}'",
+                    suggestion=f"did you mean {', '.join(similar)}?" if similar else f"accepted: {', '.join(params['params'][:12])}",
+                )
+            )
+        return issues
+
+
+def format_lint_report(issues: List[LintIssue]) -> str:
+    return "\n".join(f"- {i.to_prompt_line()}" for i in issues)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the Manim API index or lint section files against it")
+    parser.add_argument("files", nargs="*", help="section files to lint")
+    parser.add_argument("--rebuild", action="store_true", help="re-introspect manim even if a cached index exists")
+    parser.add_argument("--index_path", type=str, default="", help="default ~/.cache/code2video/manim_index_<version>.json")
+    args = parser.parse_args()
+
+    index = load_manim_index(args.index_path or None, rebuild=args.rebuild)
+    print(f"📚 Manim {index.version}: {len(index.names)} names, {len(index.classes)} classes")
+    linter = ManimLinter(index)
+    for file in args.files:
+        issues = linter.lint(Path(file).read_text(encoding="utf-8"))
+        print(f"{file}: {len(issues)} issue(s)")
+        for issue in issues:
+            print(f"  {issue.to_prompt_line()}")
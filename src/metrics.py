@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from helpers import append_jsonl
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+METRICS_FILE = "metrics.jsonl"
+PREFIX = "code2video_"
+SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 20)
+MB_BUCKETS = (128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+# name -> (type, help, histogram buckets)
+METRICS: Dict[str, Tuple[str, str, Optional[Tuple[float, ...]]]] = {
+    "llm_requests": ("counter", "LLM requests by model, stage and result", None),
+    "llm_tokens": ("counter", "LLM tokens by model, stage and kind (prompt/completion)", None),
+    "llm_latency_seconds": ("histogram", "LLM request latency including retries", SECONDS_BUCKETS),
+    "render_seconds": ("histogram", "Manim subprocess wall time by result", SECONDS_BUCKETS),
+    "render_cpu_seconds": ("histogram", "CPU time of each render's process tree", SECONDS_BUCKETS),
+    "render_peak_rss_mb": ("histogram", "Peak resident memory of each render's process tree", MB_BUCKETS),
+    "render_limit_hits": ("counter", "Renders ended by a resource limit (timeout, cpu, memory)", None),
+    "fix_attempts": ("counter", "Code fixes by source (rule, memory, llm, none)", None),
+    "section_fix_attempts": ("histogram", "Renders needed per debug run, by final result", COUNT_BUCKETS),
+    "cache_lookups": ("counter", "Cache lookups by cache and result (hit/miss)", None),
+    # Files, not lookups: which linked glyphs a render actually reads is not observable
+    "glyph_files_linked": ("counter", "Shared glyph store SVGs linked into a topic before its renders", None),
+    "glyph_files_published": ("counter", "Newly typeset SVGs added to the shared glyph store", None),
+    "feedback_rounds": ("counter", "Feedback rounds by critique source and outcome", None),
+    "topics": ("counter", "Topic lifecycle events (submitted, started, finished)", None),
+    "topic_results": ("counter", "Finished topics by result", None),
+    "sections": ("counter", "Section render lifecycle events (submitted, started, finished)", None),
+}
+# Queue depths derived from lifecycle counters, so they stay right however many processes emit them
+GAUGES = {
+    "topics_queued": ("topics", "submitted", "started", "Topics waiting for a batch worker"),
+    "topics_in_progress": ("topics", "started", "finished", "Topics being processed"),
+    "sections_queued": ("sections", "submitted", "started", "Section renders waiting for a pool worker"),
+    "sections_rendering": ("sections", "started", "finished", "Section renders in progress"),
+}
+
+
+class MetricsWriter:
+    """Appends metric events to the run's metrics.jsonl, shared by the batch and render pool processes"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _emit(self, name: str, value: float, labels: Dict[str, Any]):
+        if name not in METRICS:
+            raise KeyError(f"Unknown metric '{name}'")
+        record = {"ts": time.time(), "pid": os.getpid(), "name": name, "labels": labels, "value": value}
+        try:
+            append_jsonl(self.path, record)
+        except OSError:
+            pass  # Metrics must never fail a render
+
+    def inc(self, name: str, value: float = 1, **labels):
+        self._emit(name, value, {k: str(v) for k, v in labels.items()})
+
+    def observe(self, name: str, value: float, **labels):
+        self._emit(name, value, {k: str(v) for k, v in labels.items()})
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class MetricsAggregator:
+    """Folds metrics.jsonl into counters and histograms; each refresh only reads lines appended since the last"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._offset = 0
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[tuple, float]] = defaultdict(lambda: defaultdict(float))
+        # name -> labels -> [bucket counts..., sum, count]
+        self.histograms: Dict[str, Dict[tuple, list]] = defaultdict(dict)
+
+    def _add(self, record: Dict[str, Any]):
+        name = record.get("name")
+        if name not in METRICS:
+            return
+        kind, _, buckets = METRICS[name]
+        key, value = _label_key(record.get("labels") or {}), float(record.get("value", 0))
+        if kind == "counter":
+            self.counters[name][key] += value
+            return
+        state = self.histograms[name].setdefault(key, [0] * len(buckets) + [0.0, 0])
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                state[i] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def refresh(self):
+        with self._lock:
+            if not self.path.exists():
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+            complete = data.rfind(b"\n") + 1  # A line still being appended is read next time
+            self._offset += complete
+            for line in data[:complete].splitlines():
+                try:
+                    self._add(json.loads(line))
+                except (ValueError, TypeError):
+                    continue
+
+    def _lifecycle(self, name: str, event: str) -> float:
+        return sum(v for key, v in self.counters[name].items() if dict(key).get("event") == event)
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        self.refresh()
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in METRICS.items():
+                full = PREFIX + name + ("_total" if kind == "counter" else "")
+                lines += [f"# HELP {full} {help_text}", f"# TYPE {full} {kind}"]
+                if kind == "counter":
+                    for key, value in sorted(self.counters[name].items()):
+                        lines.append(f"{full}{_format_labels(key)} {value:g}")
+                    continue
+                for key, state in sorted(self.histograms[name].items()):
+                    for bound, count in zip(buckets, state):
+                        lines.append(f"{full}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {count}")
+                    lines.append(f"{full}_bucket{_format_labels(key, ('le', '+Inf'))} {state[-1]}")
+                    lines.append(f"{full}_sum{_format_labels(key)} {state[-2]:g}")
+                    lines.append(f"{full}_count{_format_labels(key)} {state[-1]}")
+            for name, (source, entered, left, help_text) in GAUGES.items():
+                value = max(0.0, self._lifecycle(source, entered) - self._lifecycle(source, left))
+                lines += [f"# HELP {PREFIX}{name} {help_text}", f"# TYPE {PREFIX}{name} gauge", f"{PREFIX}{name} {value:g}"]
+        return "\n".join(lines) + "\n"
+
+
+def make_metrics_handler(aggregator: MetricsAggregator):
+    from http.server import BaseHTTPRequestHandler  # Only the process serving /metrics needs it
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = aggregator.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve_metrics(path, port: int, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+    """Serve /metrics for a run's metrics.jsonl from a daemon thread"""
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((host, port), make_metrics_handler(MetricsAggregator(path)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📈 Metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
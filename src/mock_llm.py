@@ -0,0 +1,157 @@
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Dict, Optional, Tuple
+
+MOCK_MODEL = "mock-llm"
+
+
+@dataclass
+class MockLLMConfig:
+    """Read from CODE2VIDEO_MOCK_* environment variables so render subprocesses see the same settings"""
+
+    latency_median: float = 1.0  # Seconds; latencies are log-normal around this median
+    latency_sigma: float = 0.5
+    failure_rate: float = 0.0  # Probability a request fails after all its retries (returns None)
+    bad_code_rate: float = 0.0  # Probability generated code has a NameError the fixer has to repair
+    sections: int = 3
+    section_seconds: int = 6
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "MockLLMConfig":
+        config = cls()
+        for name, value in vars(cls()).items():
+            raw = os.environ.get(f"CODE2VIDEO_MOCK_{name.upper()}")
+            if raw is not None:
+                setattr(config, name, type(value)(raw))
+        return config
+
+    def to_env(self) -> Dict[str, str]:
+        return {f"CODE2VIDEO_MOCK_{name.upper()}": str(value) for name, value in vars(self).items()}
+
+
+_CALLS: Dict[str, int] = {}
+_CALLS_LOCK = threading.Lock()
+
+
+def _rng(prompt: str, seed: int) -> random.Random:
+    """Deterministic per (prompt, how often this process has seen it): retries get a fresh draw"""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    with _CALLS_LOCK:
+        _CALLS[digest] = _CALLS.get(digest, 0) + 1
+        count = _CALLS[digest]
+    return random.Random(f"{seed}:{digest}:{count}")
+
+
+def _outline(config: MockLLMConfig) -> dict:
+    return {
+        "topic": "Mock topic",
+        "target_audience": "benchmark",
+        "sections": [
+            {"id": f"section_{i}", "title": f"Part {i}", "content": "这是一段用于吞吐量测试的讲解内容。" * 4}
+            for i in range(1, config.sections + 1)
+        ],
+    }
+
+
+def _storyboard(prompt: str, config: MockLLMConfig) -> dict:
+    ids = list(dict.fromkeys(re.findall(r'"id":\s*"(section_\d+)"', prompt))) or [f"section_{i}" for i in range(1, config.sections + 1)]
+    return {
+        "sections": [
+            {
+                "id": sid,
+                "title": f"Part {sid.split('_')[-1]}",
+                "lecture_lines": ["要点一", "要点二"],
+                "animations": [f"Show a shape for point {k}" for k in (1, 2)],
+                "duration_seconds": config.section_seconds,
+            }
+            for sid in ids
+        ]
+    }
+
+
+def mock_scene_code(scene_name: str, title_call: str, seconds: int, broken: bool = False) -> str:
+    """Small known-good scene (or one with a typo'd class name) that renders in about `seconds`"""
+    from prompts import base_class
+
+    shape = "Circel" if broken else "Circle"
+    hold = max(0.5, seconds - 2)
+    return f"""from manim import *
+
+{base_class.strip()}
+
+
+class {scene_name}(TeachingScene):
+    def construct(self):
+        {title_call}
+
+        # === Animation for Lecture Line 1 (Duration: {seconds}s) ===
+        shape = {shape}(radius=0.6, color="#87CEEB")
+        self.place_at_grid(shape, "B2")
+        self.play(Create(shape), run_time=1)
+        self.play(self.lecture[0].animate.set_color("#FFD700"), run_time=1)
+        self.wait({hold})
+"""
+
+
+def _code(prompt: str, config: MockLLMConfig, rng: random.Random, fixing: bool) -> Optional[str]:
+    scene = re.search(r"class\s+(\w+Scene)\s*\(\s*TeachingScene\s*\)", prompt)
+    if scene is None:
+        return None
+    title_call = re.search(r"self\.setup_layout\(.*?\)\s*$", prompt, re.MULTILINE)
+    call = title_call.group(0).strip() if title_call else 'self.setup_layout("Mock", ["要点一", "要点二"])'
+    durations = [int(d) for d in re.findall(r"\[(\d+)s\]", prompt)]
+    seconds = min(sum(durations), config.section_seconds) if durations else config.section_seconds
+    broken = not fixing and rng.random() < config.bad_code_rate
+    return "```python\n" + mock_scene_code(scene.group(1), call, seconds, broken) + "```"
+
+
+def mock_answer(prompt: str, config: Optional[MockLLMConfig] = None, rng: Optional[random.Random] = None) -> Optional[str]:
+    """Canned response for whichever pipeline stage produced `prompt`"""
+    config = config or MockLLMConfig.from_env()
+    rng = rng or _rng(prompt, config.seed)
+    if '"has_issues"' in prompt:
+        return json.dumps({"layout": {"has_issues": False, "improvements": []}})
+    if "TeachingScene" in prompt:
+        # An error report, not `except ImportError:` inside the embedded base class
+        fixing = bool(re.search(r"Traceback|Error Message|\b\w+(?:Error|Exception): \S", prompt))
+        return _code(prompt, config, rng, fixing)
+    if "storyboard" in prompt.lower():
+        return "```json\n" + json.dumps(_storyboard(prompt, config), ensure_ascii=False) + "\n```"
+    return "```json\n" + json.dumps(_outline(config), ensure_ascii=False) + "\n```"
+
+
+def _completion(text: str, prompt: str) -> Tuple[SimpleNamespace, Dict[str, int]]:
+    prompt_tokens, completion_tokens = math.ceil(len(prompt) / 4), math.ceil(len(text) / 4)
+    usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, total_tokens=prompt_tokens + completion_tokens)
+    response = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=usage, model=MOCK_MODEL
+    )
+    return response, {**vars(usage), "model": MOCK_MODEL, "retries": 0}
+
+
+def request_mock_token(prompt, log_id=None, max_tokens=10000, max_retries=3):
+    """Drop-in for request_*_token: OpenAI-shaped response, no network, configurable latency and failures"""
+    config = MockLLMConfig.from_env()
+    rng = _rng(prompt, config.seed)
+    time.sleep(rng.lognormvariate(math.log(max(config.latency_median, 1e-3)), config.latency_sigma))
+    if rng.random() < config.failure_rate:
+        return None, {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "model": MOCK_MODEL, "retries": max_retries}
+    text = mock_answer(prompt, config, rng)
+    if text is None:
+        text = "Unable to help with this block."
+    return _completion(text, prompt)
+
+
+def request_mock_video(prompt, video_path=None, image_path=None, **kwargs):
+    """Drop-in for the MLLM video critic; always reports no layout issues"""
+    response, _ = request_mock_token(prompt)
+    return response
@@ -0,0 +1,186 @@
+import difflib
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+FUZZY_MIN_RATIO = 0.8  # Similarity of a hunk's old lines to the code window for a fuzzy match
+MAX_CONTEXT_TRIM = 2  # Like `patch --fuzz 2`: drop up to 2 outer context lines when nothing matches
+
+UNIFIED_DIFF_INSTRUCTIONS = """Output ONLY a unified diff against the current code, inside one ```diff block:
+- Start every hunk with `@@ -<old_start>,<old_len> +<new_start>,<new_len> @@`
+- Prefix unchanged context lines with a space, removed lines with `-`, added lines with `+`
+- Include 2-3 unchanged context lines around each change, copied exactly
+- Do not output the whole file and do not add explanations"""
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+@dataclass
+class Hunk:
+    old_start: int  # 1-based, as claimed by the header (only a hint)
+    lines: List[Tuple[str, str]] = field(default_factory=list)  # (" " | "-" | "+", text)
+
+    @property
+    def old(self) -> List[str]:
+        return [t for op, t in self.lines if op in " -"]
+
+    @property
+    def new(self) -> List[str]:
+        return [t for op, t in self.lines if op in " +"]
+
+
+@dataclass
+class PatchResult:
+    code: Optional[str]
+    applied: int = 0
+    fuzzy: int = 0  # Hunks placed by whitespace-insensitive / similarity / trimmed-context matching
+    error: str = ""
+
+
+def extract_diff(text: str) -> Optional[str]:
+    """Pull a unified diff out of a model response, or None when it does not contain one"""
+    if not text:
+        return None
+    m = re.search(r"```(?:diff|patch)\s*\n(.*?)```", text, re.DOTALL)
+    if m:
+        return m.group(1)
+    if re.search(r"^@@ -\d+", text, re.MULTILINE):
+        return text
+    return None
+
+
+def parse_unified_diff(diff: str) -> List[Hunk]:
+    hunks: List[Hunk] = []
+    for line in diff.split("\n"):
+        if line.startswith(("--- ", "+++ ", "diff ", "index ")):
+            continue
+        m = HUNK_HEADER.match(line)
+        if m:
+            hunks.append(Hunk(old_start=int(m.group(1))))
+            continue
+        if not hunks or line.startswith("\\"):  # "\ No newline at end of file"
+            continue
+        if line[:1] in ("-", "+", " "):
+            hunks[-1].lines.append((line[0], line[1:]))
+        elif line == "":
+            hunks[-1].lines.append((" ", ""))
+    for hunk in hunks:  # Trailing blank lines are usually an artefact of the code fence
+        while hunk.lines and hunk.lines[-1] == (" ", ""):
+            hunk.lines.pop()
+    return [h for h in hunks if any(op != " " for op, _ in h.lines)]
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+
+def _locate(lines: List[str], old: List[str], hint: int) -> Tuple[Optional[int], bool]:
+    """Start index of `old` in `lines` nearest to `hint`, and whether the match was fuzzy"""
+    n = len(old)
+    if n == 0:
+        return min(max(hint, 0), len(lines)), False
+    windows = range(len(lines) - n + 1)
+    by_distance = sorted(windows, key=lambda i: abs(i - hint))
+
+    for i in by_distance:
+        if lines[i : i + n] == old:
+            return i, False
+    stripped_old = [l.strip() for l in old]
+    for i in by_distance:
+        if [l.strip() for l in lines[i : i + n]] == stripped_old:
+            return i, True
+    best, best_ratio = None, FUZZY_MIN_RATIO
+    joined_old = "\n".join(stripped_old)
+    for i in by_distance:
+        ratio = difflib.SequenceMatcher(None, "\n".join(l.strip() for l in lines[i : i + n]), joined_old).ratio()
+        if ratio > best_ratio:
+            best, best_ratio = i, ratio
+    return best, best is not None
+
+
+def _reindent(new: List[str], old: List[str], actual: List[str]) -> List[str]:
+    """Shift the hunk's new lines by the indentation difference between its old lines and the real code"""
+    pairs = [(o, a) for o, a in zip(old, actual) if o.strip() and a.strip()]
+    if not pairs:
+        return new
+    delta = _indent(pairs[0][1]) - _indent(pairs[0][0])
+    if delta == 0:
+        return new
+    if delta > 0:
+        return [" " * delta + l if l.strip() else l for l in new]
+    return [l[min(-delta, _indent(l)) :] for l in new]
+
+
+def apply_unified_diff(code: str, diff: str) -> PatchResult:
+    """Apply every hunk or none: exact match near the header line, then whitespace-insensitive,
+    then similarity-based, then with up to MAX_CONTEXT_TRIM outer context lines dropped"""
+    hunks = parse_unified_diff(diff)
+    if not hunks:
+        return PatchResult(None, error="no hunks found in diff")
+
+    lines = code.split("\n")
+    offset, result = 0, PatchResult(None)
+    for number, hunk in enumerate(hunks, 1):
+        body = list(hunk.lines)
+        start = None
+        for trim in range(MAX_CONTEXT_TRIM + 1):
+            if trim:
+                # Drop outer context lines only; never trim through a change
+                lead = next((i for i, (op, _) in enumerate(body) if op != " "), 0)
+                tail = next((i for i, (op, _) in enumerate(reversed(body)) if op != " "), 0)
+                body = body[1 if lead else 0 : len(body) - (1 if tail else 0)]
+                if not lead and not tail:
+                    break
+            trial = Hunk(hunk.old_start, body)
+            start, fuzzy = _locate(lines, trial.old, hunk.old_start - 1 + offset)
+            if start is not None:
+                break
+        if start is None:
+            return PatchResult(None, result.applied, result.fuzzy, error=f"hunk {number} did not match the code")
+
+        old = trial.old
+        actual = lines[start : start + len(old)]
+        added = [t for op, t in trial.lines if op == "+"]
+        if fuzzy or trim:
+            result.fuzzy += 1
+            added = _reindent(added, old, actual)
+        # Context comes from the real code, so a fuzzy match never rewrites lines the model only quoted
+        new, k, added_iter = [], 0, iter(added)
+        for op, _ in trial.lines:
+            if op == " ":
+                new.append(actual[k])
+            if op in " -":
+                k += 1
+            else:
+                new.append(next(added_iter))
+        lines[start : start + len(old)] = new
+        offset += len(new) - len(old)
+        result.applied += 1
+
+    result.code = "\n".join(lines)
+    return result
+
+
+def make_unified_diff(before: str, after: str, name: str = "code.py") -> str:
+    return "\n".join(
+        difflib.unified_diff(before.split("\n"), after.split("\n"), f"a/{name}", f"b/{name}", lineterm="", n=2)
+    )
+
+
+def apply_model_edit(code: str, response_text: str) -> Tuple[Optional[str], str]:
+    """Apply a model response that is either a unified diff or (last resort) a complete file.
+
+    Returns (new_code, mode) with mode "diff", "rewrite" or "failed: <reason>".
+    """
+    diff = extract_diff(response_text)
+    if diff is not None:
+        result = apply_unified_diff(code, diff)
+        if result.code is not None:
+            return result.code, "diff"
+        return None, f"failed: {result.error}"
+
+    m = re.search(r"```(?:python)?\s*\n(.*?)```", response_text or "", re.DOTALL)
+    rewritten = (m.group(1) if m else response_text or "").strip()
+    if "class " in rewritten and "def construct" in rewritten:
+        return rewritten, "rewrite"
+    return None, "failed: response is neither a diff nor a complete scene"
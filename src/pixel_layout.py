@@ -0,0 +1,229 @@
+import json
+import sys
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Tuple
+
+# Imported on first use by _load_cv: OpenCV + numpy dominate agent startup and most processes never analyse a frame
+cv2 = None
+np = None
+
+SAMPLE_FRAMES = 8  # Evenly spaced frames per section video
+ANALYSIS_WIDTH = 640  # Frames are downscaled to this width before analysis
+BACKGROUND_BGR = (0, 0, 0)  # TeachingScene background "#000000"
+FOREGROUND_DELTA = 40  # Max channel distance from the background for a pixel to count as content
+BORDER_PX = 3  # Content inside this band (at ANALYSIS_WIDTH) is clipped by the frame edge
+CLIP_MIN_PIXELS = 12  # ...once at least this many content pixels touch it
+MIN_CONTRAST = 3.0  # WCAG contrast ratio below which text is hard to read
+OVERLAP_COLOR_SHARE = 0.12  # Share of a text box a second non-background colour must cover
+DEFAULT_THRESHOLD = 0.25  # Sections scoring below this skip the MLLM round
+FINGERPRINT_TOLERANCE = 4  # Mean differing dHash bits per sampled frame for two renders to count as the same
+
+# Weights of the per-check frame fractions in the final score
+RISK_WEIGHTS = {"overlap": 0.45, "clipping": 0.3, "contrast": 0.25}
+
+
+@dataclass
+class PixelFinding:
+    kind: str  # "overlap" | "clipping" | "contrast"
+    frame_index: int
+    timestamp: float
+    box: Tuple[int, int, int, int]  # (x, y, w, h) in analysis pixels
+    value: float  # Colour share, clipped pixel count or contrast ratio
+
+
+@dataclass
+class PixelRiskReport:
+    video_path: str
+    score: Optional[float]  # 0..1; None when the video could not be analysed
+    frames: int = 0
+    rates: Dict[str, float] = field(default_factory=dict)  # Fraction of sampled frames flagged per check
+    findings: List[PixelFinding] = field(default_factory=list)
+    error: str = ""
+
+    def is_risky(self, threshold: float) -> bool:
+        """Fail open: an unanalysable video is always risky"""
+        return self.score is None or self.score >= threshold
+
+    def summary(self) -> str:
+        if self.score is None:
+            return f"pixel check unavailable ({self.error})"
+        rates = ", ".join(f"{k} {v:.0%}" for k, v in self.rates.items())
+        return f"risk {self.score:.2f} over {self.frames} frames ({rates})"
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+
+def _sample_frames(video_path: str, count: int = SAMPLE_FRAMES):
+    """Yield (index, timestamp, frame) for `count` evenly spaced frames, skipping the first/last instant"""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        if total <= 0:
+            return
+        for i in range(count):
+            index = int((i + 0.5) * total / count)
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ok, frame = cap.read()
+            if not ok:
+                continue
+            if frame.shape[1] > ANALYSIS_WIDTH:
+                height = int(frame.shape[0] * ANALYSIS_WIDTH / frame.shape[1])
+                frame = cv2.resize(frame, (ANALYSIS_WIDTH, height), interpolation=cv2.INTER_AREA)
+            yield index, index / fps, frame
+    finally:
+        cap.release()
+
+
+def _foreground_mask(frame):
+    diff = cv2.absdiff(frame, np.full_like(frame, BACKGROUND_BGR, dtype=frame.dtype)).max(axis=2)
+    return (diff > FOREGROUND_DELTA).astype(np.uint8)
+
+
+def _text_boxes(frame) -> List[Tuple[int, int, int, int]]:
+    """Text-line candidates: dense, horizontally elongated clusters of strong strokes"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, strokes = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    joined = cv2.morphologyEx(strokes, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1)))
+    contours, _ = cv2.findContours(joined, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    frame_h = frame.shape[0]
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if not (6 <= h <= frame_h * 0.12) or w < 1.5 * h:
+            continue
+        density = cv2.countNonZero(strokes[y : y + h, x : x + w]) / float(w * h)
+        if 0.2 <= density <= 0.85:  # Glyph strokes; solid bars and sparse lines fall outside
+            boxes.append((x, y, w, h))
+    return boxes
+
+
+def _dominant_colors(pixels) -> List[Tuple[Tuple[int, int, int], float]]:
+    """Quantised colours (8 levels per channel) with their share of `pixels`, largest first"""
+    if len(pixels) == 0:
+        return []
+    quantised = (pixels >> 5).astype(np.int32)
+    keys = quantised[:, 0] * 64 + quantised[:, 1] * 8 + quantised[:, 2]
+    counts = np.bincount(keys, minlength=512)
+    order = np.argsort(counts)[::-1]
+    result = []
+    for key in order[:4]:
+        if counts[key] == 0:
+            break
+        color = (int(key // 64) * 32 + 16, int(key // 8 % 8) * 32 + 16, int(key % 8) * 32 + 16)
+        result.append((color, counts[key] / float(len(pixels))))
+    return result
+
+
+def _luminance(bgr) -> float:
+    def channel(c):
+        c = c / 255.0
+        return c / 12.92 if c <= 0.03928 else ((c + 0.055) / 1.055) ** 2.4
+
+    b, g, r = bgr
+    return 0.2126 * channel(r) + 0.7152 * channel(g) + 0.0722 * channel(b)
+
+
+def _contrast_ratio(a, b) -> float:
+    la, lb = sorted((_luminance(a), _luminance(b)), reverse=True)
+    return (la + 0.05) / (lb + 0.05)
+
+
+def _is_background(color) -> bool:
+    return max(abs(c - b) for c, b in zip(color, BACKGROUND_BGR)) <= FOREGROUND_DELTA
+
+
+def _analyze_frame(frame, frame_index: int, timestamp: float) -> List[PixelFinding]:
+    findings = []
+    mask = _foreground_mask(frame)
+
+    band = np.zeros_like(mask)
+    band[:BORDER_PX, :] = band[-BORDER_PX:, :] = 1
+    band[:, :BORDER_PX] = band[:, -BORDER_PX:] = 1
+    clipped = int(cv2.countNonZero(mask & band))
+    if clipped >= CLIP_MIN_PIXELS:
+        ys, xs = np.nonzero(mask & band)
+        box = (int(xs.min()), int(ys.min()), int(xs.max() - xs.min() + 1), int(ys.max() - ys.min() + 1))
+        findings.append(PixelFinding("clipping", frame_index, timestamp, box, float(clipped)))
+
+    for x, y, w, h in _text_boxes(frame):
+        colors = _dominant_colors(frame[y : y + h, x : x + w].reshape(-1, 3))
+        if not colors:
+            continue
+        local_bg = colors[0][0]
+        content = [(c, share) for c, share in colors if not _is_background(c)]
+        # Text over a shape: besides the glyph colour, a second large non-background colour fills the box
+        if len(content) >= 2 and content[1][1] >= OVERLAP_COLOR_SHARE:
+            findings.append(PixelFinding("overlap", frame_index, timestamp, (x, y, w, h), float(content[1][1])))
+        # Glyph colour: the most contrasting of the other significant colours (antialiasing is ignored)
+        candidates = [c for c, share in colors[1:] if share >= 0.05]
+        if candidates:
+            ratio = max(_contrast_ratio(c, local_bg) for c in candidates)
+            if ratio < MIN_CONTRAST:
+                findings.append(PixelFinding("contrast", frame_index, timestamp, (x, y, w, h), round(ratio, 2)))
+    return findings
+
+
+def _load_cv() -> bool:
+    """Without OpenCV every section is treated as risky and goes to the MLLM"""
+    global cv2, np
+    if cv2 is None:
+        try:
+            import cv2 as _cv2
+            import numpy as _np
+        except ImportError:
+            return False
+        cv2, np = _cv2, _np
+    return True
+
+
+def assess_video_risk(video_path: str, samples: int = SAMPLE_FRAMES) -> PixelRiskReport:
+    """Per-section pixel risk score: weighted fraction of sampled frames with overlap / clipping / low contrast"""
+    if not _load_cv():
+        return PixelRiskReport(video_path, None, error="opencv-python is not installed")
+    try:
+        findings: List[PixelFinding] = []
+        flagged = {kind: set() for kind in RISK_WEIGHTS}
+        frames = 0
+        for index, timestamp, frame in _sample_frames(str(video_path), samples):
+            frames += 1
+            for finding in _analyze_frame(frame, index, timestamp):
+                findings.append(finding)
+                flagged[finding.kind].add(index)
+        if frames == 0:
+            return PixelRiskReport(video_path, None, error="no frames could be decoded")
+        rates = {kind: len(indices) / frames for kind, indices in flagged.items()}
+        score = sum(RISK_WEIGHTS[kind] * rate for kind, rate in rates.items())
+        return PixelRiskReport(video_path, round(score, 3), frames, rates, findings)
+    except Exception as e:
+        return PixelRiskReport(video_path, None, error=f"{type(e).__name__}: {e}")
+
+
+def video_fingerprint(video_path: str, samples: int = SAMPLE_FRAMES) -> Optional[List[int]]:
+    """64-bit difference hash of each sampled frame; None when the video cannot be read"""
+    if not _load_cv():
+        return None
+    try:
+        hashes = []
+        for _, _, frame in _sample_frames(str(video_path), samples):
+            small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (9, 8), interpolation=cv2.INTER_AREA)
+            bits = (small[:, 1:] > small[:, :-1]).flatten()
+            hashes.append(int("".join("1" if b else "0" for b in bits), 2))
+        return hashes or None
+    except Exception:
+        return None
+
+
+def fingerprints_match(a: Optional[List[int]], b: Optional[List[int]], tolerance: int = FINGERPRINT_TOLERANCE) -> bool:
+    """Same number of sampled frames and a mean Hamming distance within `tolerance` bits"""
+    if not a or not b or len(a) != len(b):
+        return False
+    return sum(bin(x ^ y).count("1") for x, y in zip(a, b)) / len(a) <= tolerance
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        report = assess_video_risk(path)
+        print(f"{path}: {report.summary()}")
@@ -0,0 +1,79 @@
+import gc
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+POOL_START_METHODS = ("forkserver", "fork", "spawn")
+START_METHOD_ENV = "CODE2VIDEO_POOL_START_METHOD"
+# Imported once by the fork server; every worker forks from it with these already in memory, shared
+# copy-on-write. "__main__" is the entry script (agent.py, benchmark.py). Missing packages are skipped.
+PRELOAD_MODULES = ("__main__", "agent", "manim", "numpy", "cv2", "openai", "anthropic", "google.genai")
+
+
+def set_default_start_method(method: str):
+    """Start method for pools created later in this process and its children (the sandbox pool reads it too)"""
+    if method not in POOL_START_METHODS:
+        raise ValueError(f"Unknown pool start method '{method}', expected one of {POOL_START_METHODS}")
+    os.environ[START_METHOD_ENV] = method
+
+
+def default_start_method() -> str:
+    method = os.environ.get(START_METHOD_ENV) or "forkserver"
+    return method if method in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def preload_modules() -> List[str]:
+    modules = list(PRELOAD_MODULES)
+    main_file = getattr(sys.modules.get("__main__"), "__file__", None)
+    if main_file and Path(main_file).stem == "agent":
+        modules.remove("agent")  # Already preloaded as the main script
+    return modules
+
+
+def pool_context(start_method: Optional[str] = None):
+    """multiprocessing context for worker pools.
+
+    forkserver: one clean, single-threaded server process per parent imports PRELOAD_MODULES, then forks
+    each worker, so workers start warm and share those pages. fork: workers are copies of the parent (all
+    its imports and caches included) but forking a process that runs threads can deadlock. spawn: a fresh
+    interpreter per worker that imports everything itself.
+    """
+    method = start_method or default_start_method()
+    if method not in multiprocessing.get_all_start_methods():
+        method = "spawn"
+    context = multiprocessing.get_context(method)
+    if method == "forkserver":
+        context.set_forkserver_preload(preload_modules())  # No effect once this process's server runs
+    return context
+
+
+def warm_worker(request_fns: Iterable[Callable] = ()):
+    """Pool initializer, run once per worker before its first task.
+
+    Moves everything inherited from the parent or fork server into the GC's permanent generation so
+    collections in the worker never write to, and thereby un-share, those pages. Then loads the manim
+    API index and builds the SDK clients of the LLM functions the worker will call.
+    """
+    gc.freeze()
+    try:
+        from manim_index import load_manim_index
+
+        load_manim_index()
+    except Exception:
+        pass  # ScopeRefineFixer reports it on first use
+    from gpt_request import warm_client
+
+    for request_fn in request_fns:
+        warm_client(request_fn)
+
+
+def make_process_pool(max_workers: int, start_method: Optional[str] = None, request_fns: Iterable[Callable] = ()):
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=pool_context(start_method),
+        initializer=warm_worker,
+        initargs=(tuple(request_fns),),
+    )
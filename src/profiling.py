@@ -0,0 +1,114 @@
+import contextlib
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+# Profiles are keyed by span name (see TeachingVideoAgent.span); the aliases follow the paper's stage numbering.
+# "render" means the section render workers: the parent's render span only waits on the process pool.
+PROFILE_ALIASES = {"stage1": "outline", "stage2": "storyboard", "stage3": "code", "render": "section"}
+PROFILE_STAGES = ("outline", "storyboard", "code", "section", "fix", "merge", "topic")
+REPORT_LINES = 40
+
+
+def parse_profile_stages(spec: str) -> Set[str]:
+    """`stage3,render,fix` -> {"code", "section", "fix"}; `all` for every stage"""
+    stages = set()
+    for name in filter(None, (part.strip() for part in (spec or "").split(","))):
+        if name == "all":
+            stages.update(PROFILE_STAGES)
+            continue
+        name = PROFILE_ALIASES.get(name, name)
+        if name not in PROFILE_STAGES:
+            raise ValueError(f"Unknown profile stage '{name}', expected one of {sorted({*PROFILE_STAGES, *PROFILE_ALIASES})}")
+        stages.add(name)
+    return stages
+
+
+class StageProfiler:
+    """cProfile around selected pipeline stages, one .prof file per stage run and process.
+
+    A stage nested in another selected stage (fix inside section) pauses the outer profile, so
+    each file holds only its own stage's time. Work a stage hands to a process pool is covered
+    where the workers enter a selected stage themselves.
+    """
+
+    _counter = itertools.count()
+
+    def __init__(self, profile_dir, stages: Iterable[str]):
+        self.profile_dir = Path(profile_dir)
+        self.stages = set(stages)
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def profile(self, stage: str, label: Optional[str] = None):
+        if stage not in self.stages:
+            yield
+            return
+        stack: List[cProfile.Profile] = self._local.__dict__.setdefault("stack", [])
+        if stack:
+            stack[-1].disable()
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one active cProfile per process, and that one already sees every thread
+            if stack:
+                stack[-1].enable()
+            yield
+            return
+        stack.append(profiler)
+        try:
+            yield
+        finally:
+            profiler.disable()
+            stack.pop()
+            if stack:
+                stack[-1].enable()
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            name = ".".join(filter(None, (stage, label, str(os.getpid()), str(next(self._counter)))))
+            profiler.dump_stats(str(self.profile_dir / f"{name}.prof"))
+
+
+def merge_profiles(profile_files: Iterable[Path], output_dir) -> Dict[str, Path]:
+    """Merge .prof files per stage into profile_<stage>.prof plus a combined profile_report.txt"""
+    by_stage: Dict[str, List[Path]] = defaultdict(list)
+    for path in profile_files:
+        by_stage[Path(path).name.split(".")[0]].append(Path(path))
+    if not by_stage:
+        return {}
+
+    output_dir = Path(output_dir)
+    merged, report = {}, io.StringIO()
+    for stage in sorted(by_stage):
+        files = sorted(by_stage[stage])
+        try:
+            stats = pstats.Stats(str(files[0]), stream=report)
+            for path in files[1:]:
+                stats.add(str(path))
+        except Exception as e:  # A worker killed mid-dump leaves a truncated file
+            print(f"⚠️ Could not merge {stage} profiles: {e}")
+            continue
+        merged[stage] = output_dir / f"profile_{stage}.prof"
+        stats.dump_stats(str(merged[stage]))
+        report.write(f"\n{'=' * 30} {stage}: {len(files)} profile(s) {'=' * 30}\n")
+        stats.sort_stats("cumulative").print_stats(REPORT_LINES)
+    with open(output_dir / "profile_report.txt", "w", encoding="utf-8") as f:
+        f.write(report.getvalue())
+    return merged
+
+
+def merge_topic_profiles(output_dir) -> Dict[str, Path]:
+    return merge_profiles(Path(output_dir).glob("profiles/*.prof"), output_dir)
+
+
+def merge_run_profiles(folder) -> Dict[str, Path]:
+    merged = merge_profiles(Path(folder).glob("*/profiles/*.prof"), folder)
+    if merged:
+        print(f"🔬 Profiles: {Path(folder) / 'profile_report.txt'} ({', '.join(sorted(merged))})")
+    return merged
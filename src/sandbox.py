@@ -0,0 +1,383 @@
+import contextlib
+import gc
+import itertools
+import linecache
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import types
+import uuid
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from process_pools import default_start_method, pool_context
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, workers run unconstrained
+    resource = None
+
+DEFAULT_WORKERS = 2  # One per concurrent repair strategy (see ScopeRefineFixer.race_repairs)
+DEFAULT_TIMEOUT = 10
+DEFAULT_CPU_SECONDS = 20  # Per job, on top of what the warm worker has already used
+DEFAULT_MEMORY_MB = 4096  # Address space per worker; 0 disables
+DEFAULT_OPEN_FILES = 1024
+DEFAULT_RENDER_TIMEOUT = 180
+
+
+def _lower_limit(kind: int, soft: int, pid: int = 0):
+    """Lower the soft limit (capped at the hard one) of this process, or of child `pid` via prlimit"""
+    _, hard = resource.getrlimit(kind)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    if pid:
+        resource.prlimit(pid, kind, (soft, hard))
+    else:
+        resource.setrlimit(kind, (soft, hard))
+
+
+def apply_resource_limits(cpu_seconds: int = 0, memory_mb: int = 0, open_files: int = 0):
+    """Best-effort RLIMIT_CPU (relative to the CPU already used), RLIMIT_AS and RLIMIT_NOFILE for the current process"""
+    if resource is None:
+        return
+    if cpu_seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+        except (ValueError, OSError):
+            pass  # Already above the limit (e.g. large preloaded libraries): leave it unlimited
+    if open_files:
+        try:
+            _lower_limit(resource.RLIMIT_NOFILE, open_files)
+        except (ValueError, OSError):
+            pass
+
+
+def _warm_worker(memory_mb: int, open_files: int):
+    """Pool initializer: pay the manim import once per worker (or once per fork server) instead of once per dry run"""
+    apply_resource_limits(memory_mb=memory_mb, open_files=open_files)
+    try:
+        import manim  # noqa: F401
+        import numpy  # noqa: F401
+    except ImportError:
+        pass  # The dry run itself will report the import error
+    gc.freeze()  # Keep the shared manim pages shared (see process_pools.warm_worker)
+
+
+@contextlib.contextmanager
+def load_section_module(code: str, section_id: str, cwd: str):
+    """Import section source from memory under a unique module name, with cwd set to the topic folder"""
+    module_name = f"dryrun_{section_id}_{uuid.uuid4().hex[:8]}"
+    module = types.ModuleType(module_name)
+    # Compile under the section file name so tracebacks point at the section's own lines
+    module.__file__ = str(Path(cwd) / f"{section_id}.py")
+    previous_cwd = os.getcwd()
+    sys.modules[module_name] = module
+    try:
+        os.chdir(cwd)
+        if cwd not in sys.path:
+            sys.path.insert(0, cwd)
+        # The file is never written; let tracebacks show source lines from memory. The entry outlives
+        # this block so the caller can still format the traceback; it is replaced by the next load.
+        for stale in [k for k in linecache.cache if Path(k).name == f"{section_id}.py"]:
+            linecache.cache.pop(stale, None)
+        linecache.cache[module.__file__] = (len(code), None, code.splitlines(True), module.__file__)
+        exec(compile(code, module.__file__, "exec"), module.__dict__)
+        yield module
+    finally:
+        sys.modules.pop(module_name, None)
+        os.chdir(previous_cwd)
+
+
+def _dry_run_job(code: str, section_id: str, scene_name: str, cwd: str, cpu_seconds: int) -> Tuple[bool, Optional[str]]:
+    """Runs inside a worker: import `code` from memory under a unique module name and build the scene"""
+    apply_resource_limits(cpu_seconds=cpu_seconds)
+    try:
+        with load_section_module(code, section_id, cwd) as module:
+            scene_cls = getattr(module, scene_name, None)
+            if scene_cls is None:
+                return False, f"AttributeError: module '{section_id}' has no attribute '{scene_name}'"
+            scene_cls()
+        return True, None
+    except BaseException:  # SystemExit / KeyboardInterrupt from generated code must not kill the worker
+        return False, traceback.format_exc()
+
+
+class SandboxPool:
+    """Pre-warmed worker processes that dry-run section code from memory.
+
+    A job that times out or kills its worker (rlimit, segfault) tears the whole pool down; it is
+    rebuilt lazily on the next job so one runaway scene cannot wedge later dry runs.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        cpu_seconds: int = DEFAULT_CPU_SECONDS,
+        memory_mb: int = DEFAULT_MEMORY_MB,
+        open_files: int = DEFAULT_OPEN_FILES,
+    ):
+        self.workers = workers
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.open_files = open_files
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Never plain fork: the fixer calls in from threads. The fork server is single-threaded and
+                # has manim preloaded, so rebuilding the pool after a runaway job is cheap.
+                method = "spawn" if default_start_method() == "fork" else None
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=pool_context(method),
+                    initializer=_warm_worker,
+                    initargs=(self.memory_mb, self.open_files),
+                )
+            return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        for process in list(getattr(executor, "_processes", {}).values()):
+            if process.is_alive():
+                process.kill()
+        executor.shutdown(wait=False)
+
+    def run(self, job, *args, timeout: float = DEFAULT_TIMEOUT, label: str = "job"):
+        """Run a module-level function in a warm worker; returns (result, error_message)"""
+        for _ in range(2):
+            executor = self._get_executor()
+            try:
+                future = executor.submit(job, *args)
+                break
+            except RuntimeError:  # Shut down by a concurrent reset between get and submit
+                self._reset(executor)
+        else:
+            return None, "RuntimeError: sandbox pool unavailable"
+        try:
+            return future.result(timeout=timeout), None
+        except FutureTimeout:
+            self._reset(executor)
+            return None, f"TimeoutError: {label} exceeded {timeout}s"
+        except BrokenProcessPool as e:
+            self._reset(executor)
+            return None, f"RuntimeError: {label} worker died (resource limit or crash): {e}"
+
+    def dry_run(self, code: str, section_id: str, output_dir: Path, timeout: float = DEFAULT_TIMEOUT) -> Tuple[bool, Optional[str]]:
+        scene_name = f"{section_id.title().replace('_', '')}Scene"
+        cwd = str(Path(output_dir).resolve())
+        result, error = self.run(
+            _dry_run_job, code, section_id, scene_name, cwd, self.cpu_seconds, timeout=timeout, label=f"dry run of {section_id}"
+        )
+        return result if error is None else (False, error)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_POOL: Optional[SandboxPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_sandbox_pool(**kwargs) -> SandboxPool:
+    """Process-wide pool shared by every fixer in this process"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = SandboxPool(**kwargs)
+        return _POOL
+
+
+@dataclass
+class ProcessLimits:
+    """Limits for one render / validation subprocess and everything it starts; 0 or "" disables one"""
+
+    cpu_seconds: int = 300  # RLIMIT_CPU of each process in the tree
+    memory_mb: int = 8192  # RLIMIT_AS of each process; also memory.max of the render's cgroup
+    open_files: int = DEFAULT_OPEN_FILES  # RLIMIT_NOFILE
+    cgroup: str = ""  # Delegated cgroup v2 directory; each run gets its own child cgroup under it
+    cpu_cores: float = 0  # cpu.max of the render's cgroup
+
+
+@dataclass
+class LimitedRun:
+    """subprocess.run-style result plus what the whole process tree used"""
+
+    args: List[str]
+    returncode: int
+    stdout: str
+    stderr: str
+    wall_seconds: float
+    cpu_seconds: float
+    peak_rss_mb: float
+    limit: Optional[str] = None  # "timeout", "cpu" or "memory" when a limit ended the run
+
+
+_CGROUP_IDS = itertools.count()
+_CGROUP_WARNED = set()
+
+
+def _cgroup_create(limits: ProcessLimits) -> Optional[Path]:
+    path = Path(limits.cgroup) / f"run-{os.getpid()}-{next(_CGROUP_IDS)}"
+    try:
+        path.mkdir()
+        if limits.memory_mb:
+            (path / "memory.max").write_text(str(limits.memory_mb * 1024 * 1024))
+        if limits.cpu_cores:
+            (path / "cpu.max").write_text(f"{int(limits.cpu_cores * 100000)} 100000")
+        return path
+    except OSError as e:
+        if limits.cgroup not in _CGROUP_WARNED:
+            _CGROUP_WARNED.add(limits.cgroup)
+            print(f"⚠️ cgroup {limits.cgroup} unusable, falling back to rlimits only: {e}")
+        with contextlib.suppress(OSError):
+            path.rmdir()
+        return None
+
+
+def _cgroup_read(path: Path, name: str) -> Dict[str, int]:
+    """`key value` lines of a cgroup file; a single-value file comes back as {"value": n}"""
+    try:
+        lines = (path / name).read_text().split("\n")
+    except OSError:
+        return {}
+    values = {}
+    for line in filter(None, lines):
+        parts = line.split()
+        with contextlib.suppress(ValueError):
+            values[parts[0] if len(parts) > 1 else "value"] = int(parts[-1])
+    return values
+
+
+def _cgroup_remove(path: Path):
+    with contextlib.suppress(OSError):
+        (path / "cgroup.kill").write_text("1")
+    for _ in range(50):  # Killed members leave the cgroup asynchronously
+        try:
+            path.rmdir()
+            return
+        except OSError:
+            time.sleep(0.02)
+
+
+def _kill_group(pgid: int):
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(pgid, signal.SIGKILL)
+
+
+def _limit_child(pid: int, limits: ProcessLimits):
+    """prlimit right after start instead of preexec_fn, which is unsafe in the agent's threaded processes"""
+    if resource is None or not hasattr(resource, "prlimit"):
+        return
+    wanted = [
+        (resource.RLIMIT_CPU, limits.cpu_seconds),
+        (resource.RLIMIT_AS, limits.memory_mb * 1024 * 1024),
+        (resource.RLIMIT_NOFILE, limits.open_files),
+    ]
+    for kind, soft in wanted:
+        if soft:
+            with contextlib.suppress(ValueError, OSError):
+                _lower_limit(kind, soft, pid)
+
+
+def _run_unlimited(cmd: List[str], cwd, env, timeout: float) -> LimitedRun:
+    """Platforms without process groups and wait4 (Windows): plain subprocess.run"""
+    start = time.time()
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, cwd=cwd, env=env, timeout=timeout)
+    except subprocess.TimeoutExpired as e:
+        return LimitedRun(list(cmd), -1, "", str(e), time.time() - start, 0.0, 0.0, limit="timeout")
+    return LimitedRun(list(cmd), result.returncode, result.stdout, result.stderr, time.time() - start, 0.0, 0.0)
+
+
+def run_limited(
+    cmd: List[str], cwd=None, env=None, timeout: float = DEFAULT_RENDER_TIMEOUT, limits: Optional[ProcessLimits] = None
+) -> LimitedRun:
+    """Run `cmd` in its own session and process group under `limits`.
+
+    On timeout, and again once the command exits, the whole group is killed, so an ffmpeg that
+    outlives manim cannot keep a core busy. CPU time and peak RSS cover every reaped descendant,
+    or the whole cgroup when one is configured.
+    """
+    limits = limits or ProcessLimits()
+    if not hasattr(os, "wait4"):
+        return _run_unlimited(cmd, cwd, env, timeout)
+    start = time.time()
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(
+            cmd, cwd=cwd, env=env, stdin=subprocess.DEVNULL, stdout=out, stderr=err, start_new_session=True
+        )
+        _limit_child(proc.pid, limits)
+        cgroup = _cgroup_create(limits) if limits.cgroup else None
+        if cgroup is not None:
+            try:
+                (cgroup / "cgroup.procs").write_text(str(proc.pid))
+            except OSError:
+                _cgroup_remove(cgroup)
+                cgroup = None
+
+        timed_out, delay = False, 0.005
+        while True:
+            pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                break
+            if time.time() - start >= timeout:
+                timed_out = True
+                _kill_group(proc.pid)
+                _, status, usage = os.wait4(proc.pid, 0)
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        _kill_group(proc.pid)  # Stragglers that outlived the leader
+
+        cpu = usage.ru_utime + usage.ru_stime
+        peak_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        oom_killed = False
+        if cgroup is not None:
+            cpu = _cgroup_read(cgroup, "cpu.stat").get("usage_usec", cpu * 1e6) / 1e6
+            peak_mb = max(peak_mb, _cgroup_read(cgroup, "memory.peak").get("value", 0) / (1024 * 1024))
+            oom_killed = _cgroup_read(cgroup, "memory.events").get("oom_kill", 0) > 0
+            _cgroup_remove(cgroup)
+
+        out.seek(0)
+        err.seek(0)
+        stdout = out.read().decode("utf-8", errors="replace")
+        stderr = err.read().decode("utf-8", errors="replace")
+
+    # Say which limit ended the run, so the fixer can simplify the scene instead of guessing
+    limit, note = None, None
+    if timed_out:
+        limit, note = "timeout", f"TimeoutError: run exceeded {timeout:g}s; its process group was killed"
+    elif proc.returncode == -signal.SIGXCPU or (limits.cpu_seconds and proc.returncode < 0 and cpu >= limits.cpu_seconds):
+        limit, note = "cpu", f"ResourceError: run exceeded its CPU limit of {limits.cpu_seconds}s"
+    elif oom_killed or (limits.memory_mb and proc.returncode != 0 and "MemoryError" in stderr):
+        limit, note = "memory", f"MemoryError: run exceeded its memory limit of {limits.memory_mb} MB"
+    if note:
+        stderr = f"{stderr.rstrip()}\n{note}\n".lstrip()
+    return LimitedRun(list(cmd), proc.returncode, stdout, stderr, time.time() - start, cpu, round(peak_mb, 1), limit)
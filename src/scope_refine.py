@@ -2,10 +2,19 @@ import re
 from pathlib import Path
 import json
 from dataclasses import dataclass
-import subprocess
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional, Any
 import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ast_fixers import AutoFixEngine
+from manim_index import ManimIndex, ManimLinter, format_lint_report, load_manim_index
+from traceback_reducer import reduce_error_message, reduce_traceback
+from patch_apply import UNIFIED_DIFF_INSTRUCTIONS, apply_model_edit, extract_diff
+from sandbox import DEFAULT_CPU_SECONDS, DEFAULT_MEMORY_MB, ProcessLimits, get_sandbox_pool, run_limited
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +27,8 @@ def get_completion_only(result):
 class ManimCodeErrorAnalyzer:
     """Intelligently analyze Manim code errors and accurately locate the problems"""
 
-    def __init__(self):
+    def __init__(self, index: Optional[ManimIndex] = None):
+        self.index = index if index is not None else load_manim_index()
         self.common_manim_errors = {
             "NameError": self._analyze_name_error,
             "AttributeError": self._analyze_attribute_error,
@@ -29,7 +39,7 @@ class ManimCodeErrorAnalyzer:
             "IndentationError": self._analyze_indentation_error,
         }
 
-    def analyze_error(self, code: str, error_msg: str) -> Dict:
+    def analyze_error(self, code: str, error_msg: str, section_id: Optional[str] = None) -> Dict:
         """Analyze errors and return precise error messages"""
         error_info = {
             "error_type": None,
@@ -40,10 +50,11 @@ class ManimCodeErrorAnalyzer:
             "suggested_fix": None,
             "fix_scope": "single_line",
             "relevant_code_block": None,
+            "error_span": None,
         }
 
         # Parse the error message
-        error_info.update(self._parse_error_message(error_msg))
+        error_info.update(self._parse_error_message(error_msg, code, section_id))
 
         # Conduct specific analysis based on the type of error
         if error_info["error_type"] in self.common_manim_errors:
@@ -54,19 +65,19 @@ class ManimCodeErrorAnalyzer:
         error_info["relevant_code_block"] = self._extract_relevant_code_block(code, error_info)
         return error_info
 
-    def _parse_error_message(self, error_msg: str) -> Dict:
+    def _parse_error_message(self, error_msg: str, code: Optional[str] = None, section_id: Optional[str] = None) -> Dict:
         """Parse the error message and extract basic information"""
         result = {}
+        reduced = reduce_traceback(error_msg, section_id, code)
 
         # Extract the error type
-        error_type_match = re.search(r"(\w+Error|\w+Exception)", error_msg)
-        if error_type_match:
-            result["error_type"] = error_type_match.group(1)
+        if reduced.error_type:
+            result["error_type"] = reduced.error_type
 
-        # Extract the line number
-        line_match = re.search(r"line (\d+)", error_msg)
-        if line_match:
-            result["line_number"] = int(line_match.group(1))
+        # Extract the line number (deepest frame in the section file, not manim internals)
+        if reduced.line_number:
+            result["line_number"] = reduced.line_number
+            result["error_span"] = reduced.span
 
         # Extract the column number
         column_match = re.search(r"column (\d+)", error_msg)
@@ -74,9 +85,8 @@ class ManimCodeErrorAnalyzer:
             result["column"] = int(column_match.group(1))
 
         # Extract the problematic code
-        code_match = re.search(r'File ".*?", line \d+.*?\n\s*(.*)', error_msg)
-        if code_match:
-            result["problematic_code"] = code_match.group(1).strip()
+        if reduced.frames and reduced.frames[-1].source:
+            result["problematic_code"] = reduced.frames[-1].source
 
         return result
 
@@ -127,6 +137,15 @@ class ManimCodeErrorAnalyzer:
         if "unsupported operand type" in error_msg:
             return {"fix_scope": "single_line", "suggested_fix": "Check whether the operand types match"}
 
+        # Check if it's an unknown keyword argument of a Manim callable
+        kwarg_match = re.search(r"(\w+)(?:\.(\w+))?\(\) got an unexpected keyword argument '(\w+)'", error_msg)
+        if kwarg_match:
+            owner, method, kwarg = kwarg_match.groups()
+            params = self.index.find_method(owner, method) if method else self.index.call_params(owner)
+            if params:
+                accepted = ", ".join(params["params"])
+                return {"fix_scope": "single_line", "suggested_fix": f"'{kwarg}' is not accepted; valid keyword arguments: {accepted}"}
+
         return {"fix_scope": "function"}
 
     def _analyze_value_error(self, code: str, error_msg: str, error_info: Dict) -> Dict:
@@ -152,8 +171,10 @@ class ManimCodeErrorAnalyzer:
         if error_info["fix_scope"] == "single_line" and error_info["line_number"]:
             # Single line error: return the error line and surrounding lines
             line_num = error_info["line_number"] - 1  # Convert to 0-indexed
-            start = max(0, line_num - 5)
-            end = min(len(lines), line_num + 5)
+            span_start, span_end = error_info.get("error_span") or (line_num + 1, line_num + 1)
+            # Always include the whole failing statement, even when it spans several lines
+            start = max(0, min(line_num, span_start - 1) - 5)
+            end = min(len(lines), max(line_num, span_end - 1) + 5)
             return "\n".join(lines[start:end])
 
         elif error_info["fix_scope"] == "function":
@@ -215,44 +236,44 @@ class ManimCodeErrorAnalyzer:
 
     def _get_manim_suggestions(self, undefined_name: str) -> List[str]:
         """Get suggestions for Manim-related undefined names"""
-        manim_objects = {
-            "Text": "from manim import Text",
-            "Circle": "from manim import Circle",
-            "Square": "from manim import Square",
-            "VGroup": "from manim import VGroup",
-            "Create": "from manim import Create",
-            "Write": "from manim import Write",
-            "FadeIn": "from manim import FadeIn",
-            "FadeOut": "from manim import FadeOut",
-            "Transform": "from manim import Transform",
-        }
-
-        suggestions = []
-        for obj_name, import_stmt in manim_objects.items():
-            if undefined_name.lower() in obj_name.lower() or obj_name.lower() in undefined_name.lower():
-                suggestions.append(import_stmt)
-
-        return suggestions
+        if self.index.has_name(undefined_name):
+            return [f"from manim import {undefined_name}"]
+        return [f"{name} (from manim import {name})" for name in self.index.similar_names(undefined_name)]
 
     def _get_attribute_suggestion(self, obj_type: str, attr_name: str) -> str:
         """Get suggestions for attributes of a Manim object"""
-        common_fixes = {
-            "Text": {"color": "set_color()", "font": "font_size parameter in constructor"},
-            "Mobject": {"move_to": "move_to() method exists", "shift": "shift() method exists"},
-        }
-
-        if obj_type in common_fixes and attr_name in common_fixes[obj_type]:
-            return f"Try to use {common_fixes[obj_type][attr_name]}"
+        similar = self.index.similar_attributes(obj_type, attr_name)
+        if similar:
+            return f"{obj_type} has no attribute {attr_name}; try {', '.join(similar)}"
 
         return f"Check whether the {obj_type} object has the {attr_name} attribute"
 
 
 class ScopeRefineFixer:
 
-    def __init__(self, gpt_request_func, MAX_CODE_TOKEN_LENGTH):
-        self.analyzer = ManimCodeErrorAnalyzer()
+    def __init__(
+        self,
+        gpt_request_func,
+        MAX_CODE_TOKEN_LENGTH,
+        meter=None,
+        fix_memory=None,
+        race_repairs=True,
+        use_sandbox_pool=True,
+    ):
+        index = load_manim_index()
+        self.analyzer = ManimCodeErrorAnalyzer(index)
+        self.linter = ManimLinter(index)
         self.request_gpt = gpt_request_func
         self.MAX_CODE_TOKEN_LENGTH = MAX_CODE_TOKEN_LENGTH
+        self.meter = meter  # Optional TokenMeter; fix requests are recorded under stage "fix"
+        self.auto_fixer = AutoFixEngine()
+        self.fix_memory = fix_memory  # Optional FixMemory shared across topics and runs
+        self._pending_recall: Dict[str, Tuple[str, str]] = {}  # section_id -> (signature key, patch id)
+        self.last_fix_source: Optional[str] = None  # "rule" | "memory" | "llm" for the latest fix_code_smart call
+        self._fix_tokens = 0  # tokens spent on LLM fixes by this fixer
+        self._fix_tokens_lock = threading.Lock()
+        self.race_repairs = race_repairs  # Run local block repair and complete repair concurrently
+        self.use_sandbox_pool = use_sandbox_pool  # Dry runs in pre-warmed workers instead of `python -c`
 
         self.common_fixes = self._load_common_fixes()
         self.error_patterns = self._load_error_patterns()
@@ -280,6 +301,33 @@ class ScopeRefineFixer:
         # Last resort: convert to string
         return str(response)
 
+    def _request_fix(self, prompt: str, section_id: str):
+        """Send a fix request, metered when a TokenMeter is attached"""
+        request = self.request_gpt
+        if self.meter is not None:
+            request = self.meter.wrap(self.request_gpt, stage="fix", section_id=section_id)
+        response = request(prompt, max_tokens=self.MAX_CODE_TOKEN_LENGTH)
+        if isinstance(response, tuple) and len(response) == 2 and isinstance(response[1], dict):
+            with self._fix_tokens_lock:
+                self._fix_tokens += response[1].get("total_tokens", 0)
+        return response
+
+    def lint(self, code: str):
+        """Static check against the Manim API index (undefined names, unknown attributes, bad kwargs)"""
+        return self.linter.lint(code)
+
+    def _lint_prompt_section(self, code: str, code_block: Optional[str] = None) -> str:
+        issues = self.lint(code)
+        if code_block is not None:
+            lines = code.split("\n")
+            issues = [i for i in issues if lines[i.line - 1].strip() and lines[i.line - 1] in code_block]
+        if not issues:
+            return ""
+        return f"""
+        **Static API Check (Manim {self.linter.index.version}):**
+        {format_lint_report(issues)}
+        """
+
     def _load_common_fixes(self) -> Dict[str, str]:
         """Load common error fix patterns"""
         return {
@@ -333,21 +381,15 @@ class ScopeRefineFixer:
 
         return error_type, error_category, suggestions
 
-    def extract_error_context(self, error_msg: str) -> Dict[str, Any]:
-        """Extract error context information"""
-        context = {"line_number": None, "error_line": None, "traceback": error_msg, "specific_error": None}
-
-        # Extract line number
-        line_match = re.search(r"line (\d+)", error_msg)
-        if line_match:
-            context["line_number"] = int(line_match.group(1))
+    def extract_error_context(self, error_msg: str, section_id: Optional[str] = None) -> Dict[str, Any]:
+        """Extract error context information (the traceback itself is already in the prompt)"""
+        reduced = reduce_traceback(error_msg, section_id)
+        context = {"line_number": reduced.line_number, "error_line": None, "specific_error": None}
 
-        # Extract specific error information
-        lines = error_msg.split("\n")
-        for line in reversed(lines):
-            if line.strip() and not line.startswith("  "):
-                context["specific_error"] = line.strip()
-                break
+        if reduced.frames:
+            context["error_line"] = reduced.frames[-1].source or None
+        if reduced.error_type:
+            context["specific_error"] = f"{reduced.error_type}: {reduced.message.splitlines()[0] if reduced.message else ''}"
 
         return context
 
@@ -363,7 +405,15 @@ class ScopeRefineFixer:
 
     def dry_run_test(self, code: str, section_id: str, output_dir: Path) -> Tuple[bool, Optional[str]]:
         """Execute dry run test (do not render video)"""
-        test_file = output_dir / f"test_{section_id}.py"
+        if self.use_sandbox_pool:
+            return get_sandbox_pool().dry_run(code, section_id, output_dir)
+        return self._dry_run_subprocess(code, section_id, output_dir)
+
+    def _dry_run_subprocess(self, code: str, section_id: str, output_dir: Path) -> Tuple[bool, Optional[str]]:
+        """Dry run in a fresh interpreter (pays the manim import every time)"""
+        # Unique module name: concurrent repair strategies dry-run the same section at once
+        module_name = f"test_{section_id}_{uuid.uuid4().hex[:8]}"
+        test_file = output_dir / f"{module_name}.py"
 
         # Create test version of code (add quick exit)
         test_code = code.replace(
@@ -376,9 +426,10 @@ class ScopeRefineFixer:
                 f.write(test_code)
 
             scene_name = f"{section_id.title().replace('_', '')}Scene"
-            cmd = ["python", "-c", f"from test_{section_id} import {scene_name}; scene = {scene_name}(); print('Syntax OK')"]
+            cmd = ["python", "-c", f"from {module_name} import {scene_name}; scene = {scene_name}(); print('Syntax OK')"]
 
-            result = subprocess.run(cmd, capture_output=True, text=True, cwd=output_dir, timeout=10)
+            limits = ProcessLimits(cpu_seconds=DEFAULT_CPU_SECONDS, memory_mb=DEFAULT_MEMORY_MB)  # Same as the pool's
+            result = run_limited(cmd, cwd=output_dir, timeout=10, limits=limits)
 
             test_file.unlink()  # Clean up test file
 
@@ -420,8 +471,9 @@ class ScopeRefineFixer:
 
     def generate_fix_prompt(self, section_id: str, current_code: str, error_msg: str, attempt: int) -> str:
         """Generate high-quality fix prompt"""
+        error_msg = reduce_error_message(error_msg, section_id, current_code)
         error_type, error_category, suggestions = self.classify_error(error_msg)
-        error_context = self.extract_error_context(error_msg)
+        error_context = self.extract_error_context(error_msg, section_id)
 
         # Adjust fix strategy based on attempt number
         if attempt == 1:
@@ -455,6 +507,7 @@ class ScopeRefineFixer:
 
         **Suggestions:**
         {chr(10).join(f"- {s}" for s in suggestions)}
+        {self._lint_prompt_section(current_code)}
         """
 
         if strategy == "focused_fix":
@@ -488,11 +541,9 @@ class ScopeRefineFixer:
             - Follow best practices for Scene construction
             """
 
-        return (
-            base_prompt
-            + specific_prompt
-            + """
-
+        if strategy == "complete_rewrite":
+            # Full file only as the last resort; earlier attempts answer with a diff
+            output_format = """
             **Requirements:**
             1. Output ONLY the complete, fixed Python code
             2. No explanations or comments outside the code
@@ -501,64 +552,166 @@ class ScopeRefineFixer:
             5. Use proper Manim CE v0.19.0 syntax
 
             **Code:**"""
-        )
+        else:
+            output_format = f"""
+            **Requirements:**
+            1. Ensure the patched code is syntactically correct
+            2. Test all variable names and method calls
+            3. Use proper Manim CE v0.19.0 syntax
+
+            **Output Format:**
+            {UNIFIED_DIFF_INSTRUCTIONS}
+
+            **Diff:**"""
+
+        return base_prompt + specific_prompt + "\n" + output_format
 
     def fix_code_smart(self, section_id: str, code: str, error_msg: str, output_dir: Path) -> Optional[str]:
         """Smart fix code, prioritize local fix, fallback to complete rewrite if failed"""
-
+        # Only section-file frames and the final exception reach the rules, the memo and the prompts
+        reduced_msg = reduce_error_message(error_msg, section_id, code)
+        logger.info(f"{section_id} traceback reduced from {len(error_msg or '')} to {len(reduced_msg)} chars")
+        error_msg = reduced_msg
+
+        # Mechanical failures (missing imports, renamed APIs, bad kwargs) are rewritten locally, no LLM call
+        auto_fix = self.auto_fixer.fix(code, error_msg, section_id)
+        if auto_fix:
+            print(f"🛠️ {section_id} fixed by rule '{auto_fix.rule}': {auto_fix.description}")
+            self.last_fix_source = "rule"
+            return auto_fix.code
+
+        # Errors already solved in an earlier topic/run reuse the stored minimal diff
+        if self.fix_memory is not None:
+            recalled = self.fix_memory.recall(code, error_msg, section_id)
+            if recalled:
+                patched_code, key, patch_id = recalled
+                self._pending_recall[section_id] = (key, patch_id)
+                print(f"🧠 {section_id} fixed from fix memory")
+                self.last_fix_source = "memory"
+                return patched_code
+
+        self.last_fix_source = "llm"
+        tokens_before, start = self._fix_tokens, time.time()
+        fixed_code = self._fix_with_llm(section_id, code, error_msg, output_dir)
+        if fixed_code and self.fix_memory is not None:
+            self.fix_memory.remember(
+                error_msg, section_id, code, fixed_code, tokens=self._fix_tokens - tokens_before, seconds=time.time() - start
+            )
+        return fixed_code
+
+    def report_render_result(self, section_id: str, success: bool):
+        """Called after each render so a recalled patch can be confirmed or rejected"""
+        pending = self._pending_recall.pop(section_id, None)
+        if pending and self.fix_memory is not None:
+            self.fix_memory.confirm(*pending, success=success)
+
+    def _fix_with_llm(self, section_id: str, code: str, error_msg: str, output_dir: Path) -> Optional[str]:
+        """Local block repair and complete repair, raced or sequential; first validated result wins"""
         # Analyze error
-        error_info = self.analyzer.analyze_error(code, error_msg)
+        error_info = self.analyzer.analyze_error(code, error_msg, section_id)
         # Decide on fix scope based on error analysis
-        if error_info["fix_scope"] in ["single_line", "function", "section"]:
-
-            relevant_code = error_info.get("relevant_code_block")
-            if relevant_code:
-                fixed_block = self._fix_code_block(section_id, relevant_code, error_msg, error_info)
-                if fixed_block:
-                    merged_code = self._merge_fixed_block(code, relevant_code, fixed_block, error_info)
-                    if merged_code:
-                        is_valid, syntax_error = self.validate_code_syntax(merged_code)
-                        if is_valid:
-                            is_dry_run_ok, dry_run_error = self.dry_run_test(merged_code, section_id, output_dir)
-                            if is_dry_run_ok:
-                                return merged_code
-                            else:
-                                print(f"⚠️ The dry run failed after local repair: {dry_run_error}")
-                        else:
-                            print(f"⚠️ The syntax error after local repair: {syntax_error}")
-                    else:
-                        print("⚠️ The code block merge failed after local repair")
-                else:
-                    print("⚠️ The local repair failed after local repair")
-            else:
-                print("⚠️ The relevant code block cannot be extracted after local repair")
-        else:
+        local_possible = error_info["fix_scope"] in ["single_line", "function", "section"]
+        if local_possible and not error_info.get("relevant_code_block"):
+            print("⚠️ The relevant code block cannot be extracted for local repair")
+            local_possible = False
+        elif not local_possible:
             print("🔄 The error scope is large, directly use complete repair")
 
-        print("⚠️ The smart repair failed, fallback to complete repair")
-        return self.fix_code_with_multi_stage_validation(section_id, code, error_msg, output_dir)
+        if not local_possible:
+            return self.fix_code_with_multi_stage_validation(section_id, code, error_msg, output_dir)
+
+        if not self.race_repairs:
+            fixed_code = self._try_local_fix(section_id, code, error_msg, error_info, output_dir)
+            if fixed_code:
+                return fixed_code
+            print("⚠️ The smart repair failed, fallback to complete repair")
+            return self.fix_code_with_multi_stage_validation(section_id, code, error_msg, output_dir)
+
+        # Both strategies validate independently; the loser stops before its next LLM call
+        cancel = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=2)
+        futures = {
+            pool.submit(self._try_local_fix, section_id, code, error_msg, error_info, output_dir): "local",
+            pool.submit(
+                self.fix_code_with_multi_stage_validation, section_id, code, error_msg, output_dir, cancel_event=cancel
+            ): "complete",
+        }
+        try:
+            for future in as_completed(futures):
+                try:
+                    fixed_code = future.result()
+                except Exception as e:
+                    print(f"⚠️ {futures[future]} repair raised: {e}")
+                    continue
+                if fixed_code:
+                    print(f"🏁 {section_id} fixed by {futures[future]} repair")
+                    return fixed_code
+            return None
+        finally:
+            # Do not wait for the losing strategy's in-flight LLM call
+            cancel.set()
+            pool.shutdown(wait=False)
+
+    def _try_local_fix(self, section_id: str, code: str, error_msg: str, error_info: Dict, output_dir: Path) -> Optional[str]:
+        """Fix only the block around the error, merge it back and validate"""
+        relevant_code = error_info["relevant_code_block"]
+        fixed_block = self._fix_code_block(section_id, relevant_code, error_msg, error_info, full_code=code)
+        if not fixed_block:
+            print("⚠️ The local repair failed")
+            return None
+        if extract_diff(fixed_block) is not None:
+            # The model only saw the block, so its hunk line numbers are relative to the block
+            patched_block, mode = apply_model_edit(relevant_code, fixed_block)
+            if not patched_block:
+                print(f"⚠️ The local repair diff could not be applied ({mode})")
+                return None
+            fixed_block = patched_block
+        merged_code = self._merge_fixed_block(code, relevant_code, fixed_block, error_info)
+        if not merged_code:
+            print("⚠️ The code block merge failed after local repair")
+            return None
+        is_valid, syntax_error = self.validate_code_syntax(merged_code)
+        if not is_valid:
+            print(f"⚠️ The syntax error after local repair: {syntax_error}")
+            return None
+        is_dry_run_ok, dry_run_error = self.dry_run_test(merged_code, section_id, output_dir)
+        if not is_dry_run_ok:
+            print(f"⚠️ The dry run failed after local repair: {dry_run_error}")
+            return None
+        return merged_code
 
     def fix_code_with_multi_stage_validation(
-        self, section_id: str, current_code: str, error_msg: str, output_dir: Path, max_attempts: int = 3
+        self,
+        section_id: str,
+        current_code: str,
+        error_msg: str,
+        output_dir: Path,
+        max_attempts: int = 3,
+        cancel_event: Optional[threading.Event] = None,
     ) -> Optional[str]:
         """Multi-stage validation code repair"""
         logger.info(f"Start fixing the code errors for {section_id}")
 
         for attempt in range(1, max_attempts + 1):
+            if cancel_event is not None and cancel_event.is_set():
+                logger.info(f"{section_id} complete repair cancelled, another strategy already succeeded")
+                return None
             logger.info(f"Start fixing the code errors for {section_id} attempt {attempt}/{max_attempts}")
 
             try:
                 fix_prompt = self.generate_fix_prompt(section_id, current_code, error_msg, attempt)
-                response = self.request_gpt(fix_prompt, max_tokens=self.MAX_CODE_TOKEN_LENGTH)
+                response = self._request_fix(fix_prompt, section_id)
                 response = get_completion_only(response)
 
-                fixed_code = self._extract_content_from_response(response)
-
-                fixed_code = self._clean_code_format(fixed_code)
+                response_text = self._extract_content_from_response(response)
+                fixed_code, mode = apply_model_edit(current_code, response_text)
+                if mode == "rewrite":
+                    fixed_code = self._clean_code_format(fixed_code)
 
                 if not fixed_code:
-                    logger.warning(f"Attempt {attempt}: Failed to extract valid code")
+                    logger.warning(f"Attempt {attempt}: Failed to apply the model edit ({mode})")
                     continue
+                logger.info(f"Attempt {attempt}: model edit applied as {mode}")
 
                 # Stage 1: Syntax validation
                 is_valid_syntax, syntax_error = self.validate_code_syntax(fixed_code)
@@ -589,11 +742,14 @@ class ScopeRefineFixer:
         logger.error(f"{section_id} fix failed - Reached maximum attempts")
         return None
 
-    def _fix_code_block(self, section_id: str, code_block: str, error_msg: str, error_info: Dict) -> Optional[str]:
+    def _fix_code_block(
+        self, section_id: str, code_block: str, error_msg: str, error_info: Dict, full_code: str = ""
+    ) -> Optional[str]:
         """Fix the code block"""
+        error_msg = reduce_error_message(error_msg, section_id, full_code or None)
         # Enhanced error analysis information
         error_type, error_category, suggestions = self.classify_error(error_msg)
-        error_context = self.extract_error_context(error_msg)
+        error_context = self.extract_error_context(error_msg, section_id)
 
         prompt = f"""
         You are an expert Manim Community Edition v0.19.0 developer. Fix the error in the following code block.
@@ -614,7 +770,7 @@ class ScopeRefineFixer:
 
         **Suggestions:**
         {chr(10).join(f"- {s}" for s in suggestions)}
-
+        {self._lint_prompt_section(full_code, code_block) if full_code else ""}
         **Code Block to Fix:**
         ```python
         {code_block}
@@ -625,16 +781,21 @@ class ScopeRefineFixer:
         2. Maintain the original code structure and logic
         3. Make minimal necessary changes
         4. Ensure compatibility with Manim CE v0.19.0
-        5. Output ONLY the fixed Python code block
 
-        **Fixed Code:**
+        **Output Format:**
+        {UNIFIED_DIFF_INSTRUCTIONS}
+
+        **Diff:**
         """
 
         try:
-            response = self.request_gpt(prompt, max_tokens=self.MAX_CODE_TOKEN_LENGTH)
+            response = self._request_fix(prompt, section_id)
             response = get_completion_only(response)
-            fixed_code = self._extract_content_from_response(response)
-            return self._clean_code_format(fixed_code)
+            response_text = self._extract_content_from_response(response)
+            # A diff is returned as-is and applied to the block it was written against; a rewritten block is merged
+            if extract_diff(response_text) is not None:
+                return response_text
+            return self._clean_code_format(response_text)
 
         except Exception as e:
             print(f"Fix code block failed: {e}")
@@ -697,10 +858,10 @@ class GridPositionExtractor:
     """Extract grid position information from Manim code"""
 
     def __init__(self):
-        # Match place_at_grid and place_in_area methods
+        # Match place_at_grid and place_in_area methods (rows A-F landscape, A-H portrait)
         self.grid_patterns = [
-            r'self\.place_at_grid\(\s*([^,]+),\s*[\'"]([A-F][1-6])[\'"](?:,\s*scale_factor=([0-9.]+))?\s*\)',
-            r'self\.place_in_area\(\s*([^,]+),\s*[\'"]([A-F][1-6])[\'"],\s*[\'"]([A-F][1-6])[\'"](?:,\s*scale_factor=([0-9.]+))?\s*\)',
+            r'self\.place_at_grid\(\s*([^,]+),\s*[\'"]([A-H][1-6])[\'"](?:,\s*scale_factor=([0-9.]+))?\s*\)',
+            r'self\.place_in_area\(\s*([^,]+),\s*[\'"]([A-H][1-6])[\'"],\s*[\'"]([A-H][1-6])[\'"](?:,\s*scale_factor=([0-9.]+))?\s*\)',
         ]
 
     def extract_grid_positions(self, code: str) -> List[GridPosition]:
@@ -0,0 +1,270 @@
+import json
+import mimetypes
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote, urlparse
+
+# Importing agent pays manim, the SDKs and api_config.json once, for the life of the service
+from agent import TeachingVideoAgent, build_arg_parser, build_run_config, get_api_and_output
+from gpt_request import _CFG
+from manim_index import load_manim_index
+from metrics import METRICS_FILE, MetricsAggregator
+from sandbox import get_sandbox_pool
+from trace_export import write_topic_trace
+
+STAGES = ("outline", "storyboard", "code", "render", "merge")
+ARTIFACT_SUFFIXES = {".mp4", ".m3u8", ".ts", ".py", ".json", ".md", ".txt"}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+@dataclass
+class ServiceJob:
+    id: str
+    topic: str
+    idx: int
+    state: str = "queued"  # queued | running | cancelling | done | failed | cancelled
+    stage: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    video_path: Optional[str] = None
+    error: str = ""
+    agent: Optional[TeachingVideoAgent] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "topic": self.topic,
+            "state": self.state,
+            "stage": self.stage,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "video_path": self.video_path,
+            "error": self.error,
+        }
+        agent = self.agent
+        if agent is not None:
+            data["output_dir"] = str(agent.output_dir)
+            data["sections"] = {
+                section.id: agent.section_status.get(section.id, "rendering" if self.stage == "render" else "pending")
+                for section in agent.sections
+            }
+            if agent.assembler is not None:
+                data["preview"] = str(agent.assembler.playlist)
+        return data
+
+
+class Code2VideoService:
+    """Runs topics inside one long-lived process so imports, SDK clients, the Manim API index and
+    the sandbox pool stay warm between jobs"""
+
+    def __init__(self, args, max_jobs: int = 1):
+        self.args = args
+        self.cfg = build_run_config(args)
+        _, folder_name = get_api_and_output(args.API)
+        self.folder = (
+            Path(__file__).resolve().parent / "CASES" / f"{args.folder_prefix}_{folder_name}_service_{time.strftime('%Y%m%d_%H%M%S')}"
+        )
+        self.jobs: Dict[str, ServiceJob] = {}
+        self.metrics = MetricsAggregator(self.folder / METRICS_FILE)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs)
+
+    def warm_up(self):
+        start = time.time()
+        load_manim_index()
+        if self.cfg.use_sandbox_pool:
+            get_sandbox_pool().run(os.getpid, timeout=120, label="warm-up")  # Spawns the workers and imports manim
+        print(f"🔥 Service warm in {time.time() - start:.1f}s")
+
+    def submit(self, topic: str) -> ServiceJob:
+        with self._lock:
+            job = ServiceJob(id=uuid.uuid4().hex[:12], topic=topic, idx=len(self.jobs))
+            self.jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def cancel(self, job_id: str) -> Optional[ServiceJob]:
+        """Queued jobs never start. A running job drops its pending section renders, running renders
+        stop at their next fix attempt or feedback round, and the job ends at the next stage boundary"""
+        job = self.jobs.get(job_id)
+        if job is not None and job.state in ("queued", "running"):
+            job.cancel_event.set()
+            if job.state == "queued":
+                job.state = "cancelled"
+                return job
+            job.state = "cancelling"
+            if job.agent is not None:
+                job.agent.cancel()
+        return job
+
+    def _run(self, job: ServiceJob):
+        if job.cancel_event.is_set():
+            return
+        job.state, job.started = "running", time.time()
+        try:
+            job.agent = agent = TeachingVideoAgent(idx=job.idx, knowledge_point=job.topic, folder=self.folder, cfg=self.cfg)
+            steps = (
+                agent.generate_outline,
+                agent.generate_storyboard,
+                agent.generate_codes,
+                agent.render_all_sections,
+                agent.merge_videos,
+            )
+            result = None
+            with agent.span("topic"):
+                for stage, step in zip(STAGES, steps):
+                    if job.cancel_event.is_set():
+                        raise JobCancelled()
+                    job.stage = stage
+                    with agent.span(stage):
+                        result = step()
+            agent.token_meter.write_report(agent.output_dir / "token_report.json")
+            write_topic_trace(agent.output_dir)
+            job.video_path = result
+            job.state = "done" if result else "failed"
+        except JobCancelled:
+            job.state = "cancelled"
+        except Exception as e:
+            job.state, job.error = "failed", f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        finally:
+            job.finished = time.time()
+            print(f"📦 Service job {job.id} ({job.topic}) {job.state}")
+
+    def artifacts(self, job: ServiceJob) -> List[str]:
+        if job.agent is None:
+            return []
+        root = job.agent.output_dir
+        return sorted(
+            str(path.relative_to(root))
+            for path in root.rglob("*")
+            if path.is_file() and path.suffix in ARTIFACT_SUFFIXES and "partial_movie_files" not in path.parts
+        )
+
+    def artifact_path(self, job: ServiceJob, relative: str) -> Optional[Path]:
+        if job.agent is None:
+            return None
+        root = job.agent.output_dir.resolve()
+        path = (root / relative).resolve()
+        if root not in path.parents or not path.is_file():  # No escaping the job's output_dir
+            return None
+        return path
+
+
+def make_handler(service: Code2VideoService):
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, payload: Any):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _job(self, job_id: str) -> Optional[ServiceJob]:
+            job = service.jobs.get(job_id)
+            if job is None:
+                self._send_json(404, {"error": f"unknown job {job_id}"})
+            return job
+
+        def do_GET(self):
+            parts = [unquote(p) for p in urlparse(self.path).path.strip("/").split("/") if p]
+            if parts == ["health"]:
+                return self._send_json(200, {"ok": True, "jobs": len(service.jobs)})
+            if parts == ["metrics"]:
+                body = service.metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if parts == ["jobs"]:
+                return self._send_json(200, [job.to_dict() for job in service.jobs.values()])
+            if len(parts) >= 2 and parts[0] == "jobs":
+                job = self._job(parts[1])
+                if job is None:
+                    return
+                if len(parts) == 2:
+                    return self._send_json(200, job.to_dict())
+                if parts[2] == "artifacts" and len(parts) == 3:
+                    return self._send_json(200, service.artifacts(job))
+                if parts[2] == "artifacts":
+                    path = service.artifact_path(job, "/".join(parts[3:]))
+                    if path is None:
+                        return self._send_json(404, {"error": "artifact not found"})
+                    self.send_response(200)
+                    self.send_header("Content-Type", mimetypes.guess_type(path.name)[0] or "application/octet-stream")
+                    self.send_header("Content-Length", str(path.stat().st_size))
+                    self.end_headers()
+                    with open(path, "rb") as f:
+                        while chunk := f.read(1 << 20):
+                            self.wfile.write(chunk)
+                    return
+            self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            parts = [unquote(p) for p in urlparse(self.path).path.strip("/").split("/") if p]
+            if parts == ["jobs"]:
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    return self._send_json(400, {"error": "body must be JSON"})
+                if not isinstance(body, dict):
+                    return self._send_json(400, {"error": "body must be a JSON object"})
+                topic = str(body.get("topic", "")).strip()
+                if not topic:
+                    return self._send_json(400, {"error": "'topic' is required"})
+                return self._send_json(202, service.submit(topic).to_dict())
+            if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+                job = self._job(parts[1])
+                if job is not None:
+                    service.cancel(job.id)
+                    self._send_json(200, job.to_dict())
+                return
+            self._send_json(404, {"error": "not found"})
+
+        def log_message(self, format, *args):
+            pass  # Pipeline output already goes to stdout; keep it readable
+
+    return Handler
+
+
+def main():
+    parser = build_arg_parser()
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max_jobs", type=int, help="topics processed concurrently", default=1)
+    args = parser.parse_args()
+    args.iconfinder_api_key = _CFG.get("iconfinder", {}).get("api_key")
+
+    service = Code2VideoService(args, max_jobs=args.max_jobs)
+    service.warm_up()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"🌐 Code2Video service on http://{args.host}:{args.port} (output: {service.folder})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        get_sandbox_pool().shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import json
+import os
+import time
+import threading
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Any
+
+from helpers import append_jsonl, read_jsonl
+
+
+class TokenBudgetExceeded(Exception):
+    """Raised before an LLM call once the topic has spent its token budget"""
+
+
+@dataclass
+class LLMCallRecord:
+    """One LLM request as seen by the meter"""
+
+    topic: str
+    stage: str
+    section_id: Optional[str]
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    latency: float
+    retries: int
+    ok: bool
+    pid: int
+    timestamp: float  # When the call returned; it started `latency` seconds earlier
+    tid: int = 0
+    run_id: str = ""  # The agent run that made the call; a resumed topic appends to the same log
+
+
+def usage_from_response(response) -> Dict[str, Any]:
+    """Best-effort token usage extraction for responses that come without a usage dict (e.g. Google genai SDK)"""
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    if response is None:
+        return usage
+    # Google genai SDK
+    meta = getattr(response, "usage_metadata", None)
+    if meta is not None:
+        usage["prompt_tokens"] = getattr(meta, "prompt_token_count", 0) or 0
+        usage["completion_tokens"] = getattr(meta, "candidates_token_count", 0) or 0
+        usage["total_tokens"] = getattr(meta, "total_token_count", 0) or usage["prompt_tokens"] + usage["completion_tokens"]
+        usage["model"] = getattr(response, "model_version", None)
+        return usage
+    raw = getattr(response, "usage", None)
+    if raw is not None:
+        # OpenAI format
+        if hasattr(raw, "prompt_tokens"):
+            usage["prompt_tokens"] = raw.prompt_tokens or 0
+            usage["completion_tokens"] = raw.completion_tokens or 0
+            usage["total_tokens"] = raw.total_tokens or 0
+        # Anthropic format
+        elif hasattr(raw, "input_tokens"):
+            usage["prompt_tokens"] = raw.input_tokens or 0
+            usage["completion_tokens"] = raw.output_tokens or 0
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    usage["model"] = getattr(response, "model", None)
+    return usage
+
+
+class TokenMeter:
+    """Records every LLM call of a topic into a JSONL log shared by all threads and render processes.
+
+    Each process that works on the topic (the agent itself and every render worker) builds its own
+    meter on the same `log_path` and `run_id`; totals and budgets are computed from this run's records
+    in the log, so usage spent inside subprocesses is visible to the parent. Records of earlier runs
+    on the same output dir (resumed topics) are ignored.
+    """
+
+    def __init__(
+        self,
+        log_path,
+        topic: str,
+        token_budget: int = 0,
+        prices: Optional[Dict[str, Dict[str, float]]] = None,
+        metrics=None,
+        run_id: Optional[str] = None,
+    ):
+        self.log_path = Path(log_path)
+        self.topic = topic
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.token_budget = token_budget
+        self.prices = prices or {}
+        self.metrics = metrics  # Optional MetricsWriter for live LLM counters and latency histograms
+        self._lock = threading.Lock()
+        # Running total of this run's tokens; each refresh only reads lines appended since the last
+        self._offset = 0
+        self._spent = 0
+
+    def record(
+        self,
+        stage: str,
+        usage: Optional[Dict[str, Any]],
+        latency: float,
+        section_id: Optional[str] = None,
+        model: Optional[str] = None,
+        ok: bool = True,
+    ) -> LLMCallRecord:
+        usage = usage or {}
+        prompt_tokens = int(usage.get("prompt_tokens", 0) or 0)
+        completion_tokens = int(usage.get("completion_tokens", 0) or 0)
+        rec = LLMCallRecord(
+            topic=self.topic,
+            stage=stage,
+            section_id=section_id,
+            model=model or usage.get("model") or "unknown",
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=int(usage.get("total_tokens", 0) or 0) or prompt_tokens + completion_tokens,
+            latency=round(latency, 3),
+            retries=int(usage.get("retries", 0) or 0),
+            ok=ok,
+            pid=os.getpid(),
+            timestamp=time.time(),
+            tid=threading.get_native_id(),
+            run_id=self.run_id,
+        )
+        with self._lock:
+            append_jsonl(self.log_path, asdict(rec))
+        if self.metrics is not None:
+            labels = {"model": rec.model, "stage": stage}
+            self.metrics.inc("llm_requests", **labels, result="ok" if ok else "error")
+            self.metrics.inc("llm_tokens", prompt_tokens, **labels, kind="prompt")
+            self.metrics.inc("llm_tokens", completion_tokens, **labels, kind="completion")
+            self.metrics.observe("llm_latency_seconds", latency, **labels)
+        return rec
+
+    def records(self) -> List[Dict[str, Any]]:
+        return [r for r in read_jsonl(self.log_path) if r.get("run_id") == self.run_id]
+
+    def total_tokens(self) -> int:
+        with self._lock:
+            if self.log_path.exists():
+                with open(self.log_path, "rb") as f:
+                    f.seek(self._offset)
+                    data = f.read()
+                complete = data.rfind(b"\n") + 1  # A line still being appended is read next time
+                self._offset += complete
+                for line in data[:complete].splitlines():
+                    try:
+                        r = json.loads(line)
+                    except ValueError:
+                        continue
+                    if r.get("run_id") == self.run_id:
+                        self._spent += r.get("total_tokens", 0)
+            return self._spent
+
+    def check_budget(self):
+        if self.token_budget and self.token_budget > 0:
+            used = self.total_tokens()
+            if used >= self.token_budget:
+                raise TokenBudgetExceeded(f"{self.topic}: token budget exhausted ({used}/{self.token_budget})")
+
+    def wrap(self, api_func: Callable, stage: str, section_id: Optional[str] = None, model: Optional[str] = None) -> Callable:
+        """Return `api_func` with the same call signature, metered under `stage`/`section_id`.
+
+        Works for both `(response, usage)` returning `*_token` functions and plain response functions.
+        """
+
+        def metered(prompt, *args, **kwargs):
+            self.check_budget()
+            start = time.time()
+            try:
+                result = api_func(prompt, *args, **kwargs)
+            except Exception:
+                self.record(stage, None, time.time() - start, section_id=section_id, model=model, ok=False)
+                raise
+            if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], dict):
+                response, usage = result
+            else:
+                response, usage = result, usage_from_response(result)
+            self.record(stage, usage, time.time() - start, section_id=section_id, model=model, ok=response is not None)
+            return result
+
+        return metered
+
+    def _cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        price = self.prices.get(model)
+        if not price:
+            return 0.0
+        return (prompt_tokens * price.get("prompt", 0) + completion_tokens * price.get("completion", 0)) / 1_000_000
+
+    def report(self) -> Dict[str, Any]:
+        """Aggregate the log into totals plus per-stage / per-section / per-model breakdowns"""
+        records = self.records()
+
+        def empty():
+            return {
+                "calls": 0,
+                "failed_calls": 0,
+                "retries": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "total_tokens": 0,
+                "latency_seconds": 0.0,
+                "cost_usd": 0.0,
+            }
+
+        totals = empty()
+        by_stage, by_section, by_model = defaultdict(empty), defaultdict(empty), defaultdict(empty)
+        for r in records:
+            cost = self._cost(r.get("model", ""), r.get("prompt_tokens", 0), r.get("completion_tokens", 0))
+            for bucket in (
+                totals,
+                by_stage[r.get("stage", "unknown")],
+                by_section[r.get("section_id") or "-"],
+                by_model[r.get("model", "unknown")],
+            ):
+                bucket["calls"] += 1
+                bucket["failed_calls"] += 0 if r.get("ok", True) else 1
+                bucket["retries"] += r.get("retries", 0)
+                bucket["prompt_tokens"] += r.get("prompt_tokens", 0)
+                bucket["completion_tokens"] += r.get("completion_tokens", 0)
+                bucket["total_tokens"] += r.get("total_tokens", 0)
+                bucket["latency_seconds"] = round(bucket["latency_seconds"] + r.get("latency", 0.0), 3)
+                bucket["cost_usd"] = round(bucket["cost_usd"] + cost, 6)
+
+        return {
+            "topic": self.topic,
+            "token_budget": self.token_budget,
+            "totals": totals,
+            "by_stage": dict(by_stage),
+            "by_section": dict(by_section),
+            "by_model": dict(by_model),
+        }
+
+    def write_report(self, path) -> Dict[str, Any]:
+        report = self.report()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+
+def merge_token_reports(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-topic reports into one per-run report"""
+    keys = ["calls", "failed_calls", "retries", "prompt_tokens", "completion_tokens", "total_tokens", "latency_seconds", "cost_usd"]
+
+    def add(dst, src):
+        for k in keys:
+            dst[k] = round(dst.get(k, 0) + src.get(k, 0), 6)
+
+    run = {"topics": {}, "totals": {}, "by_stage": {}, "by_model": {}}
+    for report in reports:
+        run["topics"][report["topic"]] = report["totals"]
+        add(run["totals"], report["totals"])
+        for group in ("by_stage", "by_model"):
+            for name, bucket in report.get(group, {}).items():
+                add(run[group].setdefault(name, {}), bucket)
+    return run
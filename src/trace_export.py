@@ -0,0 +1,120 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from helpers import read_jsonl
+
+SPAN_FILE = "timings.jsonl"
+LLM_FILE = "token_usage.jsonl"
+TRACE_FILE = "trace.json"
+
+
+def _us(seconds: float) -> int:
+    return int(round(seconds * 1e6))
+
+
+def span_events(spans: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    events = []
+    for span in spans:
+        label = span["name"] if not span.get("section_id") else f"{span['name']} {span['section_id']}"
+        if span.get("attempt"):
+            label += f" #{span['attempt']}"
+        events.append(
+            {
+                "name": label,
+                "cat": "stage" if span.get("section_id") is None else "section",
+                "ph": "X",
+                "ts": _us(span["start"]),
+                "dur": _us(span["end"] - span["start"]),
+                "pid": span.get("pid", 0),
+                "tid": span.get("tid", 0),
+                "args": {k: span.get(k) for k in ("topic", "name", "section_id", "attempt") if span.get(k) is not None},
+            }
+        )
+    return events
+
+
+def llm_events(calls: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    events = []
+    for call in calls:
+        latency = call.get("latency", 0.0)
+        events.append(
+            {
+                "name": f"llm {call['stage']}" + (f" {call['section_id']}" if call.get("section_id") else ""),
+                "cat": "llm" if call.get("ok", True) else "llm,error",
+                "ph": "X",
+                "ts": _us(call["timestamp"] - latency),
+                "dur": _us(latency),
+                "pid": call.get("pid", 0),
+                "tid": call.get("tid", 0),
+                "args": {
+                    k: call.get(k)
+                    for k in ("topic", "section_id", "model", "prompt_tokens", "completion_tokens", "retries", "ok")
+                    if call.get(k) is not None
+                },
+            }
+        )
+    return events
+
+
+def process_names(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Label each pid with the topics (and, for render workers, sections) it worked on"""
+    seen: Dict[int, Dict[str, None]] = {}
+    for event in events:
+        args = event["args"]
+        label = args.get("topic", "")
+        if event["cat"] == "section" and args.get("section_id"):
+            label += f" / {args['section_id']}"
+        seen.setdefault(event["pid"], {})[label] = None
+    meta = []
+    for pid, labels in seen.items():
+        names = [name for name in labels if name]
+        name = ", ".join(names[:2]) + (f" (+{len(names) - 2})" if len(names) > 2 else "")
+        meta.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"{name or 'code2video'} [{pid}]"}})
+    return meta
+
+
+def build_trace(spans: Iterable[Dict[str, Any]], calls: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Chrome trace-event JSON (chrome://tracing, ui.perfetto.dev): one complete event per span or LLM call"""
+    events = span_events(spans) + llm_events(calls)
+    events.sort(key=lambda e: e["ts"])
+    return {"traceEvents": process_names(events) + events, "displayTimeUnit": "ms"}
+
+
+def _write(path: Path, trace: Dict[str, Any]):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(trace, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def write_topic_trace(output_dir) -> Optional[Path]:
+    output_dir = Path(output_dir)
+    spans, calls = read_jsonl(output_dir / SPAN_FILE), read_jsonl(output_dir / LLM_FILE)
+    if not spans and not calls:
+        return None
+    path = output_dir / TRACE_FILE
+    _write(path, build_trace(spans, calls))
+    return path
+
+
+def collect_run_records(folder):
+    """Spans and LLM calls of every topic directory under a run folder"""
+    spans, calls = [], []
+    for topic_dir in sorted(p for p in Path(folder).iterdir() if p.is_dir()):
+        spans.extend(read_jsonl(topic_dir / SPAN_FILE))
+        calls.extend(read_jsonl(topic_dir / LLM_FILE))
+    return spans, calls
+
+
+def write_run_trace(folder) -> Optional[Path]:
+    """All topics of a run, including their render workers, on one timeline"""
+    folder = Path(folder)
+    spans, calls = collect_run_records(folder)
+    if not spans and not calls:
+        return None
+    path = folder / TRACE_FILE
+    _write(path, build_trace(spans, calls))
+    print(f"🧭 Timeline: {path} (open in ui.perfetto.dev or chrome://tracing)")
+    return path
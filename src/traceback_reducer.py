@@ -0,0 +1,162 @@
+import ast
+import re
+import textwrap
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;?]*[ -/]*[@-~]|\x1b\][^\x07]*\x07")
+# Rich panel borders, gutter markers and tree glyphs
+BOX_CHARS = re.compile(r"[│┃╭╮╰╯─━┌┐└┘├┤┬┴┼═║╔╗╚╝❱❰▶]")
+PROGRESS_LINE = re.compile(r"\d+%\|[^|]*\||\d+(\.\d+)?(it/s|s/it)\]|^\s*Animation \d+\s*:.*\d+%")
+LOG_LINE = re.compile(r"^\s*(\[\d{2}/\d{2}/\d{2,4} [\d:]+\]\s*)?(INFO|DEBUG|WARNING)\s")
+EXCEPTION_LINE = re.compile(r"^\s*(?:[\w.]+\.)?(\w+(?:Error|Exception|Exit|Interrupt))\s*(?::\s*(.*))?$")
+PLAIN_FRAME = re.compile(r'^\s*File "([^"]+)", line (\d+)(?:, in (\S+))?')
+RICH_FRAME = re.compile(r"^\s*(\S+\.py):(\d+) in (\S+)")
+RICH_SOURCE = re.compile(r"^\s*\d+\s+(.*)$")
+LIBRARY_PATH = re.compile(r"site-packages|dist-packages|/lib/python\d|<frozen |\\lib\\")
+
+MAX_MESSAGE_LINES = 15
+
+
+@dataclass
+class Frame:
+    path: str
+    line: int
+    function: str = ""
+    source: str = ""  # From the code when available (exact statement), else from the traceback
+    span: Optional[Tuple[int, int]] = None  # 1-based inclusive line span of the enclosing statement
+
+
+@dataclass
+class ReducedTraceback:
+    error_type: Optional[str] = None
+    message: str = ""
+    frames: List[Frame] = field(default_factory=list)  # Section-file frames only, outermost first
+    original_chars: int = 0
+
+    @property
+    def line_number(self) -> Optional[int]:
+        return self.frames[-1].line if self.frames else None
+
+    @property
+    def span(self) -> Optional[Tuple[int, int]]:
+        return self.frames[-1].span if self.frames else None
+
+    @property
+    def text(self) -> str:
+        """Plain-Python traceback of the kept frames (parseable by the same reducer again)"""
+        out = []
+        if self.frames:
+            out.append("Traceback (most recent call last):")
+            for f in self.frames:
+                out.append(f'  File "{f.path}", line {f.line}' + (f", in {f.function}" if f.function else ""))
+                for src_line in f.source.splitlines():
+                    out.append(f"    {src_line}")
+        if self.error_type:
+            out.append(f"{self.error_type}: {self.message}" if self.message else self.error_type)
+        elif self.message:
+            out.append(self.message)
+        return "\n".join(out)
+
+
+def strip_noise(error_msg: str) -> List[str]:
+    """Remove ANSI codes, rich boxes, progress bars and log lines"""
+    lines = []
+    for line in ANSI_ESCAPE.sub("", error_msg or "").replace("\r", "\n").splitlines():
+        if PROGRESS_LINE.search(line) or LOG_LINE.match(line):
+            continue
+        line = BOX_CHARS.sub(" ", line).rstrip()
+        if line.strip():
+            lines.append(line)
+    return lines
+
+
+def _statement_span(tree: Optional[ast.AST], line: int) -> Optional[Tuple[int, int]]:
+    """Innermost simple statement (or compound statement header) containing `line`"""
+    if tree is None:
+        return None
+    best = None
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.stmt):
+            continue
+        start, end = node.lineno, getattr(node, "end_lineno", node.lineno)
+        body = getattr(node, "body", None)
+        if isinstance(body, list) and body and not isinstance(node, ast.Expr):
+            end = body[0].lineno - 1  # Header only for def/if/for/with/...
+        if start <= line <= max(start, end) and (best is None or start >= best[0]):
+            best = (start, max(start, end))
+    return best
+
+
+def reduce_traceback(error_msg: str, section_id: Optional[str] = None, code: Optional[str] = None) -> ReducedTraceback:
+    """Keep only frames in `{section_id}.py` plus the final exception, mapped to exact source spans.
+
+    Without a section frame every non-library frame is kept; when there is none either, the
+    deepest frame is kept so the fixer still sees where the failure surfaced.
+    """
+    reduced = ReducedTraceback(original_chars=len(error_msg or ""))
+    lines = strip_noise(error_msg)
+
+    frames: List[Frame] = []
+    exception_at = None
+    for i, line in enumerate(lines):
+        m = PLAIN_FRAME.match(line)
+        if m:
+            source = lines[i + 1].strip() if i + 1 < len(lines) and not PLAIN_FRAME.match(lines[i + 1]) else ""
+            if EXCEPTION_LINE.match(source) or source.startswith("^"):
+                source = ""
+            frames.append(Frame(m.group(1), int(m.group(2)), m.group(3) or "", source))
+            continue
+        m = RICH_FRAME.match(line)
+        if m:
+            frames.append(Frame(m.group(1), int(m.group(2)), m.group(3)))
+            continue
+        if frames and not frames[-1].source and RICH_SOURCE.match(line):
+            # Rich shows a window of source; the ❱ line (box char stripped) is the one matching the frame line
+            num, src = line.split(None, 1) if len(line.split(None, 1)) == 2 else (line.strip(), "")
+            if num.isdigit() and int(num) == frames[-1].line:
+                frames[-1].source = src.strip()
+            continue
+        if EXCEPTION_LINE.match(line) and not line.startswith("    "):
+            exception_at = i
+
+    if exception_at is not None:
+        m = EXCEPTION_LINE.match(lines[exception_at])
+        reduced.error_type = m.group(1)
+        tail = [m.group(2) or ""] + [l.strip() for l in lines[exception_at + 1 :]]
+        reduced.message = "\n".join(l for l in tail if l)[:4000]
+        reduced.message = "\n".join(reduced.message.split("\n")[:MAX_MESSAGE_LINES])
+    elif lines:
+        reduced.message = lines[-1].strip()
+
+    kept = [f for f in frames if section_id and Path(f.path).name == f"{section_id}.py"]
+    if not kept:
+        kept = [f for f in frames if not LIBRARY_PATH.search(f.path)]
+    if not kept and frames:
+        kept = frames[-1:]
+
+    tree = None
+    if code:
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            pass
+        code_lines = code.split("\n")
+    for f in kept:
+        if not (section_id and Path(f.path).name == f"{section_id}.py"):
+            continue  # Fallback frames (manim, libraries) keep the traceback's own source line
+        f.path = Path(f.path).name
+        if code and 1 <= f.line <= len(code_lines):
+            f.span = _statement_span(tree, f.line) or (f.line, f.line)
+            f.source = textwrap.dedent("\n".join(code_lines[f.span[0] - 1 : f.span[1]])).strip("\n")
+    reduced.frames = kept
+    return reduced
+
+
+def reduce_error_message(error_msg: str, section_id: Optional[str] = None, code: Optional[str] = None) -> str:
+    """Reduced traceback text; the de-noised tail when no exception line can be found"""
+    reduced = reduce_traceback(error_msg, section_id, code)
+    if reduced.error_type:
+        return reduced.text
+    return "\n".join(strip_noise(error_msg)[-MAX_MESSAGE_LINES:])
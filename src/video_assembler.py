@@ -0,0 +1,331 @@
+import json
+import math
+import os
+import subprocess
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+PROBE_WORKERS = 8
+ENCODE_WORKERS = 4
+DURATION_TOLERANCE = 0.5  # Seconds, or 1% of the total, whichever is larger
+ENCODERS = {"h264": "libx264", "hevc": "libx265", "vp9": "libvpx-vp9", "av1": "libaom-av1"}
+
+
+@dataclass
+class SegmentProfile:
+    """Stream parameters that must agree for `-c copy` concatenation to produce valid output"""
+
+    path: str
+    duration: float
+    video_codec: str = ""
+    width: int = 0
+    height: int = 0
+    pix_fmt: str = ""
+    frame_rate: str = ""
+    time_base: str = ""
+    audio_codec: str = ""  # Empty when the segment has no audio stream
+    sample_rate: str = ""
+    channels: int = 0
+
+    @property
+    def key(self) -> Tuple:
+        return (
+            self.video_codec, self.width, self.height, self.pix_fmt, self.frame_rate, self.time_base,
+            self.audio_codec, self.sample_rate, self.channels,
+        )
+
+
+def probe_segment(video_path: str) -> Optional[SegmentProfile]:
+    """First video/audio stream parameters via ffprobe, or None when the file cannot be read"""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_streams", "-show_format", "-of", "json", str(video_path)],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+        if result.returncode != 0:
+            return None
+        data = json.loads(result.stdout)
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+    streams = data.get("streams", [])
+    video = next((st for st in streams if st.get("codec_type") == "video"), None)
+    if video is None:
+        return None
+    audio = next((st for st in streams if st.get("codec_type") == "audio"), {})
+    return SegmentProfile(
+        path=str(video_path),
+        duration=float(data.get("format", {}).get("duration") or video.get("duration") or 0.0),
+        video_codec=video.get("codec_name", ""),
+        width=int(video.get("width", 0)),
+        height=int(video.get("height", 0)),
+        pix_fmt=video.get("pix_fmt", ""),
+        frame_rate=video.get("r_frame_rate", ""),
+        time_base=video.get("time_base", ""),
+        audio_codec=audio.get("codec_name", ""),
+        sample_rate=audio.get("sample_rate", ""),
+        channels=int(audio.get("channels", 0)),
+    )
+
+
+def probe_segments(paths: List[str], workers: int = PROBE_WORKERS) -> List[Optional[SegmentProfile]]:
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as executor:
+        return list(executor.map(probe_segment, paths))
+
+
+def normalize_segment(profile: SegmentProfile, target: SegmentProfile, output_path: Path) -> Optional[str]:
+    """Re-encode one segment to the target's resolution, frame rate, pixel format, timebase and audio layout"""
+    fps = target.frame_rate or "30/1"
+    cmd = ["ffmpeg", "-y", "-v", "error", "-i", profile.path]
+    if target.audio_codec and not profile.audio_codec:
+        # Silent track so the segment has the same stream layout as the rest
+        cmd += ["-f", "lavfi", "-i", f"anullsrc=r={target.sample_rate or 44100}:cl={'mono' if target.channels == 1 else 'stereo'}"]
+        cmd += ["-map", "0:v:0", "-map", "1:a:0", "-shortest"]
+    else:
+        cmd += ["-map", "0:v:0"] + (["-map", "0:a:0"] if target.audio_codec else [])
+    cmd += [
+        "-vf", f"scale={target.width}:{target.height}:force_original_aspect_ratio=decrease,"
+        f"pad={target.width}:{target.height}:(ow-iw)/2:(oh-ih)/2,fps={fps}",
+        "-c:v", ENCODERS.get(target.video_codec, "libx264"),
+        "-pix_fmt", target.pix_fmt or "yuv420p",
+    ]
+    if target.time_base.startswith("1/"):
+        cmd += ["-video_track_timescale", target.time_base[2:]]
+    if target.audio_codec:
+        cmd += ["-c:a", "aac" if target.audio_codec == "aac" else target.audio_codec, "-ar", str(target.sample_rate or 44100),
+                "-ac", str(target.channels or 2)]
+    cmd.append(str(output_path))
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"⚠️ Failed to normalise {profile.path}: {e}")
+        return None
+    if result.returncode != 0:
+        print(f"⚠️ Failed to normalise {profile.path}: {result.stderr.strip()[-300:]}")
+        return None
+    return str(output_path)
+
+
+def durations_match(actual: Optional[float], expected: float) -> bool:
+    return actual is not None and abs(actual - expected) <= max(DURATION_TOLERANCE, expected * 0.01)
+
+
+def _concat_copy(paths: List[str], list_file: Path, output_path: Path) -> bool:
+    list_file.write_text("".join(f"file '{Path(p).resolve()}'\n" for p in paths), encoding="utf-8")
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", str(list_file), "-c", "copy",
+             "-movflags", "+faststart", str(output_path)],
+            capture_output=True,
+            text=True,
+        )
+    except OSError as e:
+        print(f"❌ Failed to merge section videos: {e}")
+        return False
+    if result.returncode != 0:
+        print(f"❌ Failed to merge section videos: {result.stderr.strip()[-500:]}")
+        return False
+    return True
+
+
+def merge_segments(paths: List[str], output_path: Path, work_dir: Path) -> Optional[str]:
+    """Concatenate segments in order: stream copy when compatible, re-encoding only the outliers.
+
+    Every segment is probed in parallel; the most common stream profile is the target and the
+    others are re-encoded to it in parallel. The result's duration is checked against the sum
+    of the parts, and on a mismatch every segment is normalised and the concat repeated once.
+    """
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    profiles = probe_segments(paths)
+    missing = [p for p, profile in zip(paths, profiles) if profile is None]
+    if missing:
+        print(f"❌ Cannot read section videos: {missing}")
+        return None
+    target_key, _ = Counter(p.key for p in profiles).most_common(1)[0]
+    target = next(p for p in profiles if p.key == target_key)
+    expected = sum(p.duration for p in profiles)
+
+    def normalise_all(selected: List[SegmentProfile]) -> Optional[Dict[str, str]]:
+        if not selected:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(ENCODE_WORKERS, len(selected))) as executor:
+            outputs = list(executor.map(
+                lambda item: normalize_segment(item[1], target, work_dir / f"norm_{item[0]:03d}.mp4"),
+                enumerate(selected),
+            ))
+        if any(o is None for o in outputs):
+            return None
+        return {p.path: o for p, o in zip(selected, outputs)}
+
+    outliers = [p for p in profiles if p.key != target_key]
+    if outliers:
+        print(f"🔧 Re-encoding {len(outliers)}/{len(profiles)} segments with mismatched streams")
+    replaced = normalise_all(outliers)
+    if replaced is None:
+        return None
+    list_file = work_dir / "concat_list.txt"
+    for attempt in range(2):
+        parts = [replaced.get(p, p) for p in paths]
+        if _concat_copy(parts, list_file, output_path):
+            actual = probe_duration(output_path)
+            if durations_match(actual, expected):
+                return str(output_path)
+            print(f"⚠️ Merged duration {actual}s does not match the parts ({expected:.2f}s)")
+        if attempt == 0:
+            # Same-looking profiles can still disagree (edit lists, odd timestamps): normalise everything
+            replaced = normalise_all(profiles)
+            if replaced is None:
+                return None
+    return None
+
+
+def probe_duration(video_path: str) -> Optional[float]:
+    """Container duration in seconds via ffprobe, or None when it cannot be read"""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(video_path)],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+        return float(result.stdout.strip()) if result.returncode == 0 and result.stdout.strip() else None
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+
+
+class IncrementalAssembler:
+    """Grows a watchable HLS playlist of a topic in storyboard order while sections finish.
+
+    Each finished section is remuxed (stream copy, no re-encode) into an MPEG-TS segment and
+    appended to `hls/preview.m3u8` as soon as every section before it is done, so the playlist is
+    always a playable prefix of the topic. Failed sections are skipped instead of blocking the
+    ones behind them. `finalize` then only has to concatenate the already-remuxed segments.
+    """
+
+    def __init__(self, output_dir: Path, section_order: List[str]):
+        self.dir = Path(output_dir) / "hls"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.playlist = self.dir / "preview.m3u8"
+        self.order = list(section_order)
+        self.entries: List[Tuple[str, str, float]] = []  # (section_id, segment file name, seconds)
+        self._ready: Dict[str, Optional[str]] = {}
+        self._next = 0
+        self._dropped: List[str] = []  # Rendered but could not be remuxed: finalize must not omit them
+        self.profile: Optional[SegmentProfile] = None  # Stream profile of the first segment; later ones must match
+        self._lock = threading.Lock()
+        for stale in self.dir.glob("*.ts"):
+            stale.unlink()
+        self._write_playlist(ended=False)
+
+    @property
+    def complete(self) -> bool:
+        return self._next >= len(self.order)
+
+    def add(self, section_id: str, video_path: Optional[str]) -> int:
+        """Record a finished section (None when it failed); returns how many sections were appended"""
+        with self._lock:
+            self._ready[section_id] = video_path
+            appended = 0
+            while not self.complete and self.order[self._next] in self._ready:
+                sid = self.order[self._next]
+                path = self._ready[sid]
+                if path:
+                    if self._append(sid, path):
+                        appended += 1
+                    else:
+                        self._dropped.append(sid)
+                self._next += 1
+            if appended:
+                self._write_playlist(ended=False)
+            return appended
+
+    def skip(self, section_id: str) -> int:
+        return self.add(section_id, None)
+
+    def skip_missing(self) -> int:
+        """Treat every section that never reported as failed, so the rest can still be appended"""
+        appended = 0
+        for section_id in self.order:
+            if section_id not in self._ready:
+                appended += self.skip(section_id)
+        return appended
+
+    def _append(self, section_id: str, video_path: str) -> bool:
+        segment = f"{len(self.entries):03d}_{section_id}.ts"
+        profile = probe_segment(video_path)
+        if profile is None:
+            print(f"⚠️ {section_id} could not be added to the preview: unreadable video")
+            return False
+        if self.profile is None:
+            self.profile = profile
+        elif profile.key != self.profile.key:
+            # Stream-copy concat of mismatched segments plays back broken: bring this one in line first
+            print(f"🔧 {section_id} stream profile differs from the preview, re-encoding")
+            video_path = normalize_segment(profile, self.profile, self.dir / f"norm_{section_id}.mp4")
+            if video_path is None:
+                return False
+        try:
+            result = subprocess.run(
+                ["ffmpeg", "-y", "-v", "error", "-i", str(video_path), "-c", "copy", "-f", "mpegts", str(self.dir / segment)],
+                capture_output=True,
+                text=True,
+                timeout=120,
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"⚠️ {section_id} could not be added to the preview: {e}")
+            return False
+        if result.returncode != 0:
+            print(f"⚠️ {section_id} could not be added to the preview: {result.stderr.strip()[-300:]}")
+            return False
+        duration = probe_duration(self.dir / segment) or probe_duration(video_path) or 0.0
+        self.entries.append((section_id, segment, duration))
+        return True
+
+    def _write_playlist(self, ended: bool):
+        target = max([math.ceil(d) for _, _, d in self.entries] or [1])
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{target}", "#EXT-X-MEDIA-SEQUENCE:0"]
+        lines.append("#EXT-X-PLAYLIST-TYPE:" + ("VOD" if ended else "EVENT"))
+        for i, (_, segment, duration) in enumerate(self.entries):
+            if i:
+                lines.append("#EXT-X-DISCONTINUITY")  # Every section restarts its timestamps
+            lines.append(f"#EXTINF:{duration:.3f},")
+            lines.append(segment)
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+        tmp = self.playlist.with_suffix(".m3u8.tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp, self.playlist)  # Players polling the playlist never see a half-written file
+
+    def finalize(self, output_path: Path) -> Optional[str]:
+        """Close the playlist and concatenate the segments into one MP4 (stream copy)"""
+        with self._lock:
+            if not self.complete or not self.entries or self._dropped:
+                return None
+            self._write_playlist(ended=True)
+            list_file = self.dir / "segments.txt"
+            list_file.write_text("".join(f"file '{segment}'\n" for _, segment, _ in self.entries), encoding="utf-8")
+            try:
+                result = subprocess.run(
+                    ["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", str(list_file), "-c", "copy",
+                     "-bsf:a", "aac_adtstoasc", "-movflags", "+faststart", str(output_path)],
+                    capture_output=True,
+                    text=True,
+                )
+            except OSError as e:
+                print(f"❌ Failed to finalize incremental video: {e}")
+                return None
+            if result.returncode != 0:
+                print(f"❌ Failed to finalize incremental video: {result.stderr.strip()[-500:]}")
+                return None
+            expected = sum(d for _, _, d in self.entries)
+            actual = probe_duration(output_path)
+            if not durations_match(actual, expected):
+                print(f"⚠️ Finalised duration {actual}s does not match the segments ({expected:.2f}s)")
+                return None
+            return str(output_path)
@@ -0,0 +1,284 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Type
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+POLL_INTERVAL = 5
+
+# Job states: queued -> leased -> done | (lease expiry / fail) -> queued ... -> dead after max_attempts
+STATES = ("queued", "leased", "done", "dead")
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str  # "topic" | "section"
+    payload: Dict[str, Any]
+    attempts: int  # Including the current lease
+    max_attempts: int
+    lease_token: str = ""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class QueueBackend(ABC):
+    """Durable job queue shared by workers on any node; see `register_backend` to add stores"""
+
+    @abstractmethod
+    def enqueue(self, kind: str, payload: Dict[str, Any], job_id: Optional[str] = None, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> str:
+        """Add a job; re-enqueueing an existing id is a no-op, so producers can be restarted safely"""
+
+    @abstractmethod
+    def lease(self, worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS, kinds: Optional[List[str]] = None) -> Optional[Job]:
+        """Claim the oldest runnable job (queued, or leased with an expired lease)"""
+
+    @abstractmethod
+    def heartbeat(self, job: Job, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> bool:
+        """Extend the lease; False when it was lost (expired and taken over by another worker)"""
+
+    @abstractmethod
+    def complete(self, job: Job, result: Optional[Dict[str, Any]] = None) -> bool:
+        pass
+
+    @abstractmethod
+    def fail(self, job: Job, error: str) -> bool:
+        """Requeue the job, or mark it dead once it has used all its attempts"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        pass
+
+
+class SQLiteQueue(QueueBackend):
+    """SQLite queue for a shared volume: every state change is one short IMMEDIATE transaction.
+
+    Rollback journal instead of WAL, because WAL's shared-memory index does not work across
+    hosts on network filesystems; the busy timeout absorbs lock contention between nodes.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 30.0):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout = busy_timeout
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    lease_token TEXT,
+                    worker TEXT,
+                    lease_expires REAL,
+                    result TEXT,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_runnable ON jobs (state, kind, created)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _transaction(self, fn: Callable[[sqlite3.Connection], Any]):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+                conn.execute("COMMIT")
+                return result
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def enqueue(self, kind, payload, job_id=None, max_attempts=DEFAULT_MAX_ATTEMPTS) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        self._transaction(
+            lambda conn: conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, kind, payload, max_attempts, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), max_attempts, now, now),
+            )
+        )
+        return job_id
+
+    def lease(self, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS, kinds=None) -> Optional[Job]:
+        def claim(conn):
+            now = time.time()
+            # Expired leases that have no attempts left are dead, not runnable
+            conn.execute(
+                "UPDATE jobs SET state = 'dead', error = COALESCE(error, 'lease expired'), updated = ? "
+                "WHERE state = 'leased' AND lease_expires < ? AND attempts >= max_attempts",
+                (now, now),
+            )
+            kind_filter = f" AND kind IN ({','.join('?' * len(kinds))})" if kinds else ""
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (state = 'queued' OR (state = 'leased' AND lease_expires < ?))"
+                + kind_filter
+                + " ORDER BY created LIMIT 1",
+                (now, *(kinds or [])),
+            ).fetchone()
+            if row is None:
+                return None
+            token = uuid.uuid4().hex
+            conn.execute(
+                "UPDATE jobs SET state = 'leased', attempts = attempts + 1, lease_token = ?, worker = ?, "
+                "lease_expires = ?, updated = ? WHERE id = ?",
+                (token, worker_id, now + lease_seconds, now, row["id"]),
+            )
+            return Job(row["id"], row["kind"], json.loads(row["payload"]), row["attempts"] + 1, row["max_attempts"], token)
+
+        return self._transaction(claim)
+
+    def _update_leased(self, job: Job, sql: str, params: tuple) -> bool:
+        """Apply `sql` only while `job` still holds its lease"""
+        cursor = self._transaction(
+            lambda conn: conn.execute(sql + " WHERE id = ? AND lease_token = ? AND state = 'leased'", (*params, job.id, job.lease_token))
+        )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job, lease_seconds=DEFAULT_LEASE_SECONDS) -> bool:
+        now = time.time()
+        return self._update_leased(job, "UPDATE jobs SET lease_expires = ?, updated = ?", (now + lease_seconds, now))
+
+    def complete(self, job, result=None) -> bool:
+        return self._update_leased(
+            job,
+            "UPDATE jobs SET state = 'done', lease_token = NULL, result = ?, updated = ?",
+            (json.dumps(result or {}, ensure_ascii=False), time.time()),
+        )
+
+    def fail(self, job, error) -> bool:
+        state = "dead" if job.attempts >= job.max_attempts else "queued"
+        return self._update_leased(
+            job, "UPDATE jobs SET state = ?, lease_token = NULL, error = ?, updated = ?", (state, error[-4000:], time.time())
+        )
+
+    def get(self, job_id) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        record = dict(row)
+        record["payload"] = json.loads(record["payload"])
+        record["result"] = json.loads(record["result"]) if record["result"] else None
+        return record
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        finally:
+            conn.close()
+        return {state: counts.get(state, 0) for state in STATES}
+
+
+BACKENDS: Dict[str, Type[QueueBackend]] = {"sqlite": SQLiteQueue}
+
+
+def register_backend(scheme: str, backend: Type[QueueBackend]):
+    """Make `<scheme>://<location>` queue URLs resolve to `backend(location)`"""
+    BACKENDS[scheme] = backend
+
+
+def open_queue(url: str) -> QueueBackend:
+    """`sqlite:///shared/queue.db`, or a bare path for SQLite"""
+    scheme, sep, location = url.partition("://")
+    if not sep:
+        scheme, location = "sqlite", url
+    if scheme not in BACKENDS:
+        raise ValueError(f"Unknown queue backend '{scheme}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[scheme](location)
+
+
+class LeaseKeeper:
+    """Renews a job's lease in the background while its handler runs"""
+
+    def __init__(self, queue: QueueBackend, job: Job, lease_seconds: int = DEFAULT_LEASE_SECONDS):
+        self.queue, self.job, self.lease_seconds = queue, job, lease_seconds
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(self.job, self.lease_seconds):
+                    print(f"⚠️ Lost lease on job {self.job.id}; another worker may take it over")
+                    self.lost.set()
+                    return
+            except sqlite3.Error as e:  # Transient shared-volume trouble: retry on the next beat
+                print(f"⚠️ Heartbeat for job {self.job.id} failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_one(queue: QueueBackend, handlers: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]], worker_id: str,
+            lease_seconds: int = DEFAULT_LEASE_SECONDS) -> bool:
+    """Lease and run a single job; returns False when nothing was runnable"""
+    job = queue.lease(worker_id, lease_seconds, kinds=list(handlers))
+    if job is None:
+        return False
+    print(f"📥 {worker_id} took {job.kind} job {job.id} (attempt {job.attempts}/{job.max_attempts})")
+    with LeaseKeeper(queue, job, lease_seconds) as keeper:
+        try:
+            result = handlers[job.kind](job.payload)
+        except Exception:
+            queue.fail(job, traceback.format_exc())
+            print(f"❌ {job.kind} job {job.id} failed on attempt {job.attempts}")
+            return True
+    if keeper.lost.is_set():
+        return True  # Whoever holds the lease now owns the outcome
+    queue.complete(job, result)
+    return True
+
+
+def run_worker(queue: QueueBackend, handlers, worker_id: Optional[str] = None, lease_seconds: int = DEFAULT_LEASE_SECONDS,
+               poll_interval: float = POLL_INTERVAL, exit_when_idle: bool = True):
+    """Pull jobs until the queue has nothing queued or leased left (or forever with exit_when_idle=False)"""
+    worker_id = worker_id or default_worker_id()
+    processed = 0
+    while True:
+        if run_one(queue, handlers, worker_id, lease_seconds):
+            processed += 1
+            continue
+        stats = queue.stats()
+        if exit_when_idle and stats["queued"] == 0 and stats["leased"] == 0:
+            break
+        time.sleep(poll_interval)  # Other workers hold leases that may still expire back to us
+    print(f"🏁 {worker_id} finished: {processed} job(s) processed, queue {queue.stats()}")
+    return processed